@@ -13,34 +13,35 @@ pV diagrams, ... in a quality that (hopefully) allows publishing.
 # import modules
 ################
 
+# Only the lightweight helpers are imported right away. The other subpackages (and with them
+# aplpy, matplotlib and astropy) are imported on first access, e.g. easy_aplpy.plot.map(...).
+
+import importlib
 from . import helpers
-from . import plot
-from . import settings
-from . import custom_colormaps
+
+_subpackages = ['helpers','plot','compute','settings','custom_colormaps']
+
+def __getattr__(name):
+    if name in _subpackages:
+        module = importlib.import_module('.'+name, __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError("module '"+__name__+"' has no attribute '"+name+"'")
+
+def __dir__():
+    return sorted(set(list(globals().keys())+_subpackages))
+
 
 ###################################################################################################
 
 # set default settings
 ######################
 
-helpers.hide_deprecationWarnings()
 helpers.hide_nonfunctionalWarnings()
 helpers.hide_FITSwarnings()
 helpers.hide_ComparisonWarnings()
 
 
-###################################################################################################
-
-# warn that APLpy is a mess
-###########################
-
-import aplpy
-if aplpy.version.major!=1:
-    print("\x1b[0;31;40m"+"easy_aplpy only partially works with APLpy 2 and the old APLpy 0 version. Some functionality will raise unsolvable errors."+"\x1b[0m")
-# if aplpy.version.version=='1.1.1':
-#     print("\x1b[0;31;40m"+"APLpy 1.1.1 has problems plotting the beam but newer and older version have even more serious bugs."+"\x1b[0m")
-
-
 ###################################################################################################
 
 # easy_aplpy version
@@ -0,0 +1,94 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Import time benchmark: a bare `import easy_aplpy` must stay cheap #
+# and must not pull in aplpy, matplotlib or astropy.                #
+#####################################################################
+
+"""
+Usage:
+    python benchmarks/bench_import.py [--repeat N] [--max-seconds T]
+
+Each repetition imports easy_aplpy in a fresh interpreter and records the wall clock time and
+which heavy dependencies were loaded. Results are printed as JSON. The exit code is 1 if a heavy
+dependency was imported or the best import time exceeds --max-seconds.
+"""
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+
+###################################################################################################
+
+# the repository root is the easy_aplpy package itself
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+heavy_modules = ['aplpy','matplotlib','matplotlib.pyplot','astropy','astropy.io.fits','numpy']
+
+probe = """
+import sys, time, json
+start = time.perf_counter()
+import easy_aplpy
+duration = time.perf_counter()-start
+print(json.dumps({'seconds': duration, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % heavy_modules
+
+
+def _python_path(tmp):
+    # make the package importable as easy_aplpy independent of the name of the checkout
+    link = os.path.join(tmp, 'easy_aplpy')
+    os.symlink(package_dir, link)
+    return tmp
+
+
+def run(repeat=5):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=_python_path(tmp))
+        for i in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.check_output([sys.executable, '-c', probe], env=env, cwd=tmp)
+            result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+            result['process_seconds'] = time.perf_counter()-start
+            results.append(result)
+    return {'benchmark': 'import easy_aplpy',
+            'repeat':    repeat,
+            'best_seconds': min(r['seconds'] for r in results),
+            'best_process_seconds': min(r['process_seconds'] for r in results),
+            'loaded': sorted(set(m for r in results for m in r['loaded']))
+           }
+
+
+###################################################################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the time of a bare `import easy_aplpy`.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(json.dumps(result, indent=1))
+
+    failed = False
+    if result['loaded']:
+        print("heavy dependencies imported by `import easy_aplpy`: "+', '.join(result['loaded']), file=sys.stderr)
+        failed = True
+    if ( args.max_seconds is not None ) and ( result['best_seconds'] > args.max_seconds ):
+        print("import took "+str(result['best_seconds'])+" s, limit is "+str(args.max_seconds)+" s", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+###################################################################################################
@@ -0,0 +1,246 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Plotting benchmark: time plot.map and plot.grid end to end and    #
+# per stage on synthetic maps, pV diagrams and cubes.               #
+#####################################################################
+
+"""
+Usage:
+    python benchmarks/bench_plots.py [--tier small|medium|large] [--repeat N] [--output FILE]
+                                     [--engine aplpy|wcsaxes] [--text-engine tex|mathtext]
+                                     [--case NAME ...] [--data-dir DIR]
+
+Every case runs in a fresh interpreter so that caches and the peak memory of one case do not affect
+the next. For each case the wall clock time of the whole call and of the individual stages
+(_show_map, _show_contours, _show_overlays, _save_figure, ...) as reported by the timing option of
+plot.map/plot.grid is recorded, as well as the bytes of image data read and the peak
+memory, both as traced by tracemalloc (Python and NumPy allocations, measured in one extra run
+that is excluded from the timings) and as maximum resident set size of the process. Results are written as JSON and can be compared with benchmarks/compare.py.
+"""
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from fixtures import make_fixture, default_data_dir, test_map, package_dir
+from bench_import import _python_path
+
+
+###################################################################################################
+
+# case name: (function, fixture, tiers)
+cases = {'map.test_data':     ('map',  'test_data', ['small','medium','large']),
+         'map.512':           ('map',  'map_512',   ['small','medium','large']),
+         'map.2048':          ('map',  'map_2048',  ['medium','large']),
+         'map.4096':          ('map',  'map_4096',  ['large']),
+         'pv.256x128':        ('pv',   'pv_256x128',  ['small','medium','large']),
+         'pv.1024x512':       ('pv',   'pv_1024x512', ['medium','large']),
+         'channel.128x128x32':   ('channel', 'cube_128x128x32',    ['small','medium','large']),
+         'channel.512x512x64':   ('channel', 'cube_512x512x64',    ['medium','large']),
+         'grid.128x128x32':      ('grid',    'cube_128x128x32',    ['small','medium','large']),
+         'grid.512x512x64':      ('grid',    'cube_512x512x64',    ['medium','large']),
+         'grid.1024x1024x128':   ('grid',    'cube_1024x1024x128', ['large'])
+        }
+
+
+###################################################################################################
+
+def _fixture_path(fixture, data_dir):
+    if ( fixture == 'test_data' ):
+        return test_map
+    return make_fixture(fixture, data_dir)
+
+
+def _plot_arguments(function, fitsfile, out):
+    # representative arguments: contours, overlays, colorbar and beam on every plot
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord
+    from astropy.io import fits
+
+    header = fits.getheader(fitsfile)
+    if ( function == 'pv' ):
+        return 'map', [fitsfile], {'out': out, 'contours': [[fitsfile, [5,10,20,40], 'black']]}
+
+    center = SkyCoord(header['crval1']*u.degree, header['crval2']*u.degree)
+    overlays = {'circles': [[center, 10.*u.arcsec, {'linewidth': 1.0, 'edgecolor': 'red'}],
+                            [center, 20.*u.arcsec, {'linewidth': 1.0, 'edgecolor': 'red'}]],
+                'markers': [[center, {'marker': '+', 's': 100, 'c': 'white'}]]
+               }
+    if ( function == 'map' ):
+        kwargs = {'out': out, 'contours': [[fitsfile, [5,10,20,40], 'black']]}
+        kwargs.update(overlays)
+        return 'map', [fitsfile], kwargs
+    if ( function == 'channel' ):
+        channel = header['naxis3']//2
+        kwargs = {'out': out, 'channel': channel, 'contours': [[fitsfile, channel, [5,10,20,40], 'black']]}
+        kwargs.update(overlays)
+        return 'map', [fitsfile], kwargs
+    if ( function == 'grid' ):
+        nchan    = header['naxis3']
+        channels = [int(c) for c in [nchan*i//8 for i in range(1,7)]]
+        kwargs   = {'out': out, 'vmin': 0, 'vmax': 30,
+                    'contours': [[[fitsfile, c, [5,10,20,40], 'black']] for c in channels],
+                    'circles':  [overlays['circles'] for c in channels]
+                   }
+        return 'grid', [fitsfile, [2,3], channels], kwargs
+    raise ValueError("Unknown benchmark function "+function+".")
+
+
+###################################################################################################
+
+def run_case(name, repeat, engine, text_engine, data_dir):
+    """
+    Run a single case in the current process and return its results.
+    """
+    import tracemalloc
+    import easy_aplpy
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    function, fixture, tiers = cases[name]
+    fitsfile = _fixture_path(fixture, data_dir)
+    easy_aplpy.settings.engine      = engine
+    easy_aplpy.settings.text_engine = text_engine
+
+    def call(output):
+        plot_function, args, kwargs = _plot_arguments(function, fitsfile, output)
+        kwargs['timing'] = True                                                # per stage timings from easy_aplpy itself
+        start = time.perf_counter()
+        result = getattr(easy_aplpy.plot, plot_function)(*args, **kwargs)
+        duration = time.perf_counter()-start
+        plt.close('all')
+        return duration, result[-1]
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, name+'.png')
+        for i in range(repeat):
+            duration, report = call(output)
+            runs.append({'seconds':    duration,
+                         'stages':     report['stages'],
+                         'bytes_read': sum(event['bytes_read'] for event in report['events'] if ( event['depth'] == 0 ))
+                        })
+
+        # tracing slows down every allocation, so the peak is measured in an extra run that is not timed
+        tracemalloc.start()
+        try:
+            call(output)
+            current, traced_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    best = min(runs, key=lambda r: r['seconds'])
+    return {'case':              name,
+            'function':          function,
+            'fixture':           os.path.basename(fitsfile),
+            'fixture_bytes':     os.path.getsize(fitsfile),
+            'repeat':            repeat,
+            'best_seconds':      best['seconds'],
+            'median_seconds':    sorted(r['seconds'] for r in runs)[len(runs)//2],
+            'first_seconds':     runs[0]['seconds'],
+            'stages':            best['stages'],
+            'bytes_read':        best['bytes_read'],
+            'traced_peak_bytes': traced_peak,
+            'max_rss_bytes':     _max_rss()
+           }
+
+
+def _max_rss():
+    try:
+        import resource
+    except ImportError:                                                        # not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if ( sys.platform == 'darwin' ) else rss*1024                   # bytes on macOS, kilobytes on Linux
+
+
+###################################################################################################
+
+def _versions():
+    versions = {'python': platform.python_version()}
+    for module in ['numpy','matplotlib','astropy','aplpy']:
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return versions
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=package_dir, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, repeat=3, engine='aplpy', text_engine='mathtext', data_dir=default_data_dir):
+    """
+    Run all cases, each in a fresh interpreter, and return the results of all of them.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=_python_path(tmp), MPLBACKEND='Agg')
+        for name in names:
+            print("benchmarking "+name, file=sys.stderr)
+            cmd = [sys.executable, os.path.abspath(__file__), '--single', name, '--repeat', str(repeat),
+                   '--engine', engine, '--text-engine', text_engine, '--data-dir', data_dir]
+            proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE)
+            if ( proc.returncode == 0 ):
+                results.append(json.loads(proc.stdout.decode('utf-8').strip().splitlines()[-1]))
+            else:
+                results.append({'case': name, 'error': 'exit code '+str(proc.returncode)})
+    return {'benchmark':   'easy_aplpy plots',
+            'commit':      _commit(),
+            'created':     time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform':    platform.platform(),
+            'versions':    _versions(),
+            'engine':      engine,
+            'text_engine': text_engine,
+            'repeat':      repeat,
+            'results':     results
+           }
+
+
+###################################################################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark easy_aplpy.plot.map and easy_aplpy.plot.grid.")
+    parser.add_argument('--tier', choices=['small','medium','large'], default='small')
+    parser.add_argument('--case', nargs='*', default=None, help="run only these cases")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engine', choices=['aplpy','wcsaxes'], default='aplpy')
+    parser.add_argument('--text-engine', choices=['tex','mathtext'], default='mathtext')
+    parser.add_argument('--data-dir', default=default_data_dir)
+    parser.add_argument('--output', default=None, help="JSON file to write, default: stdout")
+    parser.add_argument('--single', default=None, help=argparse.SUPPRESS)  # internal: run one case in this process
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_case(args.single, args.repeat, args.engine, args.text_engine, args.data_dir)))
+        sys.exit(0)
+
+    names  = args.case if args.case else sorted(name for name in cases if args.tier in cases[name][2])
+    result = run(names, args.repeat, args.engine, args.text_engine, args.data_dir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1)
+        print("results written to "+args.output, file=sys.stderr)
+    else:
+        print(json.dumps(result, indent=1))
+    sys.exit(1 if any('error' in r for r in result['results']) else 0)
+
+
+###################################################################################################
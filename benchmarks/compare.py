@@ -0,0 +1,95 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Compare two result files of bench_plots.py, e.g. of two commits.  #
+#####################################################################
+
+"""
+Usage:
+    python benchmarks/compare.py BASELINE.json NEW.json [--threshold 1.10] [--stages]
+
+Prints the ratio new/baseline of the best time and the peak memory of every case that is present in
+both files. The exit code is 1 if any case got slower or needs more memory than the threshold allows.
+"""
+
+
+###################################################################################################
+
+# common imports
+################
+
+import sys
+import json
+import argparse
+
+
+###################################################################################################
+
+def _load(filename):
+    with open(filename) as f:
+        result = json.load(f)
+    return result, {r['case']: r for r in result['results'] if not ( 'error' in r )}
+
+
+def _ratio(new, old):
+    if not new or not old:
+        return None
+    return float(new)/float(old)
+
+
+def _format(ratio):
+    return '    n/a' if ( ratio is None ) else '{:7.3f}'.format(ratio)
+
+
+def compare(baseline, new, threshold=1.10, show_stages=False):
+    """
+    Print a comparison table and return the names of all cases that regressed beyond threshold.
+    """
+    base_meta, base = _load(baseline)
+    new_meta, news  = _load(new)
+    print("baseline: "+str(base_meta.get('commit'))+"  "+baseline)
+    print("new:      "+str(new_meta.get('commit'))+"  "+new)
+    print('')
+    print('{:28s} {:>10s} {:>10s} {:>7s} {:>7s} {:>7s}'.format('case', 'base [s]', 'new [s]', 'time', 'traced', 'rss'))
+
+    regressions = []
+    for name in sorted(set(base) & set(news)):
+        old, cur = base[name], news[name]
+        ratios = [_ratio(cur['best_seconds'], old['best_seconds']),
+                  _ratio(cur['traced_peak_bytes'], old['traced_peak_bytes']),
+                  _ratio(cur.get('max_rss_bytes'), old.get('max_rss_bytes'))]
+        flag = ''
+        if any(( r is not None ) and ( r > threshold ) for r in ratios):
+            regressions.append(name)
+            flag = '  <--'
+        print('{:28s} {:10.3f} {:10.3f} {} {} {}{}'.format(name, old['best_seconds'], cur['best_seconds'], *[_format(r) for r in ratios])+flag)
+        if show_stages:
+            for stage in sorted(set(old['stages']) | set(cur['stages'])):
+                print('    {:24s} {:10.3f} {:10.3f} {}'.format(stage, old['stages'].get(stage, 0.), cur['stages'].get(stage, 0.),
+                                                          _format(_ratio(cur['stages'].get(stage), old['stages'].get(stage)))))
+
+    missing = sorted(set(base) ^ set(news))
+    if missing:
+        print('')
+        print("cases only in one of the files: "+', '.join(missing))
+    return regressions
+
+
+###################################################################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument('baseline')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.10, help="allowed ratio new/baseline")
+    parser.add_argument('--stages', action='store_true', help="also compare the individual stages")
+    args = parser.parse_args()
+
+    regressions = compare(args.baseline, args.new, args.threshold, args.stages)
+    if regressions:
+        print('')
+        print("regressions beyond "+str(args.threshold)+": "+', '.join(regressions), file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+###################################################################################################
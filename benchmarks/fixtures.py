@@ -0,0 +1,150 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Synthetic FITS files for the benchmarks: maps, pV diagrams and    #
+# cubes of increasing size. No network access needed.               #
+#####################################################################
+
+"""
+Usage:
+    python benchmarks/fixtures.py [--data-dir DIR]
+
+Writes all synthetic fixtures to DIR (default: benchmarks/data) and prints their paths. Files that
+already exist are not written again. The content is deterministic, so results stay comparable
+between commits.
+"""
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import argparse
+import numpy as np
+
+
+###################################################################################################
+
+# the repository root is the easy_aplpy package itself
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+default_data_dir = os.path.join(package_dir, 'benchmarks', 'data')
+
+# fixture name: (kind, shape as (nx, ny[, nchan]))
+fixtures = {'map_512':          ('map',  (512,512)),
+            'map_2048':         ('map',  (2048,2048)),
+            'map_4096':         ('map',  (4096,4096)),
+            'pv_256x128':       ('pv',   (256,128)),
+            'pv_1024x512':      ('pv',   (1024,512)),
+            'cube_128x128x32':  ('cube', (128,128,32)),
+            'cube_512x512x64':  ('cube', (512,512,64)),
+            'cube_1024x1024x128': ('cube', (1024,1024,128))
+           }
+
+# the real map that ships with the repository
+test_map = os.path.join(package_dir, 'test_data', 'map.fits')
+
+
+###################################################################################################
+
+def _sources(nx, ny, rng, nsources=20):
+    # a few gaussian blobs on a noisy background, built row block by row block to limit memory
+    x0 = rng.uniform(0, nx, nsources)
+    y0 = rng.uniform(0, ny, nsources)
+    sx = rng.uniform(0.01, 0.1, nsources)*nx
+    sy = rng.uniform(0.01, 0.1, nsources)*ny
+    amp = rng.uniform(5, 50, nsources)
+    image = rng.normal(0., 1., (ny,nx)).astype(np.float32)
+    x = np.arange(nx, dtype=np.float32)
+    for start in range(0, ny, 512):
+        y = np.arange(start, min(start+512,ny), dtype=np.float32)[:,None]
+        for i in range(nsources):
+            image[start:start+len(y)] += amp[i]*np.exp(-0.5*(((x-x0[i])/sx[i])**2+((y-y0[i])/sy[i])**2))
+    return image
+
+
+def _celestial_header(header, nx, ny):
+    pixel = 1./3600.*256./max(nx,ny)                                            # all maps cover about 4 arcmin
+    header['ctype1']  = 'RA---SIN'
+    header['ctype2']  = 'DEC--SIN'
+    header['cunit1']  = 'deg'
+    header['cunit2']  = 'deg'
+    header['crval1']  = 11.888
+    header['crval2']  = -25.288
+    header['cdelt1']  = -pixel
+    header['cdelt2']  = pixel
+    header['crpix1']  = nx/2.+0.5
+    header['crpix2']  = ny/2.+0.5
+    header['radesys'] = 'FK5'
+    header['equinox'] = 2000.
+    header['bmaj']    = 4.*pixel
+    header['bmin']    = 3.*pixel
+    header['bpa']     = 30.
+
+
+def _spectral_header(header, axis, nchan):
+    header['ctype'+str(axis)] = 'VRAD'
+    header['cunit'+str(axis)] = 'km/s'
+    header['crval'+str(axis)] = 250.
+    header['cdelt'+str(axis)] = 5.
+    header['crpix'+str(axis)] = nchan/2.+0.5
+    header['restfrq']         = 2.30538e11
+    header['specsys']         = 'LSRK'
+
+
+def make_fixture(name, data_dir=default_data_dir):
+    """
+    Return the path of the synthetic fixture name, writing it first if it does not exist yet.
+    """
+    from astropy.io import fits
+
+    path = os.path.join(data_dir, name+'.fits')
+    if os.path.exists(path):
+        return path
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    kind, shape = fixtures[name]
+    rng = np.random.RandomState(sum(bytearray(name.encode('utf-8'))))
+    if ( kind == 'map' ):
+        data = _sources(shape[0], shape[1], rng)
+        hdu  = fits.PrimaryHDU(data)
+        _celestial_header(hdu.header, shape[0], shape[1])
+    elif ( kind == 'pv' ):
+        data = _sources(shape[0], shape[1], rng)
+        hdu  = fits.PrimaryHDU(data)
+        hdu.header['ctype1'] = 'OFFSET'
+        hdu.header['cunit1'] = 'arcsec'
+        hdu.header['crval1'] = 0.
+        hdu.header['cdelt1'] = 240./shape[0]
+        hdu.header['crpix1'] = shape[0]/2.+0.5
+        _spectral_header(hdu.header, 2, shape[1])
+    elif ( kind == 'cube' ):
+        nx, ny, nchan = shape
+        profile = np.exp(-0.5*((np.arange(nchan)-nchan/2.)/(nchan/6.))**2).astype(np.float32)
+        hdu = fits.PrimaryHDU(np.zeros((nchan,ny,nx), dtype=np.float32))
+        image = _sources(nx, ny, rng)
+        for chan in range(nchan):                                              # moving, fading emission
+            hdu.data[chan] = np.roll(image, chan-nchan//2, axis=1)*profile[chan]+rng.normal(0., 1., (ny,nx))
+        _celestial_header(hdu.header, nx, ny)
+        _spectral_header(hdu.header, 3, nchan)
+    else:
+        raise ValueError("Unknown fixture kind "+kind+".")
+    hdu.header['bunit'] = 'K'
+    hdu.writeto(path)
+    return path
+
+
+###################################################################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write the synthetic benchmark fixtures.")
+    parser.add_argument('--data-dir', default=default_data_dir)
+    args = parser.parse_args()
+
+    for name in sorted(fixtures):
+        print(make_fixture(name, args.data_dir))
+
+
+###################################################################################################
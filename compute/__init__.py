@@ -0,0 +1,22 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+
+"""
+These functions compute moment maps, pV diagrams, ... from cubes
+in memory so that they can be plotted without intermediate files.
+"""
+
+__all__ = ['moments','pv_slice']
+
+
+###################################################################################################
+
+# import modules
+################
+
+from .moments import moments
+from .pv import pv_slice
+
+
+###################################################################################################
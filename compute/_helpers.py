@@ -0,0 +1,41 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Helpers shared by the compute functions: access to the memory-    #
+# mapped cube and the selected channel range.                       #
+#####################################################################
+
+__all__ = ['_cube_data','_channel_range']
+
+
+###################################################################################################
+
+# common imports
+################
+
+from ..helpers._fits import _file_name, _get_hdu
+from ..helpers._spectral import _channels_physical
+
+
+###################################################################################################
+
+def _cube_data(cube):
+    # (channel, y, x) view of the (memory-mapped) data, additional degenerate axes use their first plane
+    data = _get_hdu(cube).data
+    if ( data is None ) or ( data.ndim < 3 ):
+        raise TypeError(_file_name(cube)+" is not a cube.")
+    return data[(0,)*(data.ndim-3)]
+
+
+def _channel_range(cube, channels, nchan):
+    # first and last channel (inclusive) of a range given as channel numbers or velocities/frequencies
+    if ( channels is None ):
+        return 0, nchan-1
+    if not ( len(channels) == 2 ):
+        raise TypeError("Give the channel range as [first, last].")
+    chans,_ = _channels_physical(cube, list(channels))
+    first, last = sorted([min(max(int(c), 0), nchan-1) for c in chans])
+    return first, last
+
+
+###################################################################################################
@@ -0,0 +1,204 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Moment maps computed block by block from memory-mapped cubes, so  #
+# that the cube is never held in memory as a whole.                 #
+#####################################################################
+
+__all__ = ['moments']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+import easy_aplpy
+from ..helpers._fits import _is_hdu, _file_name, _get_hdu, _get_header, _plane_header, _count_read
+from ..helpers._spectral import _spectral_axis
+from ..helpers._log import _info
+from ._helpers import _cube_data, _channel_range
+
+
+###################################################################################################
+
+_moment_names = {0:      'integrated intensity',
+                 1:      'intensity weighted velocity',
+                 2:      'intensity weighted velocity dispersion',
+                 'peak': 'peak intensity'
+                }
+
+
+def _spectral_unit(axis):
+    # moments in km/s if the axis can be converted to velocities, in GHz otherwise
+    try:
+        (1.*axis['unit']).to(u.km/u.s, equivalencies=axis['equivalencies'])
+        return u.km/u.s
+    except u.UnitConversionError:
+        return u.GHz
+
+
+def _spectral_values(header, axis, channels, unit):
+    # spectral coordinate of channels (0-based) in unit, crpix may be fractional
+    crpix  = float(header['crpix'+str(axis['axis'])])
+    values = ((np.asarray(channels, dtype=float)+1.-crpix)*axis['cdelt']+axis['crval'])*axis['unit']
+    return values.to(unit, equivalencies=axis['equivalencies']).value
+
+
+def _unit_string(unit):
+    return unit.to_string().replace(' ','')
+
+
+def _mask_data(mask, data):
+    # the mask as (memory-mapped) array of the shape of the cube or of a single channel
+    if ( mask is None ):
+        return None
+    if isinstance(mask, str) or _is_hdu(mask):
+        mask = _get_hdu(mask).data
+    mask = np.asanyarray(mask)
+    if ( mask.ndim > 3 ):
+        mask = mask[(0,)*(mask.ndim-3)]
+    if not ( mask.shape[-2:] == data.shape[-2:] ) or ( ( mask.ndim == 3 ) and not ( mask.shape[0] == data.shape[0] ) ):
+        raise ValueError("Moments: the mask must have the shape of the cube or of a single channel.")
+    return mask
+
+
+def _moment_hdu(data, header, bunit, moment, source, first, last):
+    header = _plane_header(header)
+    header['bunit'] = bunit
+    header.add_history('easy_aplpy: '+_moment_names[moment]+' (moment '+str(moment)+') of '+_file_name(source)+', channels '+str(first)+' to '+str(last))
+    return fits.PrimaryHDU(data=data.astype(np.float32), header=header)
+
+
+###################################################################################################
+
+# moment maps
+#############
+
+def moments(cube, moments=0, channels=None, clip=None, mask=None):
+    """
+    easy_aplpy.compute.moments
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compute moment maps of a cube. The cube is read block by block (easy_aplpy.settings.
+    compute_block_size bytes at a time) from the memory-mapped file, so cubes larger than the
+    memory can be processed. The moments are returned as in-memory images with a 2D header (the
+    beam is kept) that can be passed directly to easy_aplpy.plot.map or easy_aplpy.plot.grid
+    instead of a file name.
+
+    Returned objects:
+    astropy.io.fits.PrimaryHDU
+                    The moment map, or a list of moment maps if a list of moments was requested.
+                    Moment 0 is in BUNIT of the cube times km/s, moments 1 and 2 are in km/s (GHz if
+                    the spectral axis is a frequency axis without rest frequency), the peak is in
+                    BUNIT of the cube. Pixels without any valid channel are NaN.
+
+    Mandatory unnamed arguments:
+        cube        Path and file name of the fits cube or an in-memory HDU. The spectral axis must
+                    be the third axis.
+
+    Optional arguments:
+        moments     The moment to compute, 0, 1, 2 or 'peak', or a list of these, e.g. [0,1,2].
+                    Defaults to 0. All requested moments are computed in a single pass.
+
+        channels    The channel range [first, last] (inclusive) given as channel numbers or
+                    velocities/frequencies (astropy.units). Defaults to all channels.
+
+        clip        Only use pixels above this value, or within [lower, upper]. Pixels outside
+                    are ignored like NaNs. Defaults to None, i.e. all finite pixels are used.
+
+        mask        Only use pixels where the mask is True (non-zero). File name, in-memory HDU or
+                    array of the shape of the cube or of a single channel (used for all channels).
+
+
+    examples:
+
+    mom0, mom1 = easy_aplpy.compute.moments('cube.fits', [0,1], channels=[100*u.km/u.s, 300*u.km/u.s], clip=0.01)
+    easy_aplpy.plot.map(mom0, out='cube.mom0.png')
+    easy_aplpy.plot.map(mom1, out='cube.mom1.png', cmap='RdBu_r')
+    """
+
+    requested = list(moments) if isinstance(moments, (list,tuple)) else [moments]
+    unknown   = [str(m) for m in requested if not ( m in _moment_names )]
+    if unknown:
+        raise ValueError("Moments: unknown moment(s) "+', '.join(unknown)+". Use 0, 1, 2 or 'peak'.")
+
+    header = _get_header(cube)
+    data   = _cube_data(cube)
+    maskd  = _mask_data(mask, data)
+    axis   = _spectral_axis(header)
+    if not ( axis['axis'] == 3 ):
+        raise TypeError("Moments: the spectral axis must be the third axis of the cube.")
+
+    # channel range and the spectral coordinate of every channel
+    first, last = _channel_range(cube, channels, data.shape[0])
+    unit      = _spectral_unit(axis)
+    values    = _spectral_values(header, axis, np.arange(first, last+1), unit)
+    reference = np.mean(values)                                                # sums relative to the center are numerically stable
+    width     = np.abs(np.diff(_spectral_values(header, axis, [first, first+1], unit)))[0]
+    lower, upper = (clip if isinstance(clip, (list,tuple)) else [clip, None]) if not ( clip is None ) else [None, None]
+
+    # channels per block
+    ny, nx = data.shape[1:]
+    block  = max(int(easy_aplpy.settings.compute_block_size)//(ny*nx*8), 1)
+    _info("computing moment(s) "+', '.join(str(m) for m in requested)+" of "+_file_name(cube)+", channels "+str(first)+" to "+str(last)+" in blocks of "+str(block)+" channels")
+
+    weights = np.zeros((ny,nx))
+    first_m = np.zeros((ny,nx)) if ( 1 in requested ) or ( 2 in requested ) else None
+    second  = np.zeros((ny,nx)) if ( 2 in requested ) else None
+    peak    = np.full((ny,nx), -np.inf) if ( 'peak' in requested ) else None
+    count   = np.zeros((ny,nx), dtype=int)
+
+    for start in range(first, last+1, block):
+        stop  = min(start+block, last+1)
+        chunk = np.array(data[start:stop], dtype=np.float64)
+        _count_read(chunk.nbytes)
+        valid = np.isfinite(chunk)
+        if not ( lower is None ):
+            valid &= ( chunk >= lower )
+        if not ( upper is None ):
+            valid &= ( chunk <= upper )
+        if not ( maskd is None ):
+            valid &= np.asarray(maskd[start:stop] if ( maskd.ndim == 3 ) else maskd, dtype=bool)
+        chunk[~valid] = 0.
+        offsets = values[start-first:stop-first]-reference
+        weights += chunk.sum(axis=0)
+        if not ( first_m is None ):
+            first_m += np.tensordot(offsets, chunk, axes=1)
+        if not ( second is None ):
+            second += np.tensordot(offsets**2, chunk, axes=1)
+        if not ( peak is None ):
+            chunk[~valid] = -np.inf
+            np.maximum(peak, chunk.max(axis=0), out=peak)
+        count += valid.sum(axis=0)
+
+    # combine the sums
+    empty  = ( count == 0 )
+    bunit  = str(header.get('bunit', ''))
+    result = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = first_m/weights if not ( first_m is None ) else None
+        for moment in requested:
+            if ( moment == 0 ):
+                image = weights*width
+                image_unit = bunit+'.'+_unit_string(unit) if bunit else _unit_string(unit)
+            elif ( moment == 1 ):
+                image = np.where(weights > 0, reference+mean, np.nan)
+                image_unit = _unit_string(unit)
+            elif ( moment == 2 ):
+                image = np.where(weights > 0, np.sqrt(np.maximum(second/weights-mean**2, 0.)), np.nan)
+                image_unit = _unit_string(unit)
+            else:
+                image = peak.copy()
+                image_unit = bunit
+            image[empty] = np.nan
+            result.append(_moment_hdu(image, header, image_unit, moment, cube, first, last))
+
+    return result if isinstance(moments, (list,tuple)) else result[0]
+
+
+###################################################################################################
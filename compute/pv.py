@@ -0,0 +1,228 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Position-velocity diagrams sampled along arbitrary paths directly #
+# from memory-mapped cubes, reading only the voxels along the path. #
+#####################################################################
+
+__all__ = ['pv_slice']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.coordinates import SkyCoord
+
+import easy_aplpy
+from ..helpers._fits import _file_name, _get_header, _plane_header, _count_read
+from ..helpers._spectral import _spectral_axis
+from ..helpers._log import _info
+from ._helpers import _cube_data, _channel_range
+
+
+###################################################################################################
+
+# header keywords copied from the cube to the pV diagram
+_copy_keys = ['bunit','bmaj','bmin','bpa','object','telescop','instrume','restfrq','restfreq','specsys','date-obs','mjd-obs']
+
+
+def _pixel_scale(header):
+    # celestial WCS of the image plane and the mean pixel size in arcsec, the path is sampled in pixels
+    from astropy.wcs import WCS
+    from astropy.wcs.utils import proj_plane_pixel_scales
+    wcs = WCS(_plane_header(header))
+    return wcs, float(np.mean(np.abs(proj_plane_pixel_scales(wcs))))*3600.
+
+
+def _in_pixels(value, scale, name):
+    # angles (astropy.units) are converted to pixels, plain numbers are pixels already
+    if isinstance(value, u.quantity.Quantity):
+        return float(value.to(u.arcsec).value)/scale
+    if isinstance(value, (int,float,np.integer,np.floating)):
+        return float(value)
+    raise TypeError("PV slice: give "+name+" as angle (astropy.units) or in pixels.")
+
+
+def _path_pixels(path, wcs):
+    """
+    Return the vertices of the path as (n,2) array of 0-based pixel positions. The path is a list of
+    SkyCoords, an array SkyCoord or a list of [x, y] pixel positions.
+    """
+    from astropy.wcs.utils import skycoord_to_pixel
+    if isinstance(path, SkyCoord):
+        vertices = np.transpose(skycoord_to_pixel(path, wcs, origin=0)).reshape(-1,2)
+    elif all(isinstance(p, SkyCoord) for p in path):
+        vertices = np.array([np.ravel(skycoord_to_pixel(p, wcs, origin=0)) for p in path])
+    else:
+        vertices = np.array(path, dtype=float)
+    if not ( vertices.ndim == 2 and vertices.shape[1] == 2 ):
+        raise TypeError("PV slice: give the path as list of SkyCoords or as list of [x, y] pixel positions.")
+    if not np.all(np.isfinite(vertices)):
+        raise ValueError("PV slice: the path contains positions that are not within the image projection.")
+    return vertices
+
+
+def _sample_path(vertices, spacing):
+    """
+    Positions spaced by spacing pixels along the polyline through the vertices and the unit vector
+    perpendicular to the segment each position lies on.
+    """
+    steps    = np.hypot(*np.diff(vertices, axis=0).T)
+    vertices = vertices[np.concatenate([[True], steps > 0])]                   # drop repeated vertices
+    steps    = steps[steps > 0]
+    if not len(steps):
+        raise ValueError("PV slice: the path needs at least two distinct positions.")
+    distance = np.concatenate([[0.], np.cumsum(steps)])
+    samples  = np.arange(0., distance[-1]+1e-6*spacing, spacing)
+    x = np.interp(samples, distance, vertices[:,0])
+    y = np.interp(samples, distance, vertices[:,1])
+    segment = np.clip(np.searchsorted(distance, samples, side='right')-1, 0, len(steps)-1)
+    dx = (np.diff(vertices[:,0])/steps)[segment]
+    dy = (np.diff(vertices[:,1])/steps)[segment]
+    return x, y, -dy, dx
+
+
+def _bilinear_weights(x, y, shape):
+    """
+    Pixels touched by bilinear interpolation at the positions x, y and their weights. Returns the
+    sorted unique flat pixel indices, the index into them of the four corners of every position,
+    the corner weights and whether a position is within the image.
+    """
+    ny, nx = shape
+    inside = ( x >= 0 ) & ( x <= nx-1 ) & ( y >= 0 ) & ( y <= ny-1 )
+    x = np.where(inside, x, 0.)
+    y = np.where(inside, y, 0.)
+    x0 = np.clip(np.floor(x), 0, max(nx-2, 0)).astype(int)
+    y0 = np.clip(np.floor(y), 0, max(ny-2, 0)).astype(int)
+    x1 = np.minimum(x0+1, nx-1)
+    y1 = np.minimum(y0+1, ny-1)
+    fx = x-x0
+    fy = y-y0
+    corners = np.array([y0*nx+x0, y0*nx+x1, y1*nx+x0, y1*nx+x1])
+    weights = np.array([(1.-fx)*(1.-fy), fx*(1.-fy), (1.-fx)*fy, fx*fy])
+    pixels, index = np.unique(corners, return_inverse=True)
+    return pixels, index.reshape(corners.shape), weights, inside
+
+
+def _pv_header(header, axis, first, nsamples, step, source, npath, width):
+    # offset along the path (arcsec from the first position) and the spectral axis of the cube
+    spec = str(axis['axis'])
+    pv   = fits.Header()
+    pv['ctype1'] = 'OFFSET'
+    pv['cunit1'] = 'arcsec'
+    pv['crval1'] = 0.
+    pv['cdelt1'] = step
+    pv['crpix1'] = 1.
+    pv['ctype2'] = header.get('ctype'+spec, 'VRAD')
+    pv['cunit2'] = header['cunit'+spec]
+    pv['crval2'] = axis['crval']
+    pv['cdelt2'] = axis['cdelt']
+    pv['crpix2'] = float(header['crpix'+spec])-first
+    for key in _copy_keys:
+        if ( key in header ):
+            pv[key] = header[key]
+    pv.add_history('easy_aplpy: pV diagram of '+_file_name(source)+' along a path of '+str(npath)+' positions ('+str(nsamples)+' samples), width '+'{:.3g}'.format(width)+' arcsec')
+    return pv
+
+
+###################################################################################################
+
+# pV diagrams
+#############
+
+def pv_slice(cube, path, width=None, spacing=None, channels=None):
+    """
+    easy_aplpy.compute.pv_slice
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Extract a position-velocity diagram along a path through a cube. The path is sampled at equal
+    steps along the (poly)line, the cube is interpolated bilinearly at these positions and averaged
+    across the width of the slit. Only the pixels touched by the interpolation are read from the
+    memory-mapped file (block by block, easy_aplpy.settings.compute_block_size bytes at a time),
+    so many cuts through the same cube are cheap: the file stays open and each cut only costs the
+    voxels along its path. The diagram is returned as in-memory image with an OFFSET axis that
+    can be passed directly to easy_aplpy.plot.map, which shows it as pV diagram.
+
+    Returned objects:
+    astropy.io.fits.PrimaryHDU
+                    The pV diagram: offset along the path in arcsec (from the first position) on the
+                    x axis and the spectral axis of the cube on the y axis. The beam and BUNIT of the
+                    cube are kept. Positions outside the image are NaN.
+
+    Mandatory unnamed arguments:
+        cube        Path and file name of the fits cube or an in-memory HDU. The spectral axis must
+                    be the third axis.
+
+        path        The positions the path runs through, at least two. Either a list of SkyCoords,
+                    an array SkyCoord or a list of [x, y] pixel positions (0-based, as numpy).
+
+    Optional arguments:
+        width       Width of the slit as angle (astropy.units) or in pixels. The cube is averaged
+                    across this width perpendicular to the path. Defaults to a single pixel, i.e.
+                    no averaging.
+
+        spacing     Step along the path as angle (astropy.units) or in pixels. Defaults to one
+                    pixel.
+
+        channels    The channel range [first, last] (inclusive) given as channel numbers or
+                    velocities/frequencies (astropy.units). Defaults to all channels.
+
+
+    examples:
+
+    path = [SkyCoord('00h47m33.07s -25d17m20.0s'), SkyCoord('00h47m31.50s -25d17m05.0s')]
+    pv = easy_aplpy.compute.pv_slice('cube.fits', path, width=1.5*u.arcsec)
+    easy_aplpy.plot.map(pv, out='cube.pv.png', labels=['offset [arcsec]','velocity [km/s]'])
+    """
+
+    header = _get_header(cube)
+    data   = _cube_data(cube)
+    axis   = _spectral_axis(header)
+    if not ( axis['axis'] == 3 ):
+        raise TypeError("PV slice: the spectral axis must be the third axis of the cube.")
+    first, last = _channel_range(cube, channels, data.shape[0])
+
+    # sample positions along the path and across the slit
+    wcs, scale = _pixel_scale(header)
+    spacing  = _in_pixels(spacing, scale, 'spacing') if not ( spacing is None ) else 1.
+    width    = _in_pixels(width, scale, 'width') if not ( width is None ) else 1.
+    if not ( spacing > 0 and width > 0 ):
+        raise ValueError("PV slice: width and spacing must be positive.")
+    vertices = _path_pixels(path, wcs)
+    x, y, nx, ny = _sample_path(vertices, spacing)
+    nslit    = max(int(np.ceil(width/spacing)), 1)
+    across   = (np.arange(nslit)-(nslit-1)/2.)*width/nslit
+    xs       = x[:,None]+across[None,:]*nx[:,None]
+    ys       = y[:,None]+across[None,:]*ny[:,None]
+    pixels, index, weights, inside = _bilinear_weights(xs, ys, data.shape[1:])
+    rows, cols = np.divmod(pixels, data.shape[2])
+
+    # channels per block: the touched pixels plus the four corners of every position
+    block = max(int(easy_aplpy.settings.compute_block_size)//(8*(len(pixels)+5*index[0].size)), 1)
+    _info("extracting a pV diagram of "+_file_name(cube)+" along "+str(len(x))+" positions ("+str(len(pixels))+" pixels per channel), channels "+str(first)+" to "+str(last)+" in blocks of "+str(block)+" channels")
+
+    pv = np.full((last-first+1, len(x)), np.nan)
+    for start in range(first, last+1, block):
+        stop   = min(start+block, last+1)
+        values = np.array(data[start:stop, rows, cols], dtype=np.float64)     # only the touched voxels are read
+        _count_read(values.nbytes)
+        corner = values[:,index]                                               # (channel, corner, position, slit)
+        valid  = np.isfinite(corner)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # NaN aware bilinear interpolation, then the mean across the slit
+            sample = (np.where(valid, corner, 0.)*weights).sum(axis=1)/(valid*weights).sum(axis=1)
+            sample[:,~inside] = np.nan
+            finite = np.isfinite(sample)
+            counts = finite.sum(axis=2)
+            pv[start-first:stop-first] = np.where(counts > 0, np.where(finite, sample, 0.).sum(axis=2)/np.maximum(counts, 1), np.nan)
+
+    pv_header = _pv_header(header, axis, first, len(x), spacing*scale, cube, len(vertices), width*scale)
+    return fits.PrimaryHDU(data=pv.astype(np.float32), header=pv_header)
+
+
+###################################################################################################
@@ -14,5 +14,7 @@ pV diagrams, ... in a quality that (hopefully) allows publishing.
 ################
 
 from ._helpers import *
+from ._fits import *
+from ._log import *
 
 ###################################################################################################
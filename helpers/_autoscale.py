@@ -0,0 +1,82 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Colour scale limits from samples of memory-mapped images, so that #
+# large images and cubes are never read completely.                 #
+#####################################################################
+
+__all__ = ['_sample_plane','_percentile_limits','_channel_limits','_image_limits']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+
+import easy_aplpy
+from ._fits import _plane_view, _count_read
+
+
+###################################################################################################
+
+def _random_state():
+    # reproducible sampling offsets unless settings.autoscale_seed is None
+    return np.random.RandomState(easy_aplpy.settings.autoscale_seed)
+
+
+def _sample_plane(data, max_samples, rng=None, chunk_rows=1024):
+    """
+    Return the finite values of every n-th pixel (in both directions) of a 2D (memory-mapped) array,
+    with n chosen such that about max_samples pixels are read. The grid of sampled pixels starts at
+    a random offset, so that regular structure in the image does not bias the sample. The rows are
+    read in strips of chunk_rows sampled rows to keep memory bounded.
+    """
+    ny, nx = data.shape[-2], data.shape[-1]
+    step   = max(int(np.ceil(np.sqrt(ny*nx/float(max_samples)))), 1)
+    rng    = _random_state() if ( rng is None ) else rng
+    y0, x0 = rng.randint(0, step, 2) if ( step > 1 ) else (0, 0)
+    rows   = np.arange(y0, ny, step)
+    chunks = []
+    for start in range(0, len(rows), chunk_rows):
+        strip = rows[start:start+chunk_rows]
+        chunk = np.asarray(data[strip[0]:strip[-1]+1:step, x0::step]).ravel()
+        _count_read(chunk.nbytes)
+        chunks.append(chunk[np.isfinite(chunk)])
+    return np.concatenate(chunks) if chunks else np.zeros(0)
+
+
+def _percentile_limits(sample, pmin=None, pmax=None):
+    # lower and upper colour scale limit as percentiles of the sampled values
+    pmin = easy_aplpy.settings.autoscale_pmin if ( pmin is None ) else pmin
+    pmax = easy_aplpy.settings.autoscale_pmax if ( pmax is None ) else pmax
+    if ( sample.size == 0 ):
+        raise ValueError("Autoscale: the image contains no finite values.")
+    vmin, vmax = np.percentile(sample, [pmin, pmax])
+    return float(vmin), float(vmax)
+
+
+def _channel_limits(fitsfile, channels, pmin=None, pmax=None):
+    """
+    Return (vmin, vmax) shared by the given channels of a cube. The samples of all channels are
+    pooled, so the limits are the percentiles of the combined data like for a single image.
+    """
+    rng = _random_state()
+    per_channel = max(int(easy_aplpy.settings.autoscale_samples)//max(len(channels),1), 1)
+    sample = np.concatenate([_sample_plane(_plane_view(fitsfile, channel), per_channel, rng) for channel in channels])
+    return _percentile_limits(sample, pmin, pmax)
+
+
+def _image_limits(data, pmin=None, pmax=None):
+    """
+    Return (vmin, vmax) of a 2D image, or of the first plane of a cube as shown by APLpy, from a
+    sample of at most settings.autoscale_samples pixels. data may be memory-mapped.
+    """
+    if ( data.ndim > 2 ):
+        data = data[(0,)*(data.ndim-2)]
+    sample = _sample_plane(data, int(easy_aplpy.settings.autoscale_samples))
+    return _percentile_limits(sample, pmin, pmax)
+
+
+###################################################################################################
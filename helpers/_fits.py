@@ -0,0 +1,216 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Shared access to FITS files. Every plot stage reads headers and   #
+# data through this cache so a file is only parsed once.            #
+#####################################################################
+
+__all__ = ['clear_fits_cache','_is_hdu','_file_name','_get_hdul','_get_hdu','_get_header','_copy_hdu','_plane_header','_plane_view','_get_plane','_plane_hdu','_block_average','_binned_header','_bytes_read']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import re
+from collections import OrderedDict
+
+import easy_aplpy
+
+
+###################################################################################################
+
+# per-process FITS cache
+########################
+
+# open HDULists keyed by (absolute path, mtime, size), least recently used first
+_fits_cache = OrderedDict()
+
+# bytes of image data handed out to the plotting stages, reported with the stage timings
+_read_counter = [0]
+
+
+def _count_read(nbytes):
+    _read_counter[0] += int(nbytes)
+
+
+def _bytes_read():
+    return _read_counter[0]
+
+
+def _cache_key(fitsfile):
+    path = os.path.abspath(fitsfile)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def _is_hdu(fitsfile):
+    # an in-memory image HDU instead of a file name
+    return not isinstance(fitsfile, str) and hasattr(fitsfile, 'header') and hasattr(fitsfile, 'data')
+
+
+def _file_name(fitsfile):
+    # the file name for messages
+    if _is_hdu(fitsfile):
+        return 'in-memory image'+( ' '+str(fitsfile.header['object']) if ( 'object' in fitsfile.header ) else '' )
+    return str(fitsfile)
+
+
+def _get_hdul(fitsfile):
+    """
+    Return the opened (memory-mapped) HDUList of a FITS file. The file is only opened again when
+    its modification time or size changed. The number of files kept open is limited by
+    easy_aplpy.settings.fits_cache_size.
+    """
+    from astropy.io import fits
+
+    key = _cache_key(fitsfile)
+    if key in _fits_cache:
+        _fits_cache.move_to_end(key)
+        return _fits_cache[key]
+
+    # drop outdated versions of the same file
+    for old_key in [k for k in _fits_cache if k[0] == key[0]]:
+        _fits_cache.pop(old_key).close()
+
+    hdul = fits.open(fitsfile, memmap=True)
+    _fits_cache[key] = hdul
+    while ( len(_fits_cache) > max(int(easy_aplpy.settings.fits_cache_size), 1) ):
+        _, old_hdul = _fits_cache.popitem(last=False)
+        old_hdul.close()
+    return hdul
+
+
+def _get_hdu(fitsfile):
+    """
+    Return the primary HDU of a FITS file from the cache. Do not modify the returned object, it is
+    shared by all plot stages. Use _copy_hdu to get an HDU that can be handed to APLpy. In-memory
+    HDUs (e.g. from easy_aplpy.compute) are returned as they are.
+    """
+    if _is_hdu(fitsfile):
+        return fitsfile
+    return _get_hdul(fitsfile)[0]
+
+
+def _get_header(fitsfile):
+    """
+    Return the primary header of a FITS file from the cache. Do not modify the returned header.
+    """
+    return _get_hdu(fitsfile).header
+
+
+def _copy_hdu(fitsfile):
+    """
+    Return a new PrimaryHDU with a copy of the cached header but sharing the (memory-mapped) data.
+    APLpy may alter the header it is given, so this is what should be passed to aplpy.FITSFigure.
+    """
+    from astropy.io import fits
+
+    hdu = _get_hdu(fitsfile)
+    _count_read(hdu.data.nbytes)                                               # read by the renderer
+    return fits.PrimaryHDU(data=hdu.data, header=hdu.header.copy())
+
+
+def _plane_header(header):
+    """
+    Return a copy of a cube header reduced to the first two (image) axes.
+    """
+    header = header.copy()
+    header['naxis'] = 2
+    if ( 'wcsaxes' in header ):
+        header['wcsaxes'] = 2
+    for key in list(header.keys()):
+        if re.match(r'^(NAXIS|CTYPE|CRVAL|CDELT|CRPIX|CUNIT|CROTA|CNAME|CRDER|CSYER)[3-9]$', key) \
+            or re.match(r'^(PC|CD)0*([3-9]_0*[0-9]|[0-9]_0*[3-9])$', key) \
+            or re.match(r'^P[VS]0*[3-9]_0*[0-9]+$', key):
+            del header[key]
+    return header
+
+
+def _plane_view(fitsfile, channel):
+    """
+    Return a single 2D plane of a cube as a view into the memory-mapped data, i.e. without reading
+    it. The channel is indexed in the same way as APLpy's slices argument. Additional degenerate
+    axes (e.g. stokes) use their first plane.
+    """
+    data = _get_hdu(fitsfile).data
+    if ( data.ndim > 2 ):
+        data = data[(0,)*(data.ndim-3)+(int(channel),)]
+    return data
+
+
+def _get_plane(fitsfile, channel):
+    """
+    Return a single 2D plane of a cube as an in-memory array. Only the requested plane is read from
+    the memory-mapped file.
+    """
+    import numpy as np
+
+    plane = np.array(_plane_view(fitsfile, channel))
+    _count_read(plane.nbytes)
+    return plane
+
+
+def _plane_hdu(fitsfile, channel):
+    """
+    Return a 2D PrimaryHDU of a single channel of a cube that can be passed to aplpy.FITSFigure
+    instead of the whole cube.
+    """
+    from astropy.io import fits
+
+    return fits.PrimaryHDU(data=_get_plane(fitsfile, channel), header=_plane_header(_get_header(fitsfile)))
+
+
+def _block_average(data, factor, chunk_rows=256):
+    """
+    Average blocks of factor x factor pixels of a 2D (memory-mapped) array, ignoring NaNs. Trailing
+    rows/columns that do not fill a block are dropped. The input is read in strips of chunk_rows
+    output rows so that memory use stays bounded for huge images.
+    """
+    import warnings
+    import numpy as np
+
+    ny, nx   = data.shape[-2]//factor, data.shape[-1]//factor
+    double   = ( data.dtype.kind == 'f' ) and ( data.dtype.itemsize == 8 )   # also big-endian '>f8' as read from FITS
+    dtype    = np.float64 if double else np.float32
+    averaged = np.empty((ny,nx), dtype=dtype)
+    for row in range(0, ny, chunk_rows):
+        rows  = min(chunk_rows, ny-row)
+        block = np.asarray(data[row*factor:(row+rows)*factor, :nx*factor], dtype=dtype).reshape(rows, factor, nx, factor)
+        _count_read(block.nbytes)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)                    # blocks that are all NaN
+            averaged[row:row+rows] = np.nanmean(block, axis=(1,3))
+    return averaged
+
+
+def _binned_header(header, factor):
+    """
+    Return a copy of a 2D header matching an image block averaged by _block_average.
+    """
+    header = header.copy()
+    for i in ['1','2']:
+        header['naxis'+i] = header['naxis'+i]//factor
+        if ( 'crpix'+i in header ):
+            header['crpix'+i] = (header['crpix'+i]-0.5)/factor+0.5
+        if ( 'cdelt'+i in header ):
+            header['cdelt'+i] *= factor
+        for j in ['1','2']:
+            if ( 'cd'+j+'_'+i in header ):
+                header['cd'+j+'_'+i] *= factor
+    return header
+
+
+def clear_fits_cache():
+    """
+    Close all cached FITS files. Only necessary when files are changed in place without changing
+    their modification time or size, or to release file handles in long running processes.
+    """
+    while _fits_cache:
+        _, hdul = _fits_cache.popitem()
+        hdul.close()
+
+
+###################################################################################################
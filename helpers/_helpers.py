@@ -14,8 +14,11 @@ __all__ = ['hide_deprecationWarnings','hide_nonfunctionalWarnings','hide_FITSwar
 ################
 
 import os
+import sys
+import shutil
 import subprocess
-from astropy.io import fits
+
+from ._log import _info, _warn
 
 
 ###################################################################################################
@@ -65,7 +68,7 @@ def hide_ComparisonWarnings():
 # correct velocity header
 #########################
 
-def m_to_km(pv, overwrite=False, out=None):
+def m_to_km(pv, overwrite=False, out=None, workers=None, raise_errors=True):
 
     """
     convert_velo_info: scale the velocity axis in pV diagrams
@@ -80,6 +83,9 @@ def m_to_km(pv, overwrite=False, out=None):
     !!! given as 0.1km/s in the FITS header but aplpy shows it as 100km/s.
     It is recommended to use the "corrected" images for plotting only.
 
+    Only the header is updated in place, the data section is neither read nor
+    written. Multiple files are processed in parallel.
+
     Mandatory arguments:
         pv          Path and file name of a single pV diagram as FITS file or a list
                     of multiple FITS images.
@@ -89,6 +95,16 @@ def m_to_km(pv, overwrite=False, out=None):
         out         Image name or list of names for output. Default: None
                     If neither overwrite or out are given ".corrected" is appended
                     to the file name.
+        workers     Number of threads for lists of files. Default: None (Python's
+                    default for thread pools)
+        raise_errors
+                    Raise the first error after all files were processed. If False,
+                    errors are only reported in the returned list. Default: True
+
+    Returns:
+        A list with one dict per file with the keys 'file' (input), 'out' (the
+        corrected file), 'status' ('converted', 'unchanged' or 'failed') and
+        'error' (None or the exception).
 
     example:
 
@@ -97,6 +113,8 @@ def m_to_km(pv, overwrite=False, out=None):
         )
     """
 
+    from concurrent.futures import ThreadPoolExecutor
+
     if isinstance(pv, str):
         pv_list = [pv]
         if isinstance(out, str):
@@ -112,31 +130,53 @@ def m_to_km(pv, overwrite=False, out=None):
     else:
         raise TypeError('Input needs to be a single FITS file or list of FITS files. (And out parameter accordingly.)')
 
-    for this_pv, this_out in zip(pv_list,out_list):
+    if ( len(pv_list) == 1 ):
+        results = [_m_to_km_file(pv_list[0], out_list[0], overwrite)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:           # I/O bound, threads are enough
+            results = list(executor.map(_m_to_km_file, pv_list, out_list, [overwrite for i in pv_list]))
+
+    errors = [result['error'] for result in results if result['error']]
+    if errors and raise_errors:
+        raise errors[0]
+    return results
+
+
+def _m_to_km_file(this_pv, this_out, overwrite):
+    # convert a single file, never raises but reports errors in the result
+    from astropy.io import fits
 
-        # get current velocity unit
-        velounit = fits.open(this_pv)[0].header['cunit2']
+    result = {'file': this_pv, 'out': this_pv, 'status': 'failed', 'error': None}
+    try:
+        # get current velocity unit, reading only the header
+        velounit = fits.getheader(this_pv)['cunit2']
 
         # convert to km/s if necessary
         if (velounit == 'm/s'):
             if (overwrite == False):
-                if not ( this_out == None ):
-                    os.system('cp -r '+this_pv+' '+this_out)
-                else:
-                    os.system('cp -r '+this_pv+' '+this_pv+'.corrected')
-                    this_pv = this_pv+'.corrected'
-
-            print('Unit is m/s. Corrrecting to km/s: '+this_pv)
-            im = fits.open(this_pv)[0]
-            im.header['cdelt2'] /= 1e6
-            im.header['crval2'] /= 1e6
-            im.header['cunit2'] = 'km/s'
-            fits.writeto(this_pv, data=im.data, header=im.header, overwrite=True)
-            print('\tNote that the header is now wrong by a factor of 1e3!')
+                if ( this_out == None ):
+                    this_out = this_pv+'.corrected'
+                shutil.copyfile(this_pv, this_out)
+                this_pv = this_out
+            result['out'] = this_pv
+
+            _info('Unit is m/s. Corrrecting to km/s: '+this_pv)
+            with fits.open(this_pv, mode='update', memmap=True) as hdul:       # only the header is written back
+                header = hdul[0].header
+                header['cdelt2'] /= 1e6
+                header['crval2'] /= 1e6
+                header['cunit2'] = 'km/s'
+            _info('\tNote that the header is now wrong by a factor of 1e3!')
+            result['status'] = 'converted'
         elif (velounit == 'km/s'):
-            print('Unit is km/s already: '+this_pv)
+            _info('Unit is km/s already: '+this_pv)
+            result['status'] = 'unchanged'
         else:
             raise TypeError('Unrecognized velocity unit "'+str(velounit)+'": '+this_pv)
+    except Exception as error:
+        _warn('Could not convert '+this_pv+': '+str(error))
+        result['error'] = error
+    return result
 
 
 ###################################################################################################
@@ -144,18 +184,33 @@ def m_to_km(pv, overwrite=False, out=None):
 # trim whitespace in images
 ###########################
 
-def trim_whitespace(images, dpi=300):
-    """Short summary.
+# formats Pillow can trim in-process, everything else (pdf, eps, svg) needs ImageMagick
+_raster_formats = ['.png','.jpg','.jpeg','.tif','.tiff','.bmp','.gif','.webp']
+
+
+def trim_whitespace(images, dpi=300, fuzz=0.01, workers=None):
+    """Crop the uniform border of images.
+
+    Raster images are trimmed in-process with Pillow and NumPy, batches are
+    distributed over a pool of processes. Vector formats are trimmed with
+    ImageMagick's `convert`.
 
     Parameters
     ----------
     images : str or list
         Single file name or list of file names of the images to be trimmed.
     dpi : int
-        The image resolution (caled 'density' in imagemagick). Defaults to 300.
+        The image resolution (caled 'density' in imagemagick). Only used for
+        vector formats. Defaults to 300.
+    fuzz : float
+        Colours that differ by less than this fraction from the colour of the
+        top left pixel count as background, like `-fuzz 1%` in ImageMagick.
+        Defaults to 0.01.
+    workers : int
+        Number of processes for lists of images. Defaults to the number of CPUs.
     """
 
-    import random
+    from concurrent.futures import ProcessPoolExecutor
 
     # try to import tqdm to get a nice progress bar
     try:
@@ -172,32 +227,73 @@ def trim_whitespace(images, dpi=300):
     else:
         raise TypeError("Input needs to be a file name or list thereof.")
 
+    # plots may still be written by the background writer of easy_aplpy.plot
+    writer = sys.modules.get(__name__.split('.')[0]+'.plot._writer')
+    if not ( writer is None ):
+        writer.flush()
+
+    if ( len(imlist) == 1 ):
+        _trim_image(imlist[0], dpi, fuzz)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = executor.map(_trim_image, imlist, [dpi for i in imlist], [fuzz for i in imlist])
+        # use the tqdm progress bar if possible, otherwise count up
+        if check_tqdm:
+            for img in tqdm.tqdm(jobs, total=len(imlist)):
+                pass
+        else:
+            for idx,img in enumerate(jobs):
+                _info("trimmed image "+str(idx+1)+" of "+str(len(imlist))+": "+img)
 
-    # the function that does the actual work
-    def imagemagick_convert_trim(img):
-        # generate temporary file name
-        tmp = int(1e6*random.random())
-        name, fext = os.path.splitext(img)
-        tmp_fname = 'tmp_'+str(tmp)+fext
 
-        try:
-            os.system('convert -density '+str(dpi)+' -fuzz 1% -trim +repage '+img+' '+tmp_fname)
-            os.system('rm -f '+img)
-            os.system('cp '+tmp_fname+' '+img)
-            os.system('rm -rf '+tmp_fname)
-        except:
-            raise Exception("`convert` as part of the Imagemagick package is not installed or not recognized.\nMake sure the correct program reacts to `convert` in the default shell.")
+def _trim_image(img, dpi=300, fuzz=0.01):
+    # the function that does the actual work, runs in the worker processes
+    if ( os.path.splitext(img)[1].lower() in _raster_formats ):
+        _trim_raster(img, fuzz)
+    else:
+        _trim_convert(img, dpi, fuzz)
+    return img
 
 
-    # use the tqdm progress bar if possible, otherwise count up
-    if check_tqdm:
-        for img in tqdm.tqdm(imlist):
-            imagemagick_convert_trim(img)
-    else:
-        for idx,img in enumerate(imlist):
-            print("triming image "+str(idx+1)+" of "+str(len(imlist))) #, end='\r')
-            imagemagick_convert_trim(img)
-        print("\n")
+def _trim_raster(img, fuzz):
+    import numpy as np
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Trimming images requires Pillow.")
+
+    with Image.open(img) as image:
+        image.load()
+    data = np.asarray(image.convert('RGBA') if ( image.mode in ['P','LA','L','1'] ) else image)
+    if ( data.ndim == 2 ):
+        data = data[:,:,None]
+
+    # pixels that differ from the background (top left) colour in any channel
+    scale   = 65535. if ( data.dtype == np.uint16 ) else 255.
+    content = np.any(np.abs(data.astype(np.float32)-data[0,0].astype(np.float32)) > fuzz*scale, axis=-1)
+    rows = np.flatnonzero(content.any(axis=1))
+    cols = np.flatnonzero(content.any(axis=0))
+    if ( len(rows) == 0 ):
+        return                                                                 # nothing but background
+    box = (cols[0], rows[0], cols[-1]+1, rows[-1]+1)
+    if ( box == (0, 0, image.width, image.height) ):
+        return                                                                 # no border to trim
+
+    save_kwargs = {key: image.info[key] for key in ['dpi','icc_profile','transparency'] if ( key in image.info )}
+    tmp_fname = img+'.trim'+os.path.splitext(img)[1]
+    image.crop(box).save(tmp_fname, format=image.format, **save_kwargs)
+    os.replace(tmp_fname, img)
+
+
+def _trim_convert(img, dpi, fuzz):
+    convert = shutil.which('convert')
+    if not convert:
+        raise Exception("Trimming "+os.path.splitext(img)[1]+" files needs `convert` as part of the Imagemagick package, which is not installed or not found.")
+    name, fext = os.path.splitext(img)
+    tmp_fname = name+'.trim'+fext
+    subprocess.check_call([convert, '-density', str(dpi), '-fuzz', str(100.*fuzz)+'%', '-trim', '+repage', img, tmp_fname])
+    os.replace(tmp_fname, img)
 
 
 
@@ -0,0 +1,175 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Logging and stage instrumentation. All messages go through the    #
+# 'easy_aplpy' logger and every plotting stage emits a timed event. #
+#####################################################################
+
+__all__ = ['logger','add_console_handler','add_stage_callback','remove_stage_callback','_info','_warn','_stage','_timing_report']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import sys
+import time
+import logging
+import functools
+from contextlib import contextmanager
+
+from ._fits import _bytes_read, _is_hdu, _file_name
+
+
+###################################################################################################
+
+# logger
+########
+
+logger = logging.getLogger('easy_aplpy')
+
+
+class _ColorFormatter(logging.Formatter):
+    # the console output of easy_aplpy, coloured only on a terminal
+    def __init__(self, stream):
+        logging.Formatter.__init__(self)
+        self.color = hasattr(stream, 'isatty') and stream.isatty()
+
+    def format(self, record):
+        if not self.color:
+            return ( "[easy_aplpy] " if ( record.levelno < logging.WARNING ) else "" )+record.getMessage()
+        if ( record.levelno >= logging.WARNING ):
+            return "\x1b[0;31;40m"+record.getMessage()+"\x1b[0m"
+        return "\x1b[0;34;40m[easy_aplpy]\x1b[0m "+record.getMessage()
+
+
+def add_console_handler(stream=None):
+    """
+    Print the messages of easy_aplpy to stream (default: sys.stdout), coloured if the stream is a
+    terminal. This happens automatically at the first message if logging is not configured at
+    all, i.e. neither the 'easy_aplpy' logger nor the root logger have a handler. Messages are
+    still propagated to the root logger. Returns the handler.
+    """
+    stream  = sys.stdout if ( stream is None ) else stream
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(_ColorFormatter(stream))
+    logger.addHandler(handler)
+    if ( logger.level == logging.NOTSET ):
+        logger.setLevel(logging.INFO)                                          # progress messages are shown by default
+    return handler
+
+
+def _log(level, message):
+    # the console output is attached on demand, so applications can configure logging after the import
+    if not logger.hasHandlers():
+        add_console_handler()
+    logger.log(level, message)
+
+
+def _info(message):
+    _log(logging.INFO, message)
+
+
+def _warn(message):
+    _log(logging.WARNING, message)
+
+
+###################################################################################################
+
+# stage events
+##############
+
+_callbacks = []
+_reports   = []
+_depth     = [0]
+
+
+def add_stage_callback(callback):
+    """
+    Call callback(event) after every plotting stage. The event is a dict with the keys
+        stage       name of the stage, e.g. '_show_contours'
+        file        the fits file the stage works on
+        panel       number of the grid panel (None for single maps)
+        seconds     wall clock duration of the stage
+        bytes_read  bytes of image data read from the fits files during the stage
+        depth       nesting level, e.g. the stages of a grid panel run within '_plot_panel'
+    Stages of grid panels rendered in worker processes (workers=...) are not reported.
+    """
+    if not ( callback in _callbacks ):
+        _callbacks.append(callback)
+
+
+def remove_stage_callback(callback):
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def _stage_context(args, kwargs):
+    # the file and panel a stage works on, taken from its arguments
+    fitsfile = None
+    panel    = kwargs.get('panel')
+    for arg in args:
+        if isinstance(arg, dict) and ( 'num' in arg ) and ( 'file' in arg ):
+            panel = arg
+        elif ( isinstance(arg, str) or _is_hdu(arg) ) and ( fitsfile is None ):
+            fitsfile = _file_name(arg)
+    if ( fitsfile is None ) and panel:
+        fitsfile = _file_name(panel['file'])
+    return fitsfile, (panel['num'] if panel else None)
+
+
+def _emit(event):
+    _log(logging.DEBUG, "stage "+event['stage']+" took "+'{:.3f}'.format(event['seconds'])+" s, file: "+str(event['file'])+", panel: "+str(event['panel']))
+    for report in _reports:
+        report['events'].append(event)
+    for callback in list(_callbacks):
+        callback(event)
+
+
+def _stage(func):
+    """
+    Decorator for plotting stages. Stages are only timed if someone listens: a callback, a timing
+    report or the logger at DEBUG level.
+    """
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        if not ( _callbacks or _reports or logger.isEnabledFor(logging.DEBUG) ):
+            return func(*args, **kwargs)
+        fitsfile, panel = _stage_context(args, kwargs)
+        start_bytes = _bytes_read()
+        start = time.perf_counter()
+        _depth[0] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _depth[0] -= 1
+            _emit({'stage':      func.__name__,
+                   'file':       fitsfile,
+                   'panel':      panel,
+                   'seconds':    time.perf_counter()-start,
+                   'bytes_read': _bytes_read()-start_bytes,
+                   'depth':      _depth[0]
+                  })
+    return timed
+
+
+@contextmanager
+def _timing_report():
+    """
+    Collect all stage events within the context in a report dict with the keys 'events' (list of
+    events, see add_stage_callback), 'stages' (total seconds per stage) and 'seconds' (total time).
+    """
+    report = {'seconds': None, 'events': [], 'stages': {}}
+    _reports.append(report)
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report['seconds'] = time.perf_counter()-start
+        for event in report['events']:
+            report['stages'][event['stage']] = report['stages'].get(event['stage'], 0.)+event['seconds']
+        _reports.remove(report)
+
+
+###################################################################################################
@@ -0,0 +1,111 @@
+#####################################################################
+#                          APLPY PLOTTING                           #
+#####################################################################
+# Conversion between channel numbers and velocities/frequencies of  #
+# the spectral axis of a cube.                                      #
+#####################################################################
+
+__all__ = ['_spectral_axis','_channels_physical']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+from astropy import units as u
+
+from ._fits import _get_header
+
+
+###################################################################################################
+
+_spectral_units = ['m/s','km/s','Hz','kHz','MHz','GHz']
+
+
+def _spectral_axis(header):
+    """
+    Describe the spectral axis of a header: axis number, unit, reference value/pixel, increment,
+    rest frequency (None if not given) and the doppler equivalency matching the axis type.
+    """
+    freqax = None
+    for i in np.arange(1,header['naxis']+1):
+        if ( header.get('cunit'+str(i)) in _spectral_units ):
+            freqax = str(i)
+    if not freqax:
+        raise TypeError("Could not find a velocity/frequency axis in the input image.")
+
+    restfreq = header.get('restfrq', header.get('restfreq'))
+    if restfreq:
+        restfreq = restfreq*u.Hz
+        ctype = str(header.get('ctype'+freqax, '')).upper()
+        if ctype.startswith(('VOPT','FELO')):
+            equivalencies = u.doppler_optical(restfreq)
+        elif ctype.startswith('VELO'):
+            equivalencies = u.doppler_relativistic(restfreq)
+        else:
+            equivalencies = u.doppler_radio(restfreq)
+    else:
+        restfreq = None
+        equivalencies = []
+
+    return {'axis':          int(freqax),
+            'unit':          u.Unit(header['cunit'+freqax]),
+            'crval':         float(header['crval'+freqax]),
+            'cdelt':         float(header['cdelt'+freqax]),
+            'crpix':         int(header['crpix'+freqax]),
+            'restfreq':      restfreq,
+            'equivalencies': equivalencies
+           }
+
+
+###################################################################################################
+
+def _channels_physical(fitsfile, user_channels):
+    """
+    Convert a whole list of channels in one go. Channels can be given as channel numbers (int),
+    as velocities/frequencies (astropy.units) or as a Quantity array. Velocities are converted to
+    frequencies and vice versa using the rest frequency in the header if necessary.
+
+    Returns an integer array of channel numbers and a Quantity array of the physical values in km/s
+    (velocity axis or velocities requested) or GHz (frequency axis or frequencies requested).
+    """
+    axis = _spectral_axis(_get_header(fitsfile))
+
+    if isinstance(user_channels, u.quantity.Quantity):
+        user_channels = np.atleast_1d(user_channels)
+        is_quantity = np.ones(len(user_channels), dtype=bool)
+    else:
+        if not isinstance(user_channels, (list,tuple,np.ndarray)):
+            user_channels = [user_channels]
+        is_quantity = np.array([isinstance(c, u.quantity.Quantity) for c in user_channels], dtype=bool)
+
+    channels = np.zeros(len(user_channels), dtype=int)
+    physical = np.zeros(len(user_channels), dtype=float)                        # in the unit of the axis
+
+    if np.any(~is_quantity):
+        numbers = np.array([c for c,q in zip(user_channels,is_quantity) if not q])
+        if not np.issubdtype(numbers.dtype, np.integer):
+            raise TypeError("channel needs to be channel number (int) or velocity/frequency (astropy.units object.)")
+        channels[~is_quantity] = numbers                                        # channel number already given by user
+        physical[~is_quantity] = (numbers-axis['crpix'])*axis['cdelt']+axis['crval']   # physical value calculated
+
+    if np.any(is_quantity):
+        try:
+            values = u.Quantity([c for c,q in zip(user_channels,is_quantity) if q]).to(axis['unit'], equivalencies=axis['equivalencies']).value
+        except u.UnitConversionError:
+            raise TypeError("Cannot convert the requested channels to the unit of the spectral axis ("+str(axis['unit'])+"). Velocity/frequency conversion requires RESTFRQ in the header.")
+        channels[is_quantity] = ((values-axis['crval'])/axis['cdelt'])+axis['crpix']   # channel number calculated (truncated)
+        physical[is_quantity] = values                                          # physical value already given by user
+
+    # show the physical values as requested by the user or in the type of the axis
+    if np.all(is_quantity):
+        frequency = user_channels[0].unit.physical_type == 'frequency'
+    else:
+        frequency = axis['unit'].physical_type == 'frequency'
+    physical = (physical*axis['unit']).to(u.GHz if frequency else u.km/u.s, equivalencies=axis['equivalencies'])
+    return channels,physical
+
+
+###################################################################################################
@@ -14,8 +14,40 @@ pV diagrams, ... in a quality that (hopefully) allows publishing.
 ################
 
 from ._helpers import *
+from ._contours import clear_contour_cache
+from ._catalogues import clear_catalogue_cache
+from ._regions import clear_region_cache
 from .map import map
 from .grid import grid
+from .template import GridTemplate
+from .batch import batch
+from .movie import frames, movie
+from ._writer import flush
 # from .map_grid import map_grid
 
+
+###################################################################################################
+
+# set default settings
+######################
+
+from .. import helpers
+helpers.hide_deprecationWarnings()
+
+
+###################################################################################################
+
+# warn that APLpy is a mess
+###########################
+
+try:
+    import aplpy
+except ImportError:
+    aplpy = None                                            # engine='wcsaxes' works without APLpy
+if ( aplpy is not None ) and aplpy.version.major!=1:
+    helpers._warn("easy_aplpy only partially works with APLpy 2 and the old APLpy 0 version. Some functionality will raise unsolvable errors.")
+# if aplpy.version.version=='1.1.1':
+#     print("\x1b[0;31;40m"+"APLpy 1.1.1 has problems plotting the beam but newer and older version have even more serious bugs."+"\x1b[0m")
+
+
 ###################################################################################################
@@ -0,0 +1,196 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Catalogue overlays. Source positions are read once into a sorted  #
+# index and only the sources in the visible region are drawn.       #
+#####################################################################
+
+__all__ = ['_draw_catalogue','clear_catalogue_cache']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import numpy as np
+from collections import OrderedDict
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+import easy_aplpy
+from ..helpers._fits import _cache_key
+from ..helpers._log import _info
+from ._overlays import _image_frame, _sky_degrees
+
+
+###################################################################################################
+
+# catalogue index keyed by (file, mtime, size, columns, image frame)
+_catalogue_cache = OrderedDict()
+
+_fits_extensions = ['.fits','.fit','.fts','.fits.gz','.fit.gz']
+
+_default_options = {'columns':   ['ra','dec'],          # longitude and latitude column
+                    'unit':      'deg',                 # unit of the position columns
+                    'frame':     'icrs',                # coordinate frame of the catalogue
+                    'hdu':       1,                     # table extension of FITS catalogues
+                    'delimiter': ',',                   # column separator of text catalogues
+                    'mag':       None,                  # column to scale the marker size with
+                    'mag_range': None,                  # [bright, faint], default: 1st/99th percentile
+                    'sizes':     [40., 2.],             # marker area (points^2) of [bright, faint] sources
+                    'margin':    0.1                    # also draw sources this fraction of the view outside
+                   }
+
+
+def clear_catalogue_cache():
+    """
+    Empty the in-memory catalogue index cache.
+    """
+    _catalogue_cache.clear()
+
+
+###################################################################################################
+
+def _read_columns(catalogue, columns, options):
+    """
+    Read the given columns of a FITS table or a delimited text file with a header line as float
+    arrays. Only these columns are read.
+    """
+    if any(catalogue.lower().endswith(ext) for ext in _fits_extensions):
+        from astropy.io import fits
+        with fits.open(catalogue, memmap=True) as hdul:
+            data = hdul[options['hdu']].data
+            return [np.array(data[column], dtype=float) for column in columns]
+    with open(catalogue) as f:
+        names = [name.strip().strip('#').strip().lower() for name in f.readline().split(options['delimiter'])]
+    missing = [column for column in columns if not ( column.lower() in names )]
+    if missing:
+        raise KeyError("Catalogue: column(s) "+', '.join(missing)+" not found in "+catalogue+".")
+    usecols = [names.index(column.lower()) for column in columns]
+    data = np.loadtxt(catalogue, delimiter=options['delimiter'], skiprows=1, usecols=usecols, ndmin=2, dtype=float)
+    return [data[:,i] for i in range(len(columns))]
+
+
+def _catalogue_index(fitsfile, catalogue, options):
+    """
+    Return the positions of a catalogue in the frame of the image, sorted by latitude so that a
+    latitude range is found with a binary search. Built once per catalogue and image frame.
+    """
+    frame = _image_frame(fitsfile)
+    key = _cache_key(catalogue)+(tuple(options['columns']), options['unit'], options['frame'], options['hdu'], options['mag'], repr(frame))
+    if key in _catalogue_cache:
+        _catalogue_cache.move_to_end(key)
+        return _catalogue_cache[key]
+
+    columns = list(options['columns'])+([options['mag']] if options['mag'] else [])
+    values  = _read_columns(catalogue, columns, options)
+    unit    = u.Unit(options['unit'])
+    lon     = (values[0]*unit).to(u.degree).value
+    lat     = (values[1]*unit).to(u.degree).value
+    good    = np.isfinite(lon) & np.isfinite(lat)
+    lon,lat = lon[good], lat[good]
+    if not ( frame is None ):
+        lon,lat = _sky_degrees(fitsfile, [SkyCoord(lon*u.degree, lat*u.degree, frame=options['frame'])])
+    order = np.argsort(lat, kind='mergesort')
+    index = {'lon': np.ascontiguousarray(lon[order]),
+             'lat': np.ascontiguousarray(lat[order]),
+             'mag': np.ascontiguousarray(values[2][good][order]) if options['mag'] else None,
+             'size': len(lat)
+            }
+    if options['mag']:
+        finite = index['mag'][np.isfinite(index['mag'])]
+        index['mag_range'] = np.percentile(finite, [1,99]) if finite.size else [0.,1.]
+    _info("indexed "+str(index['size'])+" sources of "+catalogue)
+
+    _catalogue_cache[key] = index
+    while ( len(_catalogue_cache) > max(int(easy_aplpy.settings.catalogue_cache_size), 1) ):
+        _catalogue_cache.popitem(last=False)
+    return index
+
+
+###################################################################################################
+
+def _view_box(fig, margin):
+    """
+    Pixel box of the current view enlarged by margin and its extent in world coordinates as
+    (latitude range, longitude center, longitude half width or None if all longitudes are visible).
+    """
+    x0,x1 = sorted(fig._ax1.get_xlim())
+    y0,y1 = sorted(fig._ax1.get_ylim())
+    dx,dy = margin*(x1-x0), margin*(y1-y0)
+    box   = [x0-dx, x1+dx, y0-dy, y1+dy]
+
+    # sample the border, lines of constant latitude are curved
+    t  = np.linspace(0., 1., 17)
+    xs = np.concatenate([box[0]+t*(box[1]-box[0]), np.full_like(t, box[1]), box[0]+t*(box[1]-box[0]), np.full_like(t, box[0])])
+    ys = np.concatenate([np.full_like(t, box[2]), box[2]+t*(box[3]-box[2]), np.full_like(t, box[3]), box[2]+t*(box[3]-box[2])])
+    lon,lat = fig.pixel2world(xs, ys)
+    lon0,_  = fig.pixel2world(np.array([0.5*(box[0]+box[1])]), np.array([0.5*(box[2]+box[3])]))
+    lon0    = float(np.atleast_1d(lon0)[0])
+    dlon    = (np.asarray(lon)-lon0+180.)%360.-180.
+    lat_range = [np.nanmin(lat), np.nanmax(lat)]
+    half_width = np.nanmax(np.abs(dlon))
+
+    # a pole in the view includes all longitudes
+    for pole in [90.,-90.]:
+        px,py = fig.world2pixel(np.array([lon0]), np.array([pole]))
+        px,py = float(np.atleast_1d(px)[0]), float(np.atleast_1d(py)[0])
+        if np.isfinite(px) and np.isfinite(py) and ( box[0] <= px <= box[1] ) and ( box[2] <= py <= box[3] ):
+            lat_range  = [min(lat_range[0], pole), max(lat_range[1], pole)]
+            half_width = None
+    return box, lat_range, lon0, half_width
+
+
+def _visible_sources(fig, index, margin):
+    # latitude strip by binary search, then longitude and exact pixel test on the strip only
+    box, lat_range, lon0, half_width = _view_box(fig, margin)
+    start = np.searchsorted(index['lat'], lat_range[0], side='left')
+    stop  = np.searchsorted(index['lat'], lat_range[1], side='right')
+    lon = index['lon'][start:stop]
+    lat = index['lat'][start:stop]
+    keep = np.arange(start, stop)
+    if not ( half_width is None ):
+        near = np.abs((lon-lon0+180.)%360.-180.) <= half_width
+        lon, lat, keep = lon[near], lat[near], keep[near]
+    if len(keep):
+        px,py  = fig.world2pixel(lon, lat)
+        inside = ( px >= box[0] ) & ( px <= box[1] ) & ( py >= box[2] ) & ( py <= box[3] )
+        lon, lat, keep = lon[inside], lat[inside], keep[inside]
+    return lon, lat, keep
+
+
+def _draw_catalogue(fitsfile, fig, element):
+    """
+    Draw a catalogue element [file, marker kwargs] or [file, options, marker kwargs] as a single
+    marker collection containing only the sources within the current view (plus a margin).
+    """
+    if ( len(element) == 2 ):
+        options, marker_kwargs = {}, element[1]
+    elif ( len(element) == 3 ):
+        options, marker_kwargs = element[1], element[2]
+    else:
+        raise TypeError("Catalogue: give [file, kwargs] or [file, options, kwargs].")
+    unknown = [key for key in options if not ( key in _default_options )]
+    if unknown:
+        raise TypeError("Catalogue: unknown option(s) "+', '.join(unknown)+".")
+    options = dict(_default_options, **options)
+
+    index = _catalogue_index(fitsfile, element[0], options)
+    lon, lat, keep = _visible_sources(fig, index, options['margin'])
+    _info("drawing "+str(len(keep))+" of "+str(index['size'])+" sources of "+os.path.basename(element[0]))
+    if not len(keep):
+        return
+    marker_kwargs = dict(marker_kwargs)
+    if options['mag']:
+        bright, faint = options['mag_range'] if options['mag_range'] else index['mag_range']
+        mag = index['mag'][keep]
+        if ( bright > faint ):                                                 # e.g. fluxes instead of magnitudes
+            bright, faint, mag = -bright, -faint, -mag
+        sizes = np.interp(mag, [bright, faint], options['sizes'])
+        marker_kwargs['s'] = np.where(np.isfinite(sizes), sizes, options['sizes'][1])
+    fig.show_markers(xw=lon, yw=lat, **marker_kwargs)
+
+
+###################################################################################################
@@ -0,0 +1,250 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Contour geometry cache. Contours of the same file, slice, levels  #
+# and smoothing are only computed once and reused by all panels.    #
+#####################################################################
+
+__all__ = ['_draw_contour','_label_contour','clear_contour_cache']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import hashlib
+import numpy as np
+from collections import OrderedDict
+import matplotlib as mpl
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+import easy_aplpy
+from ..helpers._fits import _cache_key, _get_header, _get_plane, _plane_header, _copy_hdu, _plane_hdu
+
+
+###################################################################################################
+
+# contour segments in world coordinates keyed by (file, mtime, size, slice, levels, smoothing)
+_contour_cache = OrderedDict()
+
+# contour kwargs that can be applied to the cached geometry
+_cacheable_kwargs = ['linewidths','linestyles','alpha','zorder','smooth','kernel']
+
+
+def clear_contour_cache():
+    """
+    Empty the in-memory contour cache. The on-disk store (settings.contour_cache_dir) is not touched.
+    """
+    _contour_cache.clear()
+
+
+###################################################################################################
+
+def _contour_cacheable(fitsfile, source, levels, contour_kwargs, kwargs):
+    if not ( easy_aplpy.settings.contour_cache ):
+        return False
+    if not isinstance(source, str) or ( 'clabel' in kwargs ) or not ( kwargs.get('imtype') == 'pp' ):
+        return False                                                           # clabel needs a real ContourSet
+    if not isinstance(levels, (list,tuple,np.ndarray)):
+        return False                                                           # automatic levels depend on the data
+    if [key for key in contour_kwargs if not key in _cacheable_kwargs]:
+        return False
+    # the cached geometry is stored in world coordinates of the contour image
+    image_header   = _get_header(fitsfile)
+    contour_header = _get_header(source)
+    for key in ['ctype1','ctype2','radesys','equinox']:
+        if not ( str(image_header.get(key))[:4] == str(contour_header.get(key))[:4] ):
+            return False
+    return True
+
+
+def _smooth(image, smooth, kernel):
+    # same smoothing as aplpy's show_contour
+    from astropy.convolution import convolve, Gaussian2DKernel, Box2DKernel
+    size = int(smooth*5)//2*2+1
+    if ( kernel == 'gauss' ):
+        kernel = Gaussian2DKernel(smooth, x_size=size, y_size=size)
+    elif ( kernel == 'box' ):
+        kernel = Box2DKernel(smooth, x_size=size, y_size=size)
+    else:
+        raise ValueError("Contour: kernel must be 'gauss' or 'box' for cached contours.")
+    return convolve(image, kernel, boundary='extend')
+
+
+def _compute_segments(source, channel, levels, smooth, kernel):
+    from astropy.wcs import WCS
+
+    image = _get_plane(source, 0 if ( channel is None ) else channel)
+    if smooth:
+        image = _smooth(image, smooth, kernel)
+    ax = Figure().add_subplot(111)                                             # throwaway axes, never drawn
+    cs = ax.contour(image, levels)
+    wcs = WCS(_plane_header(_get_header(source)))
+    segments = []
+    for level_segs in cs.allsegs:
+        segments.append([wcs.wcs_pix2world(seg, 0) for seg in level_segs if ( len(seg) > 1 )])
+    return segments
+
+
+def _store_path(key):
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(easy_aplpy.settings.contour_cache_dir, name+'.npz')
+
+
+def _load_segments(path):
+    with np.load(path) as store:
+        points, lengths, counts = store['points'], store['lengths'], store['counts']
+    segs = np.split(points, np.cumsum(lengths)[:-1]) if len(lengths) else []
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    return [segs[bounds[i]:bounds[i+1]] for i in range(len(counts))]
+
+
+def _save_segments(path, segments):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    flat = [seg for level_segs in segments for seg in level_segs]
+    np.savez(path,
+             points  = np.concatenate(flat) if flat else np.zeros((0,2)),
+             lengths = np.array([len(seg) for seg in flat], dtype=int),
+             counts  = np.array([len(level_segs) for level_segs in segments], dtype=int)
+            )
+
+
+def _contour_segments(source, channel, levels, smooth=None, kernel='gauss'):
+    """
+    Return the contour lines of a file as list (one entry per level) of lists of (N,2) arrays in
+    world coordinates. Results are kept in memory and, if settings.contour_cache_dir is set, on disk.
+    """
+    key = _cache_key(source)+(None if ( channel is None ) else int(channel), tuple(float(l) for l in levels), smooth, kernel)
+    if key in _contour_cache:
+        _contour_cache.move_to_end(key)
+        return _contour_cache[key]
+
+    segments = None
+    if easy_aplpy.settings.contour_cache_dir:
+        path = _store_path(key)
+        if os.path.exists(path):
+            segments = _load_segments(path)
+    if segments is None:
+        segments = _compute_segments(source, channel, levels, smooth, kernel)
+        if easy_aplpy.settings.contour_cache_dir:
+            _save_segments(path, segments)
+
+    _contour_cache[key] = segments
+    while ( len(_contour_cache) > max(int(easy_aplpy.settings.contour_cache_size), 1) ):
+        _contour_cache.popitem(last=False)
+    return segments
+
+
+###################################################################################################
+
+class _ContourLayer(object):
+    """
+    The level collections of a cached contour element registered as a single layer, so that
+    remove_layer, hide_layer, show_layer and list_layers treat it like a ContourSet.
+    """
+    def __init__(self, collections):
+        self.collections = collections
+
+    def remove(self):
+        for collection in self.collections:
+            collection.remove()
+
+    def get_visible(self):
+        return any(collection.get_visible() for collection in self.collections)
+
+    def set_visible(self, visible):
+        for collection in self.collections:
+            collection.set_visible(visible)
+
+    def set_label(self, label):
+        # the legend shows the first level like for a ContourSet
+        if self.collections:
+            self.collections[0].set_label(label)
+
+
+def _contour_layer_name(fig):
+    # next name of the counter show_contour uses, cached and drawn contours are numbered alike
+    if hasattr(fig, '_layer_name'):                                            # WCSFigure
+        return fig._layer_name(None, 'contour_set')
+    fig._contour_counter += 1
+    return 'contour_set_'+str(fig._contour_counter)
+
+
+def _draw_cached_contour(fig, segments, levels, colors, contour_kwargs):
+    if isinstance(colors, str) or ( colors is None ):
+        colors = [colors if colors else mpl.rcParams['lines.color']]
+    linewidths = contour_kwargs.get('linewidths', mpl.rcParams['lines.linewidth'])
+    linestyles = contour_kwargs.get('linestyles')
+    if not isinstance(linewidths, (list,tuple,np.ndarray)):
+        linewidths = [linewidths]
+    if not isinstance(linestyles, (list,tuple)):
+        linestyles = [linestyles]
+
+    collections = []
+    for idx, (level, level_segs) in enumerate(zip(levels, segments)):
+        linestyle = linestyles[idx%len(linestyles)]
+        if ( linestyle is None ):                                              # matplotlib default for single colored contours
+            linestyle = mpl.rcParams['contour.negative_linestyle'] if ( level < 0 ) and ( len(colors) == 1 ) else 'solid'
+        pixel_segs = []
+        if level_segs:                                                         # transform all lines of a level at once
+            world = np.concatenate(level_segs)
+            x,y   = fig.world2pixel(world[:,0], world[:,1])
+            pixel_segs = np.split(np.column_stack([x,y]), np.cumsum([len(seg) for seg in level_segs])[:-1])
+        collection = LineCollection(pixel_segs,
+                                    colors     = colors[idx%len(colors)],
+                                    linewidths = linewidths[idx%len(linewidths)],
+                                    linestyles = linestyle,
+                                    alpha      = contour_kwargs.get('alpha'),
+                                    zorder     = contour_kwargs.get('zorder', 2)
+                                   )
+        fig._ax1.add_collection(collection)                                    # one collection per level like a ContourSet
+        collections.append(collection)
+    return _ContourLayer(collections)
+
+
+def _label_contour(layer, label):
+    """
+    Label a contour layer for the legend. The legend shows the first level of the layer: cached
+    contours and ContourSets of matplotlib < 3.8 hold one collection per level, a ContourSet of
+    matplotlib >= 3.8 is a single artist without legend handler and gets a line as proxy.
+    """
+    from matplotlib.collections import Collection
+    from matplotlib.contour import ContourSet
+    from matplotlib.lines import Line2D
+    if isinstance(layer, ContourSet) and isinstance(layer, Collection):
+        proxy = Line2D([], [], color=layer.get_edgecolor()[0], linewidth=layer.get_linewidth()[0], label=label)
+        layer.axes.add_line(proxy)
+    elif isinstance(layer, ContourSet):
+        layer.collections[0].set_label(label)
+    else:
+        layer.set_label(label)
+
+
+def _draw_contour(fitsfile, fig, source, channel, levels, colors, contour_kwargs, kwargs):
+    """
+    Draw a single contour element. Use the cached geometry if possible and fall back to aplpy's
+    show_contour otherwise (contour labels, automatic levels, in-memory data, other coordinate
+    frames, unsupported kwargs). Either way the element is registered as layer 'contour_set_N'
+    (or contour_kwargs['layer']), which is returned.
+    """
+    contour_kwargs = dict(contour_kwargs)
+    layer = contour_kwargs.pop('layer', None) or _contour_layer_name(fig)
+    if _contour_cacheable(fitsfile, source, levels, contour_kwargs, kwargs):
+        segments = _contour_segments(source, channel, levels, contour_kwargs.get('smooth'), contour_kwargs.get('kernel','gauss'))
+        fig.remove_layer(layer, raise_exception=False)
+        fig._layers[layer] = _draw_cached_contour(fig, segments, levels, colors, contour_kwargs)
+    elif isinstance(source, str):
+        data = _copy_hdu(source) if ( channel is None ) else _plane_hdu(source, channel)
+        fig.show_contour(data=data, levels=levels, colors=colors, layer=layer, **contour_kwargs)
+    elif ( channel is None ):
+        fig.show_contour(data=source, levels=levels, colors=colors, layer=layer, **contour_kwargs)
+    else:
+        fig.show_contour(data=source, slices=[channel], dimensions=[0,1], levels=levels, colors=colors, layer=layer, **contour_kwargs)
+    return fig._layers[layer]
+
+
+###################################################################################################
@@ -5,7 +5,7 @@
 # pV diagrams, ... in a quality that (hopefully) allows publishing. #
 #####################################################################
 
-__all__ = ['_check_image_type','_set_up_figure','_set_up_grid','_set_up_panel_figure','_grid_panels','_show_map','_recenter_plot','_test_recenter_format','_show_contours','_overplot_regions','_show_colorbar','_show_grid_colorbar','_show_scalebar','_show_beam','_show_label','_show_overlays','_format_grid_ticksNlabels','_show_ticksNlabels','_show_legend','_show_channel_label','_save_figure']
+__all__ = ['_apply_rc','_usetex','_escape_text','_check_image_type','_engine','_fits_figure','_set_up_figure','_map_limits','_output_dpi','_binning_factor','_display_hdu','_set_up_grid','_set_up_panel_figure','_grid_panels','_panel_channels','_grid_limits','_show_map','_recenter_plot','_test_recenter_format','_show_contours','_overplot_regions','_show_colorbar','_show_grid_colorbar','_show_scalebar','_show_beam','_show_label','_show_overlays','_show_catalogues','_format_grid_ticksNlabels','_show_ticksNlabels','_show_legend','_show_channel_label','_show_channel_contours','_swap_image','_plot_panel','_save_figure','_render_output']
 
 
 ###################################################################################################
@@ -13,8 +13,9 @@ __all__ = ['_check_image_type','_set_up_figure','_set_up_grid','_set_up_panel_fi
 # common imports
 ################
 
+import io
 import os
-import aplpy
+import functools
 import numpy as np
 import warnings
 from astropy.coordinates import SkyCoord as SkyCoord
@@ -24,9 +25,23 @@ from astropy.io import fits
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 from matplotlib import rc as rc
-rc('text',usetex=True)
 
 import easy_aplpy
+from ..helpers._fits import _file_name, _get_hdu, _get_header, _copy_hdu, _plane_hdu, _plane_header, _plane_view, _block_average, _binned_header
+from ..helpers._spectral import _channels_physical
+from ..helpers._autoscale import _channel_limits, _image_limits
+from ._contours import _draw_contour, _label_contour
+from ._catalogues import _draw_catalogue
+from ._regions import _draw_regions
+from ._overlays import _coord_list, _coord_counts, _sky_degrees, _broadcast_degrees, _group_elements
+from ._writer import _write_output, _compress_png, _pillow_available
+from ..helpers._log import _info, _warn, _stage
+from ._wcsaxes import WCSFigure
+
+try:
+    import aplpy
+except ImportError:                                                            # only needed for engine='aplpy'
+    aplpy = None
 
 
 ###################################################################################################
@@ -37,8 +52,45 @@ import easy_aplpy
 #
 ###################################################################################################
 
+def _apply_rc():
+    # global matplotlib settings, applied when plotting instead of when importing easy_aplpy
+    if ( easy_aplpy.settings.text_engine == 'tex' ):
+        rc('text',usetex=True)
+        _set_tex_cache()
+    elif ( easy_aplpy.settings.text_engine == 'mathtext' ):
+        rc('text',usetex=False)
+    else:
+        raise ValueError("Unknown text_engine '"+str(easy_aplpy.settings.text_engine)+"'. Use 'tex' or 'mathtext'.")
+
+
+def _set_tex_cache():
+    # keep typeset TeX strings in a persistent directory so they are reused across runs
+    cache_dir = easy_aplpy.settings.tex_cache_dir
+    if cache_dir:
+        from matplotlib import texmanager
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        if ( '_texcache' in vars(texmanager.TexManager) ):               # matplotlib >= 3.6
+            texmanager.TexManager._texcache = cache_dir
+        else:
+            texmanager.TexManager.texcache = cache_dir
+
+
+def _usetex():
+    return ( easy_aplpy.settings.text_engine == 'tex' )
+
+
+def _escape_text(text):
+    # underscores need escaping only when typeset with TeX
+    if _usetex():
+        return text.replace('_','$\_$')
+    return text
+
+
+###################################################################################################
+
 def _check_image_type(fitsfile, kwargs):
-    header = fits.open(fitsfile)[0].header
+    header = _get_header(fitsfile)
     ctypes = [header['ctype'+str(i)] for i in np.arange(1,1+header['naxis'])]
     if ( [i for i in ctypes if i in ['OFFSET','offset','POSITION','position']] ):
         kwargs['imtype'] = 'pv'
@@ -49,19 +101,24 @@ def _check_image_type(fitsfile, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _set_up_figure(fitsfile, kwargs):
-    print("\x1b[0;34;40m[easy_aplpy]\x1b[0m plotting map "+fitsfile)
+    _info("plotting map "+_file_name(fitsfile))
+    _apply_rc()
     figsize = kwargs.get('figsize', None)     # A4 in inches: (8.267,11.692)
     channel = kwargs.get('channel', None)
-    if ( channel == None ):
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            fig = aplpy.FITSFigure(fitsfile, figsize=figsize)
-    else:
+    if not ( channel == None ):
         channel,physical = _channel_physical(fitsfile, channel)
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            fig = aplpy.FITSFigure(fitsfile, slices=[channel], figsize=figsize)
+    size = figsize if figsize else mpl.rcParams['figure.figsize']
+    hdu  = _display_hdu(fitsfile, channel, kwargs, 0.8*size[0], 0.8*size[1])    # aplpy's default axes cover 80% of the figure
+    _map_limits(fitsfile, hdu.data, kwargs)
+    figure = _recycle_figure(kwargs.get('figure'), figsize)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        if ( figure is None ):
+            fig = _fits_figure(hdu, kwargs, figsize=figsize)
+        else:
+            fig = _fits_figure(hdu, kwargs, figure=figure)
     # l = fig._ax1.figure.subplotpars.left
     # r = fig._ax1.figure.subplotpars.right
     # t = fig._ax1.figure.subplotpars.top
@@ -74,69 +131,157 @@ def _set_up_figure(fitsfile, kwargs):
     return fig
 
 
+@_stage
+def _map_limits(fitsfile, data, kwargs):
+    # autoscale from a sample of the displayed image instead of letting the whole image be read
+    vmin = kwargs.get('vmin')
+    vmax = kwargs.get('vmax')
+    if ( vmin is None ) or ( vmax is None ):
+        auto_min, auto_max = _image_limits(data)
+        kwargs['vmin'] = auto_min if ( vmin is None ) else vmin
+        kwargs['vmax'] = auto_max if ( vmax is None ) else vmax
+
+
+###################################################################################################
+
+def _engine(kwargs):
+    engine = kwargs.get('engine', easy_aplpy.settings.engine)
+    if not ( engine in ['aplpy','wcsaxes'] ):
+        raise ValueError("Unknown engine '"+str(engine)+"'. Use 'aplpy' or 'wcsaxes'.")
+    if ( engine == 'aplpy' ) and ( aplpy is None ):
+        raise ImportError("APLpy is not installed. Install APLpy or use engine='wcsaxes'.")
+    return engine
+
+
+def _fits_figure(hdu, kwargs, **fig_kwargs):
+    # the figure object all stages draw on: aplpy.FITSFigure or its WCSAxes replacement
+    if ( _engine(kwargs) == 'wcsaxes' ):
+        return WCSFigure(hdu, **fig_kwargs)
+    return aplpy.FITSFigure(hdu, **fig_kwargs)
+
+
+###################################################################################################
+
+def _output_dpi(kwargs):
+    # the highest resolution of all outputs, 300 is the default of _save_figure
+    out  = kwargs.get('out')
+    dpis = [( output.get('dpi') or 300 ) if isinstance(output, dict) else 300 for output in ( out if isinstance(out, list) else [out] )]
+    return max(dpis)
+
+
+def _binning_factor(fitsfile, kwargs, width, height):
+    # number of image pixels per output pixel in an axes of width x height inches
+    downsample = kwargs.get('downsample', easy_aplpy.settings.downsample)
+    if ( downsample is False ) or ( downsample is None ) or ( kwargs.get('imtype') == 'pv' ):
+        return 1
+    if not ( downsample is True ):
+        return int(downsample)                                                 # factor given by the user
+    header = _get_header(fitsfile)
+    nx = header['naxis1']
+    ny = header['naxis2']
+
+    # only the recentered part of the image is visible
+    recenter = kwargs.get('recenter')
+    if not ( recenter is None ):
+        from astropy.wcs import WCS
+        from astropy.wcs.utils import proj_plane_pixel_scales
+        scales = proj_plane_pixel_scales(WCS(_plane_header(header)).celestial)  # degrees per pixel
+        if ( len(recenter) == 2 ):
+            visible = [2.*recenter[1].to(u.degree).value, 2.*recenter[1].to(u.degree).value]
+        else:
+            visible = [recenter[1].to(u.degree).value, recenter[2].to(u.degree).value]
+        nx = min(nx, visible[0]/scales[0])
+        ny = min(ny, visible[1]/scales[1])
+
+    dpi = _output_dpi(kwargs)
+    pixels_per_output = max(nx/(width*dpi), ny/(height*dpi))
+    return max(int(pixels_per_output/easy_aplpy.settings.downsample_oversampling), 1)
+
+
+def _display_hdu(fitsfile, channel, kwargs, width=None, height=None):
+    """
+    HDU of the image (or the channel of a cube) to show in an axes of width x height inches. Images
+    that have more pixels than the output are block averaged to the output resolution before they
+    are handed to APLpy. The binning factor of each file is stored in kwargs['binning'] and reused
+    for all panels and frames of that file.
+    """
+    binning = kwargs.setdefault('binning', {})
+    if not ( fitsfile in binning ):
+        binning[fitsfile] = _binning_factor(fitsfile, kwargs, width, height)
+        if ( binning[fitsfile] > 1 ) and ( channel is None ) and ( _get_hdu(fitsfile).data.ndim > 2 ):
+            binning[fitsfile] = 1                                              # aplpy selects the slice of full cubes
+        if ( binning[fitsfile] > 1 ):
+            _info("averaging "+str(binning[fitsfile])+"x"+str(binning[fitsfile])+" pixel blocks of "+_file_name(fitsfile)+" to match the output resolution")
+    factor = binning[fitsfile]
+    if ( factor > 1 ):
+        header = _binned_header(_plane_header(_get_header(fitsfile)), factor)
+        return fits.PrimaryHDU(data=_block_average(_plane_view(fitsfile, 0 if ( channel is None ) else channel), factor), header=header)
+    if ( channel is None ):
+        return _copy_hdu(fitsfile)
+    return _plane_hdu(fitsfile, channel)
+
+
 ###################################################################################################
 
 def _channel_physical(fitsfile, user_channel):
-    header = fits.open(fitsfile)[0].header
-    naxis = header['naxis']
-    #TODO automatically convert velocity/frequency if necessary: http://docs.astropy.org/en/stable/units/equivalencies.html#spectral-doppler-equivalencies
-    for i in np.arange(1,naxis+1):
-        if header['cunit'+str(i)] in ['m/s','km/s','Hz','kHz','MHz','GHz']:
-            freqax = str(i)
-    if not freqax:
-        raise TypeError("Could not find a velocity/frequency axis in the input image.")
-    crval = u.Quantity(str(header['crval'+freqax])+header['cunit'+freqax])
-    cdelt = u.Quantity(str(header['cdelt'+freqax])+header['cunit'+freqax])
-    crpix = int(header['crpix'+freqax])
-
-    if isinstance(user_channel, (int,np.int64,np.int32,np.int16)):
-        channel  = user_channel                                                # channel number already given by user
-        physical = (user_channel-crpix)*cdelt+crval                            # physical value calculated
-    elif isinstance(user_channel, u.quantity.Quantity):
-        channel  = int(((user_channel-crval)/cdelt)+crpix)                     # channel number calculated
-        physical = user_channel                                                # physical value already given by user
-    else:
-        raise TypeError("channel needs to be channel number (int) or velocity/frequency (astropy.units object.)")
-    if ( 'Hz' in str(physical) ):
-        physical = physical.to(u.GHz)
-    if ( 'm / s' in str(physical) ):
-        physical = physical.to(u.km/u.s)
-    return channel,physical
+    channels,physicals = _channels_physical(fitsfile, [user_channel])
+    return int(channels[0]),physicals[0]
 
 
 ###################################################################################################
 
+@_stage
 def _set_up_grid(fitsfile, shape, kwargs):
-    print("\x1b[0;34;40m[easy_aplpy]\x1b[0m plotting a "+str(shape[0])+"x"+str(shape[1])+" grid")
+    _info("plotting a "+str(shape[0])+"x"+str(shape[1])+" grid")
+    _apply_rc()
     figsize = kwargs.get('figsize', (8.267,11.692))     # A4 in inches
-    main_fig = plt.figure(figsize=figsize)
+    main_fig = _recycle_figure(kwargs.get('figure'), figsize)
+    if ( main_fig is None ):
+        main_fig = plt.figure(figsize=figsize)
     return main_fig
 
 
 ###################################################################################################
 
+def _recycle_figure(figure, figsize):
+    # reuse a figure given by the user instead of creating a new one
+    if ( figure is None ):
+        return None
+    figure.clf()
+    figure.set_size_inches(figsize if figsize else mpl.rcParams['figure.figsize'])
+    figure.set_dpi(mpl.rcParams['figure.dpi'])
+    return figure
+
+
+###################################################################################################
+
+@_stage
 def _set_up_panel_figure(main_fig, panel, kwargs):
     if ( panel['type'] == 'map' ):
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m plotting panel "+str(panel['num']+1)+" of "+str(panel['npanels'])+", file: "+panel['file'])
+        _info("plotting panel "+str(panel['num']+1)+" of "+str(panel['npanels'])+", file: "+_file_name(panel['file']))
     elif ( panel['type'] == 'colorbar' ):
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m plotting panel "+str(panel['num']+1)+" of "+str(panel['npanels'])+", colorbar")
+        _info("plotting panel "+str(panel['num']+1)+" of "+str(panel['npanels'])+", colorbar")
+    _apply_rc()
     figsize = kwargs.get('figsize', (8.267,11.692))     # A4 in inches
     with warnings.catch_warnings():
         warnings.filterwarnings("ignore")
-        fig = aplpy.FITSFigure(panel['file'], figure=main_fig, subplot=[panel['x'],panel['y'],panel['width'],panel['height']], dimensions=[0,1], slices=[int(panel['channel'])])
+        # only the plane of this panel is read from the memory-mapped cube
+        hdu = _display_hdu(panel['file'], panel['channel'], kwargs, panel['width']*figsize[0], panel['height']*figsize[1])
+        fig = _fits_figure(hdu, kwargs, figure=main_fig, subplot=[panel['x'],panel['y'],panel['width'],panel['height']])
     return fig
 
 
 ###################################################################################################
 
+@_stage
 def _grid_panels(fitsfile, shape, channels, kwargs):
     ncols = float(shape[0])                                                                       # convert to nrows/ncols to float for python 2 compatibility
     nrows = float(shape[1])                                                                       # convert to nrows/ncols to float for python 2 compatibility
-    head = fits.open(fitsfile)[0].header
+    head = _get_header(fitsfile)
     if ( 'bunit' in head ):
         bunit = head['bunit']
     else:
-        print("Header keyword 'BUNIT' not present in "+fitsfile)
+        _warn("Header keyword 'BUNIT' not present in "+_file_name(fitsfile))
         bunit = 'unknown quantity'
     colorbar = kwargs.get('colorbar', ['right',bunit])        # add the colorbar panel
 
@@ -147,20 +292,16 @@ def _grid_panels(fitsfile, shape, channels, kwargs):
     panels = []
     # if isinstance(channels,np.ndarray):               # I can't remember which problem made this step necessary
     #     channels = channels.tolist()                  # but now it causes more harm than good
-    for idx, channel in enumerate(channels):
+
+    channels,physicals = _panel_channels(fitsfile, channels, kwargs)
+
+    for idx, (channel,physical) in enumerate(zip(channels,physicals)):
         pos = ''
         if ( idx%ncols == 0 ):
             pos += 'left'
         if ( idx >= (nrows-1)*ncols ):
             pos += 'bottom'
 
-        # set channel label type
-        physical = None
-        channel_label = kwargs.get('channel_label','physical')
-        if isinstance(channel_label,str):
-            if ( channel_label == 'physical' ):
-                channel,physical = _channel_physical(fitsfile,channel)
-
         panels.append({'num': idx,
                        'npanels': shape[0]*shape[1],
                        'position': pos,
@@ -206,8 +347,32 @@ def _grid_panels(fitsfile, shape, channels, kwargs):
     return panels
 
 
+def _panel_channels(fitsfile, channels, kwargs):
+    # set channel label type, convert all channels at once
+    physicals = [None for channel in channels]
+    channel_label = kwargs.get('channel_label','physical')
+    if isinstance(channel_label,str):
+        if ( channel_label == 'physical' ):
+            channels,physicals = _channels_physical(fitsfile,channels)
+    return channels,physicals
+
+
+@_stage
+def _grid_limits(fitsfile, panels, kwargs):
+    # one colour scale for all panels and the colorbar, computed once from samples of all channels
+    vmin = kwargs.get('vmin')
+    vmax = kwargs.get('vmax')
+    if ( vmin is None ) or ( vmax is None ):
+        channels = [panel['channel'] for panel in panels if ( panel['type'] == 'map' )]
+        auto_min, auto_max = _channel_limits(fitsfile, channels)
+        kwargs['vmin'] = auto_min if ( vmin is None ) else vmin
+        kwargs['vmax'] = auto_max if ( vmax is None ) else vmax
+        _info("colour scale of all panels: "+'{:.4g}'.format(kwargs['vmin'])+" to "+'{:.4g}'.format(kwargs['vmax']))
+
+
 ###################################################################################################
 
+@_stage
 def _show_map(fitsfile, fig, kwargs):
     cmap     = kwargs.get('cmap', 'viridis')                                   # the recommended cmap
     stretch  = kwargs.get('stretch', 'linear')
@@ -224,11 +389,12 @@ def _show_map(fitsfile, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _recenter_plot(fitsfile, fig, kwargs):
     recenter = kwargs.get('recenter')
     imtype = kwargs.get('imtype')
 
-    if (aplpy.version.major > 1) and (fits.getheader(fitsfile)['naxis']>2):
+    if ( _engine(kwargs) == 'aplpy' ) and (aplpy.version.major > 1) and (_get_header(fitsfile)['naxis']>2):
         raise Exception("Recentering cubes is not possible in APLpy 2. Use APLpy<2 or do not use recenter.")
 
     if ( imtype == 'pp' ):
@@ -240,7 +406,7 @@ def _recenter_plot(fitsfile, fig, kwargs):
     if ( imtype == 'pv' ):
         if not ( recenter is None ):
             if ( len(recenter) == 4 ):
-                header = fits.open(fitsfile)[0].header
+                header = _get_header(fitsfile)
                 cunit1 = u.Quantity('1'+header['cunit1'])
                 cunit2 = u.Quantity('1'+header['cunit2'])
                 fig.recenter((recenter[0].to(cunit1.unit)).value, (recenter[1].to(cunit2.unit)).value, width=(recenter[2].to(cunit1.unit)).value, height=(recenter[3].to(cunit2.unit)).value)
@@ -261,6 +427,7 @@ def _test_recenter_format(recenter):
 
 ###################################################################################################
 
+@_stage
 def _show_contours(fitsfile, fig, kwargs, panel=None):
     contours = kwargs.get('contours')
     clabel   = kwargs.get('clabel')
@@ -269,64 +436,70 @@ def _show_contours(fitsfile, fig, kwargs, panel=None):
         if panel:
             contours = contours[panel['num']]                                  # get the correct set of contours for this panel
         if contours:
-            contournum = 0                          # conting variable for # of contours
+            # look up all contour slices given as velocity/frequency at once
+            spectral = [idx for idx,cont in enumerate(contours) if ( len(cont) == 4 ) and isinstance(cont[1],(u.quantity.Quantity))]
+            if spectral:
+                chans,_ = _channels_physical(fitsfile, [contours[idx][1] for idx in spectral])
+                chans   = dict(zip(spectral, chans))
+
             for idx,cont in enumerate(contours):
                 if len(cont) == 3:
-                    fig.show_contour(data=cont[0], levels=cont[1], colors=cont[2])
+                    layer = _draw_contour(fitsfile, fig, cont[0], None, cont[1], cont[2], {}, kwargs)
                 elif len(cont) == 4:
                     # two options when four arguments are given: slice argument (int) as second or kwargs (dict) as last element
                     if isinstance(cont[1],(int, np.int64, np.int32)):
-                        fig.show_contour(data=cont[0], slices=[cont[1]], dimensions=[0,1], levels=cont[2], colors=cont[3])
+                        layer = _draw_contour(fitsfile, fig, cont[0], cont[1], cont[2], cont[3], {}, kwargs)
                     elif isinstance(cont[1],(u.quantity.Quantity)):
-                        chan,_ = _channel_physical(fitsfile, cont[1])
-                        fig.show_contour(data=cont[0], slices=[chan], dimensions=[0,1], levels=cont[2], colors=cont[3])
+                        layer = _draw_contour(fitsfile, fig, cont[0], int(chans[idx]), cont[2], cont[3], {}, kwargs)
                     elif type(cont[3]) is dict:
-                        fig.show_contour(data=cont[0], levels=cont[1], colors=cont[2], **cont[3])
+                        layer = _draw_contour(fitsfile, fig, cont[0], None, cont[1], cont[2], cont[3], kwargs)
                     else:
                         raise TypeError("Contour: could not interpret contour list.")
                 elif len(cont) == 5:
-                    fig.show_contour(data=cont[0], slices=[cont[1]], dimensions=[0,1], levels=cont[2], colors=cont[3], **cont[4])
+                    layer = _draw_contour(fitsfile, fig, cont[0], cont[1], cont[2], cont[3], cont[4], kwargs)
                 else:
                     raise TypeError("Contour: wrong number or format of contour parameters in contour "+str(cont)+".")
 
                 if 'legend' in kwargs:
                     if legend is True:
-                        fig._ax1.collections[contournum].set_label(cont[0].replace('_','$\_$'))
+                        _label_contour(layer, _escape_text(cont[0]))
                     elif ( isinstance(legend, (list,tuple)) ):
-                        fig._ax1.collections[contournum].set_label(legend[idx])
+                        _label_contour(layer, legend[idx])
                     else:
                         raise TypeError("Legend: either True or list of names for each contour.")
-                    contournum += len(cont[1])     # count up plotted contours
 
                 if 'clabel' in kwargs:
                     if clabel == True:
-                        fig._layers['contour_set_'+str(idx+1)].clabel()
+                        layer.clabel()
                     if isinstance(clabel,dict):
-                        fig._layers['contour_set_'+str(idx+1)].clabel(**clabel)
+                        layer.clabel(**clabel)
 
 
 ###################################################################################################
 
+@_stage
 def _overplot_regions(fitsfile, fig, kwargs, panel=None):
     regions = kwargs.get('regions')
     if isinstance(regions,(list,tuple)):
         if panel:
             regions = regions[panel['num']]                                  # get the correct set of contours
+        origin = 0 if ( _engine(kwargs) == 'wcsaxes' ) else 1                 # pixel convention of the engine
         for region in regions:
-            fig.show_regions(region)
+            _draw_regions(fig, region, origin)                                 # parsed once, shared by all panels
 
 
 ###################################################################################################
 
+@_stage
 def _show_colorbar(fitsfile, fig, kwargs):
     # get the header image unit if not defined by the user
     bunit = 'unknown quantity'
     if not kwargs.get('colorbar'):
-        head = fits.open(fitsfile)[0].header
+        head = _get_header(fitsfile)
         if ( 'bunit' in head ):
             bunit = head['bunit']
         else:
-            print("Header keyword 'BUNIT' not present in "+fitsfile)
+            _warn("Header keyword 'BUNIT' not present in "+_file_name(fitsfile))
     colorbar = kwargs.get('colorbar', ['right',bunit])
     stretch  = kwargs.get('stretch', 'linear')
 
@@ -338,9 +511,8 @@ def _show_colorbar(fitsfile, fig, kwargs):
         fig.colorbar.set_axis_label_text(colorbar[1])
         fig.colorbar.set_axis_label_pad(easy_aplpy.settings.colorbar_labelpad)
         if ( stretch == 'log' ):
-            im = fits.open(fitsfile)[0]
-            vmin = kwargs.get('vmin', np.nanmin(im.data))
-            vmax = kwargs.get('vmax', np.nanmax(im.data))
+            vmin = kwargs.get('vmin')                                          # set by _map_limits if not given
+            vmax = kwargs.get('vmax')
             log_ticks = [float('{:.2f}'.format(round(x,int(-1*np.log10(vmin))))) for x in np.logspace(np.log10(vmin),np.log10(vmax),num=10, endpoint=True)]
             fig.colorbar.set_ticks(log_ticks)
         fig.colorbar.set_font(size=easy_aplpy.settings.colorbar_label_fontsize)
@@ -350,12 +522,13 @@ def _show_colorbar(fitsfile, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _show_grid_colorbar(fitsfile, main_fig, panels, kwargs):
-    head = fits.open(fitsfile)[0].header
+    head = _get_header(fitsfile)
     if ( 'bunit' in head ):
         bunit = head['bunit']
     else:
-        print("Header keyword 'BUNIT' not present in "+fitsfile)
+        _warn("Header keyword 'BUNIT' not present in "+_file_name(fitsfile))
         bunit = 'unknown quantity'
     colorbar = kwargs.get('colorbar', ['right',bunit])        # add the colorbar panel
     cmap     = kwargs.get('cmap', 'viridis')                  # the recommended cmap
@@ -365,7 +538,7 @@ def _show_grid_colorbar(fitsfile, main_fig, panels, kwargs):
     vmid     = kwargs.get('vmid', None)
 
     if not colorbar is None:
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m plotting colorbar")
+        _info("plotting colorbar")
         cbpnl = panels[-1]
         ax1 = main_fig.add_axes([cbpnl['x'],cbpnl['y'],cbpnl['width'],cbpnl['height']])
         if ( colorbar[0] == 'last panel' ) or ( colorbar[0] == 'top' ):
@@ -397,15 +570,12 @@ def _show_grid_colorbar(fitsfile, main_fig, panels, kwargs):
                              )
         mplcolorbar.ax.tick_params(labelsize=easy_aplpy.settings.colorbar_label_fontsize)
 
-        from distutils.version import LooseVersion
-        if ( LooseVersion(mpl.__version__) < LooseVersion('1.3') ):
-            mplcolorbar.outline.set_color(easy_aplpy.settings.frame_color)
-        else:
-            mplcolorbar.outline.set_edgecolor(easy_aplpy.settings.frame_color)
+        mplcolorbar.outline.set_edgecolor(easy_aplpy.settings.frame_color)
 
 
 ###################################################################################################
 
+@_stage
 def _show_scalebar(fitsfile, fig, kwargs, panel=None):
     scalebar = kwargs.get('scalebar', None)
     if not scalebar is None:
@@ -423,6 +593,7 @@ def _show_scalebar(fitsfile, fig, kwargs, panel=None):
 
 ###################################################################################################
 
+@_stage
 def _show_beam(fitsfile, fig, kwargs):
     beam = kwargs.get('beam', True)
     beam_kwargs = easy_aplpy.settings.beam_kwargs
@@ -434,7 +605,7 @@ def _show_beam(fitsfile, fig, kwargs):
     imtype = kwargs.get('imtype')
     if not ( beam is None ) and not ( imtype == 'pv' ):
 
-        if not aplpy.version.version=='1.1.1':                # APLpy 1.1.1 fails to plot beams
+        if ( _engine(kwargs) == 'wcsaxes' ) or not aplpy.version.version=='1.1.1':     # APLpy 1.1.1 fails to plot beams
             fig.add_beam()
             fig.beam.show()
             fig.beam.set_corner(beam_kwargs['loc'])
@@ -447,12 +618,13 @@ def _show_beam(fitsfile, fig, kwargs):
             codes = {'center': 10, 'center left': 6, 'center right': 7, 'lower center': 8, 'lower left': 3, 'lower right': 4, 'right': 5, 'upper center': 9, 'upper left': 2, 'upper right': 1}
 
             try:
-                if not (np.abs(fits.getheader(fitsfile)['cdelt1']) - np.abs(fits.getheader(fitsfile)['cdelt2']) < 1e-6):
+                header = _get_header(fitsfile)
+                if not (np.abs(header['cdelt1']) - np.abs(header['cdelt2']) < 1e-6):
                     raise ValueError("Pixels are not square (within 1e-6 degrees). Cannot plot beam.")
-                bmaj = fits.getheader(fitsfile)['bmaj']     # in degrees by default
-                bmin = fits.getheader(fitsfile)['bmin']     # in degrees by default
-                bpa  = fits.getheader(fitsfile)['bpa']      # in degrees by default
-                deg_per_pix = np.abs(fits.getheader(fitsfile)['cdelt1'])
+                bmaj = header['bmaj']     # in degrees by default
+                bmin = header['bmin']     # in degrees by default
+                bpa  = header['bpa']      # in degrees by default
+                deg_per_pix = np.abs(header['cdelt1'])*kwargs.get('binning', {}).get(fitsfile, 1)     # the displayed image may be block averaged
 
                 from mpl_toolkits.axes_grid1.anchored_artists import AnchoredEllipse
                 ae = AnchoredEllipse(fig._ax1.transData,
@@ -477,6 +649,7 @@ def _show_beam(fitsfile, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _show_label(fitsfile, fig, kwargs):
     label = kwargs.get('label')
     if label:
@@ -485,19 +658,24 @@ def _show_label(fitsfile, fig, kwargs):
         elif isinstance(label,(list,tuple)):
             if ( len (label) == 2 ):
                 lbl = [label[0], label[1], {}]
-        fig.add_label(label[0][0], label[0][1], label[1].replace('_','$\_$'), color='black', relative=True, size=easy_aplpy.settings.velo_fontsize, **label[2])
+        fig.add_label(label[0][0], label[0][1], _escape_text(label[1]), color='black', relative=True, size=easy_aplpy.settings.velo_fontsize, **label[2])
 
 
 ###################################################################################################
 
+@_stage
 def _show_overlays(fitsfile, fig, kwargs, panel=None):
+    # elements with identical kwargs are drawn with one call (one collection), SkyCoords may be arrays
     circles = kwargs.get('circles')
     if circles:
         if all(isinstance(x,(list,tuple)) for x in circles):
             if panel:
                 circles = circles[panel['num']]                                # get the correct set of circles
-            for circle in circles:
-                fig.show_circles(xw=circle[0].ra.degree, yw=circle[0].dec.degree, radius=circle[1].to(u.degree).value, **circle[2])
+            for group in _group_elements(circles):
+                coords = [circle[0] for circle in group]
+                xw,yw  = _sky_degrees(fitsfile, coords)
+                radius = _broadcast_degrees([circle[1] for circle in group], _coord_counts(coords))
+                fig.show_circles(xw=xw, yw=yw, radius=radius, **group[0][2])
         else:
             raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
 
@@ -506,8 +684,9 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
         if all(isinstance(x,(list,tuple)) for x in markers):
             if panel:
                 markers = markers[panel['num']]                                # get the correct set of markers
-            for marker in markers:
-                fig.show_markers(xw=marker[0].ra.degree, yw=marker[0].dec.degree, **marker[1])
+            for group in _group_elements(markers):
+                xw,yw = _sky_degrees(fitsfile, [marker[0] for marker in group])
+                fig.show_markers(xw=xw, yw=yw, **group[0][1])
         else:
             raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
 
@@ -516,8 +695,8 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
         if all(isinstance(x,(list,tuple)) for x in polygons):
             if panel:
                 polygons = polygons[panel['num']]                              # get the correct set of polygons
-            for polygon in polygons:
-                fig.show_polygons(polygon_list=[np.array([[p.ra.degree, p.dec.degree] for p in polygon[0]])], **polygon[1])
+            for group in _group_elements(polygons):
+                fig.show_polygons(polygon_list=[np.column_stack(_sky_degrees(fitsfile, _coord_list(polygon[0]))) for polygon in group], **group[0][1])
         else:
             raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
 
@@ -526,8 +705,13 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
         if all(isinstance(x,(list,tuple)) for x in arrows):
             if panel:
                 arrows = arrows[panel['num']]                                # get the correct set of circles
-            for arrow in arrows:
-                fig.show_arrows(x=arrow[0].ra.degree, y=arrow[0].dec.degree, dx=arrow[1][0].to(u.degree).value, dy=arrow[1][1].to(u.degree).value, **arrow[2])
+            for group in _group_elements(arrows):
+                coords = [arrow[0] for arrow in group]
+                counts = _coord_counts(coords)
+                x,y    = _sky_degrees(fitsfile, coords)
+                dx     = _broadcast_degrees([arrow[1][0] for arrow in group], counts)
+                dy     = _broadcast_degrees([arrow[1][1] for arrow in group], counts)
+                fig.show_arrows(x=x, y=y, dx=dx, dy=dy, **group[0][2])
         else:
             raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
 
@@ -536,8 +720,15 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
         if all(isinstance(x,(list,tuple)) for x in ellipses):
             if panel:
                 ellipses = ellipses[panel['num']]                                # get the correct set of ellipses
-            for ellipse in ellipses:
-                fig.show_ellipses(ellipse[0].ra.degree, ellipse[0].dec.degree, ellipse[1].to(u.degree).value, ellipse[2].to(u.degree).value, angle=ellipse[3].to(u.degree).value, **ellipse[4])
+            for group in _group_elements(ellipses):
+                coords = [ellipse[0] for ellipse in group]
+                counts = _coord_counts(coords)
+                xw,yw  = _sky_degrees(fitsfile, coords)
+                fig.show_ellipses(xw, yw,
+                                  _broadcast_degrees([ellipse[1] for ellipse in group], counts),
+                                  _broadcast_degrees([ellipse[2] for ellipse in group], counts),
+                                  angle=_broadcast_degrees([ellipse[3] for ellipse in group], counts),
+                                  **group[0][4])
                 # not working in APLpy 1.1.1:
                 # if isinstance(ellipse[0],SkyCoord):
                 #     fig.show_ellipses(ellipse[0].ra.degree, ellipse[0].dec.degree, ellipse[1].to(u.degree).value, ellipse[2].to(u.degree).value, angle=ellipse[3].to(u.degree).value, coords_frame='world', **ellipse[4])
@@ -553,8 +744,8 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
         if all(isinstance(x,(list,tuple)) for x in lines):
             if panel:
                 lines = lines[panel['num']]                              # get the correct set of lines
-            for line in lines:
-                fig.show_lines(line_list=[np.array([[i.value for i in line[0]], [j.value for j in line[1]]])], **line[2])
+            for group in _group_elements(lines):
+                fig.show_lines(line_list=[np.array([[i.value for i in line[0]], [j.value for j in line[1]]]) for line in group], **group[0][2])
         else:
             raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
 
@@ -586,6 +777,26 @@ def _show_overlays(fitsfile, fig, kwargs, panel=None):
 
 ###################################################################################################
 
+@_stage
+def _show_catalogues(fitsfile, fig, kwargs, panel=None):
+    # must be called after recentering, only the sources in the final view are drawn
+    catalogues = kwargs.get('catalogues')
+    if catalogues:
+        if all(isinstance(x,(list,tuple)) for x in catalogues):
+            if panel:
+                catalogues = catalogues[panel['num']]                          # get the correct set of catalogues
+            if ( kwargs.get('imtype') == 'pv' ):
+                _warn("Catalogues cannot be shown on pV diagrams.")
+                return
+            for catalogue in catalogues:
+                _draw_catalogue(fitsfile, fig, catalogue)
+        else:
+            raise TypeError("Overlays: Must be list of lists. I.e. a single overlay needs double brackets [[]].")
+
+
+###################################################################################################
+
+@_stage
 def _format_grid_ticksNlabels(panel, fig, kwargs):
     imtype = kwargs.get('imtype')
     if ( imtype == 'pp' ):
@@ -628,6 +839,7 @@ def _format_grid_ticksNlabels(panel, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _show_ticksNlabels(fitsfile, fig, kwargs):
     imtype = kwargs.get('imtype')
     if ( imtype == 'pp' ):
@@ -660,6 +872,7 @@ def _show_ticksNlabels(fitsfile, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _show_legend(fitsfile, fig, kwargs):
     legend = kwargs.get('legend')
     if legend:
@@ -670,11 +883,12 @@ def _show_legend(fitsfile, fig, kwargs):
 
 ###################################################################################################
 
-def _show_channel_label(panel, fig, kwargs):
+@_stage
+def _show_channel_label(panel, fig, kwargs, layer=None):
     channel_label = kwargs.get('channel_label','physical')
     if isinstance(channel_label,str):
         if ( channel_label == 'physical' ):
-            label = ((easy_aplpy.settings.grid_label_format).format(panel['physical'])).replace('km / s','km\,s$^{-1}$')
+            label = ((easy_aplpy.settings.grid_label_format).format(panel['physical'])).replace('km / s','km$\,$s$^{-1}$')
         elif ( channel_label == 'number' ):
             label = '{:d}'.format(panel['channel'])
     elif ( channel_label == None ):
@@ -685,9 +899,12 @@ def _show_channel_label(panel, fig, kwargs):
         raise TypeError("Unrecognized type of channel_label. Must be an instruction ('physical', 'number', None) or a list of strings.")
 
     if (label != None):
-        label_kwargs = {'usetex': True}
+        label_kwargs = {'usetex': _usetex()}
         if easy_aplpy.settings.grid_label_bbox:
             label_kwargs['bbox'] = easy_aplpy.settings.props
+        if layer:
+            fig.remove_layer(layer, raise_exception=False)                     # replace the label of the previous channel
+            label_kwargs['layer'] = layer
         fig.add_label(easy_aplpy.settings.grid_label_pos[0],
                       easy_aplpy.settings.grid_label_pos[1],
                       label,
@@ -700,6 +917,49 @@ def _show_channel_label(panel, fig, kwargs):
                      )
 
 
+###################################################################################################
+
+@_stage
+def _show_channel_contours(fitsfile, fig, kwargs, channel):
+    # contours of the currently displayed channel, replaced when the channel changes
+    channel_contours = kwargs.get('channel_contours')
+    if channel_contours:
+        if not ( len(channel_contours) in [2,3] ):
+            raise TypeError("Channel contours: specify [levels, colors] or [levels, colors, kwargs].")
+        contour_kwargs = channel_contours[2] if ( len(channel_contours) == 3 ) else {}
+        fig.remove_layer('channel_contours', raise_exception=False)
+        fig.show_contour(data=_plane_hdu(fitsfile, channel), levels=channel_contours[0], colors=channel_contours[1], layer='channel_contours', **contour_kwargs)
+
+
+###################################################################################################
+
+def _swap_image(fig, hdu):
+    # replace the displayed image data keeping colormap, stretch and all other artists
+    if not ( fig.image.get_array().shape == hdu.data.shape ):
+        raise ValueError("The new image has a different shape than the displayed image.")
+    fig.image.set_data(hdu.data)
+    fig._data = hdu.data                                                       # used when the colour scale is redrawn
+
+
+###################################################################################################
+
+@_stage
+def _plot_panel(main_fig, panel, kwargs):
+    fig = _set_up_panel_figure(main_fig, panel, kwargs)
+    _show_map(panel['file'], fig, kwargs)
+    if ( 'left' in panel['position'] and 'bottom' in panel['position'] ):
+        _show_beam(panel['file'], fig, kwargs)
+    _show_channel_label(panel, fig, kwargs)
+    _show_contours(panel['file'], fig, kwargs, panel)
+    _overplot_regions(panel['file'], fig, kwargs, panel)
+    _show_overlays(panel['file'], fig, kwargs, panel)
+    _show_scalebar(panel['file'], fig, kwargs, panel)
+    _format_grid_ticksNlabels(panel, fig, kwargs)
+    _recenter_plot(panel['file'], fig, kwargs)              # recenter needs to be last, otherwise label hiding does not work!
+    _show_catalogues(panel['file'], fig, kwargs, panel)     # only draws the sources in the recentered view
+    return fig
+
+
 ###################################################################################################
 
 # def _execute_code(fitsfile, fig, kwargs, panel=None):
@@ -716,22 +976,56 @@ def _show_channel_label(panel, fig, kwargs):
 
 ###################################################################################################
 
+@_stage
 def _save_figure(fitsfile, fig, kwargs):
-    out = kwargs.get('out',os.path.splitext(fitsfile)[0]+'.png')
-    if isinstance(out,str):
-        if os.path.dirname(out) != '':
-            if not os.path.exists(os.path.dirname(out)):
-                print("\x1b[0;34;40m[easy_aplpy]\x1b[0m Directory does not exist. Created "+os.path.dirname(out))
-                os.system('mkdir -p '+os.path.dirname(out))
-        fig.savefig(out, dpi=300, transparent=True, adjust_bbox=True)
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m saved plot as "+out)
-    elif isinstance(out,dict):
-        fig.savefig(**out)
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m saved plot as "+out['filename'])
-    elif out==None:
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m not saving plot as requested")
-    else:
-        print("\x1b[0;34;40m[easy_aplpy]\x1b[0m Not saving plot. Give file name to save.")
+    out = kwargs.get('out',os.path.splitext(fitsfile)[0]+'.png' if isinstance(fitsfile,str) else None)
+    if out==None:
+        if ( 'out' in kwargs ) or isinstance(fitsfile,str):
+            _info("not saving plot as requested")
+        else:
+            _info("not saving plot of an in-memory image, give 'out' to save it")
+        return
+    # the plot stages run once, every output is only rendered from the finished figure
+    for output in ( out if isinstance(out,list) else [out] ):
+        if isinstance(output,str):
+            options = {'filename': output, 'dpi': 300, 'transparent': True, 'adjust_bbox': True}
+        elif isinstance(output,dict):
+            options = dict(output)
+        else:
+            _info("Not saving plot. Give file name to save.")
+            continue
+        filename = options.pop('filename')
+        if os.path.dirname(filename) != '':
+            if not os.path.exists(os.path.dirname(filename)):
+                _info("Directory does not exist. Created "+os.path.dirname(filename))
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+        _write_output(filename, _render_output(fig, filename, options), fitsfile, kwargs)
+
+
+def _render_output(fig, filename, options):
+    """
+    Render the figure with the options of aplpy's savefig (dpi, transparent, adjust_bbox, max_dpi,
+    format) and return a function that returns the content of the file. With background writes,
+    PNGs are rasterised here without compression and compressed by that function on the writer
+    thread. All other formats need the figure to be encoded, so they are encoded here.
+    """
+    figure = getattr(fig, '_figure', fig)                                      # aplpy and WCSFigure wrap the matplotlib figure
+    fmt = options.pop('format', None) or os.path.splitext(filename)[1][1:].lower() or 'png'
+    max_dpi = options.pop('max_dpi', 300)
+    if ( options.get('dpi') is None ) and ( fmt in ['eps','ps','pdf'] ) and hasattr(fig, '_ax1'):
+        # as aplpy: vector formats embed the image at its own resolution, at most max_dpi
+        interval = fig._ax1.xaxis.get_view_interval()
+        dpi = (interval[1]-interval[0])/(fig._ax1.get_position().width*figure.get_figwidth())
+        options['dpi'] = min(dpi, max_dpi) if max_dpi else dpi
+    if options.pop('adjust_bbox', True):
+        options.setdefault('bbox_inches', 'tight')
+    buffer = io.BytesIO()
+    if ( fmt == 'png' ) and easy_aplpy.settings.background_writes and not ( 'pil_kwargs' in options ) and _pillow_available():
+        figure.savefig(buffer, format=fmt, pil_kwargs={'compress_level': 0}, **options)
+        return functools.partial(_compress_png, buffer.getvalue())
+    figure.savefig(buffer, format=fmt, **options)
+    data = buffer.getvalue()
+    return lambda: data
 
 
 ###################################################################################################
@@ -0,0 +1,167 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Incremental plotting: skip figures whose inputs, arguments and    #
+# settings did not change since they were last saved.               #
+#####################################################################
+
+__all__ = ['_skip_unchanged','_record_output','_output_paths']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import matplotlib as mpl
+from astropy import units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+import easy_aplpy
+from ..helpers._log import _info, _warn
+
+
+###################################################################################################
+
+# one manifest per output directory, listing what produced each figure
+_manifest_name = 'easy_aplpy.manifest.json'
+
+# kwargs that do not influence the saved figure or are added internally
+_ignored_kwargs = ['figure','incremental','incremental_hash','incremental_inputs','imtype','binning','timing']
+
+
+class _NoFingerprint(TypeError):
+    pass
+
+
+def _sha1(array):
+    return hashlib.sha1(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def _fingerprint(obj, files):
+    """
+    Reduce an argument to something JSON serialisable that changes whenever the argument changes.
+    Existing files are identified by path, modification time and size and collected in files.
+    Array-like values are hashed through all of their data. Raises _NoFingerprint for types that
+    cannot be reduced, their repr may be shortened and would miss changes.
+    """
+    if isinstance(obj, str):
+        if os.path.isfile(obj):
+            stat  = os.stat(obj)
+            entry = [os.path.abspath(obj), stat.st_mtime_ns, stat.st_size]
+            files.append(entry)
+            return ['file']+entry
+        return obj
+    if ( obj is None ) or isinstance(obj, (bool,int,float)):
+        return obj
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return [[str(key), _fingerprint(obj[key], files)] for key in sorted(obj, key=str) if not ( key in _ignored_kwargs )]
+    if isinstance(obj, (list,tuple)):
+        return [_fingerprint(x, files) for x in obj]
+    if isinstance(obj, u.quantity.Quantity):                                    # also Angle, Latitude, Longitude
+        return ['quantity', type(obj).__name__, str(obj.unit), list(obj.shape), _sha1(obj.value)]
+    if isinstance(obj, SkyCoord):
+        return ['skycoord', repr(obj.frame.replicate_without_data()), list(obj.shape), _sha1(obj.cartesian.xyz.value)]
+    if isinstance(obj, Time):
+        return ['time', obj.scale, list(obj.shape), _sha1(obj.jd1), _sha1(obj.jd2)]
+    if isinstance(obj, u.UnitBase):
+        return ['unit', obj.to_string()]
+    if isinstance(obj, np.ndarray):
+        return ['array', str(obj.dtype), list(obj.shape), _sha1(obj)]
+    if isinstance(obj, mpl.colors.Colormap):
+        return ['cmap', obj.name, hashlib.sha1(obj(np.linspace(0,1,obj.N)).tobytes()).hexdigest()]
+    if hasattr(obj, 'header') and hasattr(obj, 'data'):                        # in-memory FITS HDU
+        return ['hdu', hashlib.sha1(obj.header.tostring().encode('utf-8')).hexdigest(), _fingerprint(obj.data, files)]
+    raise _NoFingerprint(type(obj).__name__)
+
+
+def _settings_fingerprint(files):
+    from ..settings import _settings
+    return [[name, _fingerprint(getattr(easy_aplpy.settings, name), files)] for name in _settings.__all__]
+
+
+def _output_paths(fitsfile, kwargs):
+    # file names of all outputs, out can be a file name, a dict of savefig arguments or a list of those
+    out = kwargs.get('out', os.path.splitext(fitsfile)[0]+'.png' if isinstance(fitsfile, str) else None)
+    paths = []
+    for output in ( out if isinstance(out, list) else [out] ):
+        if isinstance(output, str):
+            paths.append(output)
+        elif isinstance(output, dict) and isinstance(output.get('filename'), str):
+            paths.append(output['filename'])
+    return paths
+
+
+###################################################################################################
+
+def _read_manifest(directory):
+    manifest = os.path.join(directory, _manifest_name)
+    if os.path.exists(manifest):
+        try:
+            with open(manifest) as f:
+                return json.load(f)
+        except ValueError:
+            _info("ignoring corrupt manifest "+manifest)
+    return {}
+
+
+def _skip_unchanged(plottype, fitsfile, args, kwargs):
+    """
+    Return True if incremental mode is on and the output already exists and was produced from the
+    same input files, arguments, settings and easy_aplpy version. Otherwise store the hash of the
+    current inputs in kwargs so that _save_figure can record it in the manifest.
+    """
+    if not kwargs.get('incremental', easy_aplpy.settings.incremental):
+        return False
+    outs = _output_paths(fitsfile, kwargs)
+    if not outs:
+        return False
+    if easy_aplpy.settings.background_writes:
+        from ._writer import flush
+        flush(False)                                                           # outputs and manifests of earlier plots
+
+    files   = []
+    options = {key: value for key,value in kwargs.items() if not ( key == 'out' )}  # the output is not an input file
+    try:
+        state = [plottype, easy_aplpy.version, repr(kwargs.get('out')), _fingerprint(fitsfile, files), _fingerprint(list(args), files), _fingerprint(options, files), _settings_fingerprint(files)]
+    except _NoFingerprint as error:
+        _warn("incremental mode: cannot tell whether an argument of type "+str(error)+" changed, plotting "+', '.join(outs))
+        return False
+    kwargs['incremental_hash']   = hashlib.sha1(json.dumps(state).encode('utf-8')).hexdigest()
+    kwargs['incremental_inputs'] = files
+
+    for out in outs:
+        entry = _read_manifest(os.path.dirname(os.path.abspath(out))).get(os.path.basename(out))
+        if not ( os.path.exists(out) and entry and ( entry['hash'] == kwargs['incremental_hash'] ) ):
+            return False
+    _info("unchanged, keeping "+', '.join(outs))
+    return True
+
+
+def _record_output(fitsfile, out, kwargs):
+    # note in the manifest what produced this output
+    if not ( 'incremental_hash' in kwargs ):
+        return
+    directory = os.path.dirname(os.path.abspath(out))
+    manifest  = _read_manifest(directory)
+    manifest[os.path.basename(out)] = {'hash':    kwargs['incremental_hash'],
+                                       'fitsfile': fitsfile if isinstance(fitsfile, str) else repr(fitsfile),
+                                       'inputs':  kwargs['incremental_inputs'],
+                                       'version': easy_aplpy.version,
+                                       'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+                                      }
+    tmp = os.path.join(directory, _manifest_name+'.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(directory, _manifest_name))
+
+
+###################################################################################################
@@ -0,0 +1,123 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Overlay helpers: convert the positions of many overlay elements   #
+# at once and group elements that can be drawn as one collection.   #
+#####################################################################
+
+__all__ = ['_image_frame','_coord_list','_coord_counts','_sky_degrees','_broadcast_degrees','_group_elements']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from ..helpers._fits import _get_header, _plane_header
+
+
+###################################################################################################
+
+# celestial frame of the images keyed by the header keywords that define it
+_frame_cache = {}
+
+_frame_keys = ['ctype1','ctype2','radesys','radecsys','equinox','epoch','date-obs','mjd-obs']
+
+
+def _image_frame(fitsfile):
+    """
+    Return the astropy celestial frame of an image or None if it has no celestial axes. Frames are
+    cached per coordinate system, so all panels and plots of the same sky share one frame.
+    """
+    header = _get_header(fitsfile)
+    key = tuple(str(header.get(k)) for k in _frame_keys)
+    if not ( key in _frame_cache ):
+        from astropy.wcs import WCS
+        from astropy.wcs.utils import wcs_to_celestial_frame
+        try:
+            _frame_cache[key] = wcs_to_celestial_frame(WCS(_plane_header(header)))
+        except ValueError:                                                     # e.g. pV diagrams
+            _frame_cache[key] = None
+    return _frame_cache[key]
+
+
+def _coord_list(coords):
+    # a single (array) SkyCoord or a list of SkyCoords
+    return [coords] if isinstance(coords, SkyCoord) else list(coords)
+
+
+def _coord_counts(coords):
+    # number of positions in each (scalar or array) SkyCoord
+    return [int(np.prod(coord.shape)) for coord in coords]
+
+
+def _sky_degrees(fitsfile, coords):
+    """
+    Return longitudes and latitudes in degrees in the frame of the image of a list of (scalar or
+    array) SkyCoords as two flat arrays. Coordinates in the same frame are transformed together.
+    """
+    frame = _image_frame(fitsfile)
+    if ( frame is None ):
+        lon = [np.atleast_1d(coord.ra.degree).ravel() for coord in coords]     # no celestial frame, use ra/dec as given
+        lat = [np.atleast_1d(coord.dec.degree).ravel() for coord in coords]
+        return np.concatenate(lon), np.concatenate(lat)
+    lon, lat = [], []
+    start = 0
+    while ( start < len(coords) ):
+        # consecutive coordinates in an equivalent frame are transformed as one array
+        stop = start+1
+        while ( stop < len(coords) ) and coords[stop].is_equivalent_frame(coords[start]):
+            stop += 1
+        block_lon = np.concatenate([np.atleast_1d(coord.spherical.lon.degree).ravel() for coord in coords[start:stop]])
+        block_lat = np.concatenate([np.atleast_1d(coord.spherical.lat.degree).ravel() for coord in coords[start:stop]])
+        if not coords[start].is_equivalent_frame(frame):
+            block = SkyCoord(block_lon*u.degree, block_lat*u.degree, frame=coords[start].frame.replicate_without_data()).transform_to(frame)
+            block_lon, block_lat = block.spherical.lon.degree, block.spherical.lat.degree
+        lon.append(block_lon)
+        lat.append(block_lat)
+        start = stop
+    return np.concatenate(lon), np.concatenate(lat)
+
+
+def _broadcast_degrees(quantities, counts):
+    """
+    Return the angles (scalar or array astropy.units) of all elements in degrees, each repeated or
+    broadcast to the number of positions of its element.
+    """
+    return np.concatenate([np.broadcast_to(np.atleast_1d(q.to(u.degree).value).ravel(), (n,)) if n else np.zeros(0) for q,n in zip(quantities, counts)])
+
+
+###################################################################################################
+
+def _same_kwargs(a, b):
+    if not ( sorted(a) == sorted(b) ):
+        return False
+    if any(isinstance(value, (list,np.ndarray)) for value in list(a.values())+list(b.values())):
+        return False                                                           # per element values, e.g. marker sizes
+    try:
+        return all(bool(np.all(a[key] == b[key])) and ( np.shape(a[key]) == np.shape(b[key]) ) for key in a)
+    except (ValueError, TypeError):
+        return False
+
+
+def _group_elements(elements, kwargs_idx=-1):
+    """
+    Group overlay elements whose kwargs (element[kwargs_idx]) are identical, keeping the order of
+    first appearance. Each group can be drawn with a single show_* call, i.e. one collection.
+    """
+    groups = []
+    for element in elements:
+        for group in groups:
+            if _same_kwargs(group[0][kwargs_idx], element[kwargs_idx]):
+                group.append(element)
+                break
+        else:
+            groups.append([element])
+    return groups
+
+
+###################################################################################################
@@ -0,0 +1,90 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Render grid panels in worker processes and place the rasterised   #
+# panels in the main figure.                                        #
+#####################################################################
+
+__all__ = ['_plot_panels_parallel']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import easy_aplpy
+from ._helpers import _plot_panel, _output_dpi
+from ..helpers._log import _info
+
+
+###################################################################################################
+
+def _settings_snapshot():
+    from ..settings import _settings
+    return {name: getattr(easy_aplpy.settings, name) for name in _settings.__all__}
+
+
+###################################################################################################
+
+def _render_panel(panel, kwargs, figsize, dpi, settings):
+    """
+    Worker function: draw a single panel at its position in an empty, transparent figure of the
+    same size as the main figure. Only the area covered by the panel (axes, ticks and labels) is
+    returned, as RGBA image together with its pixel box (left, bottom, width, height) in the
+    figure and the size of the figure in pixels.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.transforms import Bbox
+
+    for name, value in settings.items():                                       # settings of the main process
+        setattr(easy_aplpy.settings, name, value)
+
+    panel_fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(panel_fig)
+    panel_fig.patch.set_alpha(0.0)
+    _plot_panel(panel_fig, panel, kwargs)
+    canvas.draw()
+    renderer = canvas.get_renderer()
+    width, height = canvas.get_width_height()
+
+    # crop to the panel, rounded outwards to whole pixels
+    bbox = Bbox.union([ax.get_tightbbox(renderer) for ax in panel_fig.axes])
+    x0, y0 = max(int(np.floor(bbox.x0))-1, 0), max(int(np.floor(bbox.y0))-1, 0)
+    x1, y1 = min(int(np.ceil(bbox.x1))+1, width), min(int(np.ceil(bbox.y1))+1, height)
+    image = np.array(canvas.buffer_rgba())[height-y1:height-y0, x0:x1]
+    return image, (x0, y0, x1-x0, y1-y0), (width, height)
+
+
+###################################################################################################
+
+def _plot_panels_parallel(main_fig, panels, kwargs, workers):
+    """
+    Render all map panels in a pool of worker processes. Each rasterised panel is shown in an axes
+    of its own that covers exactly the pixels of the panel, in panel order so that overlapping
+    labels are drawn as in the serial case. The main figure is set to the output dpi so that the
+    panels are saved without resampling.
+    """
+    _info("rendering panels with "+str(workers)+" worker processes")
+    dpi      = _output_dpi(kwargs)
+    figsize  = tuple(main_fig.get_size_inches())
+    settings = _settings_snapshot()
+    maps     = [panel for panel in panels if ( panel['type'] == 'map' )]
+
+    main_fig.set_dpi(dpi)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = [executor.submit(_render_panel, panel, kwargs, figsize, dpi, settings) for panel in maps]
+        for panel, job in zip(maps, jobs):
+            image, (left, bottom, width, height), (fig_width, fig_height) = job.result()
+            ax = main_fig.add_axes([left/float(fig_width), bottom/float(fig_height), width/float(fig_width), height/float(fig_height)],
+                                   label='panel_'+str(panel['num']))
+            ax.set_axis_off()                                                  # no frame or background, only the panel
+            ax.imshow(image, origin='upper', interpolation='none', aspect='auto')
+    return []
+
+
+###################################################################################################
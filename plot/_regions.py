@@ -0,0 +1,103 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Region file cache. DS9 region files are parsed once and drawn as  #
+# a single patch collection in every panel.                         #
+#####################################################################
+
+__all__ = ['_draw_regions','clear_region_cache']
+
+
+###################################################################################################
+
+# common imports
+################
+
+from collections import OrderedDict
+
+import easy_aplpy
+from ..helpers._fits import _cache_key
+
+
+###################################################################################################
+
+# parsed shape lists keyed by (file, mtime, size)
+_region_cache = OrderedDict()
+
+# patches and texts in pixel coordinates keyed by (file, mtime, size, header, origin)
+_pixel_cache  = OrderedDict()
+
+
+def clear_region_cache():
+    """
+    Empty the in-memory cache of parsed region files.
+    """
+    _region_cache.clear()
+    _pixel_cache.clear()
+
+
+def _limit(cache):
+    while ( len(cache) > max(int(easy_aplpy.settings.region_cache_size), 1) ):
+        cache.popitem(last=False)
+
+
+###################################################################################################
+
+def _shape_list(region_file):
+    """
+    Return the parsed pyregion ShapeList of a region file. The file is only parsed again when it
+    changed on disk.
+    """
+    try:
+        import pyregion
+    except ImportError:
+        raise ImportError("Showing regions requires pyregion.")
+    key = _cache_key(region_file)
+    if key in _region_cache:
+        _region_cache.move_to_end(key)
+        return _region_cache[key]
+    for old_key in [k for k in _region_cache if k[0] == key[0]]:              # drop outdated versions of the same file
+        del _region_cache[old_key]
+    _region_cache[key] = pyregion.open(region_file)
+    _limit(_region_cache)
+    return _region_cache[key]
+
+
+def _pixel_shapes(region, header, origin):
+    """
+    Return the matplotlib patches and texts of a region file (or ShapeList) in pixel coordinates of
+    the image with the given header. Patches are never drawn themselves, so they can be shared by
+    all panels with the same header.
+    """
+    if not isinstance(region, str):
+        return region.as_imagecoord(header).get_mpl_patches_texts(origin=origin)
+    key = _cache_key(region)+(header.tostring(), origin)
+    if key in _pixel_cache:
+        _pixel_cache.move_to_end(key)
+        return _pixel_cache[key]
+    _pixel_cache[key] = _shape_list(region).as_imagecoord(header).get_mpl_patches_texts(origin=origin)
+    _limit(_pixel_cache)
+    return _pixel_cache[key]
+
+
+def _draw_regions(fig, region, origin, **kwargs):
+    """
+    Draw all shapes of a region file as one PatchCollection plus the region texts and register the
+    collection as layer 'region_set_N'.
+    """
+    from matplotlib.collections import PatchCollection
+    from matplotlib.text import Text
+
+    patches, texts = _pixel_shapes(region, fig._header, origin)
+    collection = PatchCollection(patches, match_original=True, **kwargs)
+    fig._ax1.add_collection(collection)
+    for text in texts:
+        label = Text(*text.get_position(), text=text.get_text())
+        label.update_from(text)                                                # the cached texts are never added to an axes
+        fig._ax1.add_artist(label)
+    layer = 'region_set_'+str(len([name for name in fig._layers if name.startswith('region_set_')])+1)
+    fig._layers[layer] = collection
+    return collection
+
+
+###################################################################################################
@@ -0,0 +1,659 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Plotting engine based directly on matplotlib and astropy's        #
+# WCSAxes. WCSFigure provides the part of the aplpy.FITSFigure      #
+# interface that the plotting stages use.                           #
+#####################################################################
+
+__all__ = ['WCSFigure']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from matplotlib.patches import Circle, Ellipse, Polygon, FancyArrow
+from matplotlib.collections import PatchCollection, LineCollection
+from astropy import units as u
+from astropy.wcs import WCS
+from astropy.wcs.utils import proj_plane_pixel_scales
+
+from ..helpers._fits import _get_hdu, _plane_header
+
+
+###################################################################################################
+
+# aplpy corner names to matplotlib location strings
+_corners = {'top': 'upper center', 'bottom': 'lower center', 'left': 'center left', 'right': 'center right',
+            'top left': 'upper left', 'top right': 'upper right', 'bottom left': 'lower left', 'bottom right': 'lower right',
+            'upper left': 'upper left', 'upper right': 'upper right', 'lower left': 'lower left', 'lower right': 'lower right'}
+
+
+def _location(corner):
+    return _corners.get(corner, corner)
+
+
+def _image_plane(data, header, slices=None):
+    # 2D data and header of an HDU, selecting a slice of cubes like aplpy does
+    if ( data.ndim > 2 ):
+        channel = slices[0] if slices else 0
+        data    = data[(0,)*(data.ndim-3)+(int(channel),)]
+        header  = _plane_header(header)
+    return np.asarray(data), header
+
+
+###################################################################################################
+
+class WCSFigure(object):
+    """
+    Minimal replacement for aplpy.FITSFigure drawing on a single WCSAxes. Pixel coordinates are
+    0-based as in matplotlib and astropy.wcs, world coordinates are in the units of the FITS header.
+    """
+
+    def __init__(self, data, figure=None, figsize=None, subplot=(0.1,0.1,0.8,0.8)):
+        if isinstance(data, str):
+            data = _get_hdu(data)
+        self._data, self._header = _image_plane(data.data, data.header)
+        self._wcs = WCS(self._header)
+        self._wcs.wcs.set()                                                    # astropy converts spectral units to SI
+        self._units = [self._unit_factor(i) for i in range(2)]
+
+        self._figure = figure if figure is not None else plt.figure(figsize=figsize)
+        self._ax1 = self._figure.add_axes(list(subplot), projection=self._wcs)
+        ny, nx = self._data.shape
+        self._ax1.set_xlim(-0.5, nx-0.5)
+        self._ax1.set_ylim(-0.5, ny-0.5)
+
+        self._layers  = {}
+        self._counter = {}
+        self.image    = None
+
+        self.ticks       = _Ticks(self)
+        self.tick_labels = _TickLabels(self)
+        self.axis_labels = _AxisLabels(self)
+        self.frame       = _Frame(self)
+
+    def _unit_factor(self, i):
+        # factor from header units to the units used by astropy.wcs
+        cunit = self._header.get('cunit'+str(i+1))
+        if not cunit:
+            return 1.
+        try:
+            return u.Unit(cunit).to(u.Unit(str(self._wcs.wcs.cunit[i])))
+        except (ValueError, u.UnitsError):
+            return 1.
+
+    def _layer_name(self, layer, kind):
+        if layer:
+            return layer
+        self._counter[kind] = self._counter.get(kind, 0)+1
+        return kind+'_'+str(self._counter[kind])
+
+    def _add_layer(self, layer, kind, artist):
+        name = self._layer_name(layer, kind)
+        self.remove_layer(name, raise_exception=False)
+        self._layers[name] = artist
+        return artist
+
+    # coordinates
+    #############
+
+    def world2pixel(self, xw, yw):
+        x, y = self._wcs.wcs_world2pix(np.asarray(xw, dtype=float)*self._units[0], np.asarray(yw, dtype=float)*self._units[1], 0)
+        return x, y
+
+    def pixel2world(self, xp, yp):
+        x, y = self._wcs.wcs_pix2world(np.asarray(xp, dtype=float), np.asarray(yp, dtype=float), 0)
+        return x/self._units[0], y/self._units[1]
+
+    def _pixel_scales(self):
+        # header units per pixel along x and y
+        scales = proj_plane_pixel_scales(self._wcs)
+        return scales[0]/self._units[0], scales[1]/self._units[1]
+
+    def _world2pixel_size(self, size):
+        return np.asarray(size, dtype=float)/self._pixel_scales()[0]
+
+    # image
+    #######
+
+    def show_colorscale(self, cmap='viridis', vmin=None, vmid=None, vmax=None, stretch='linear', aspect='equal', pmin=0.25, pmax=99.75, interpolation='nearest', **kwargs):
+        from astropy.visualization import ImageNormalize, LinearStretch, LogStretch, SqrtStretch, PowerStretch, AsinhStretch, SquaredStretch
+
+        if ( vmin is None ) or ( vmax is None ):                                # same automatic limits as aplpy
+            finite = self._data[np.isfinite(self._data)]
+            if ( vmin is None ):
+                vmin = np.percentile(finite, pmin)
+            if ( vmax is None ):
+                vmax = np.percentile(finite, pmax)
+        if ( stretch == 'linear' ):
+            stretch_obj = LinearStretch()
+        elif ( stretch == 'log' ):
+            if ( vmid is None ):
+                vmid = vmin-(vmax-vmin)/30.
+            stretch_obj = LogStretch(a=(vmax-vmin)/(vmin-vmid))                 # equivalent to aplpy's log stretch
+        elif ( stretch == 'sqrt' ):
+            stretch_obj = SqrtStretch()
+        elif ( stretch == 'power' ):
+            stretch_obj = PowerStretch(kwargs.get('exponent', 2.))
+        elif ( stretch == 'arcsinh' ):
+            stretch_obj = AsinhStretch() if ( vmid is None ) else AsinhStretch(a=-vmid/(vmax-vmid))
+        elif ( stretch == 'square' ):
+            stretch_obj = SquaredStretch()
+        else:
+            raise ValueError("Unknown stretch '"+str(stretch)+"'.")
+
+        if isinstance(cmap, str):
+            cmap = plt.get_cmap(cmap)
+        norm = ImageNormalize(vmin=vmin, vmax=vmax, stretch=stretch_obj, clip=True)
+        if self.image is not None:
+            self.image.remove()
+        self.image = self._ax1.imshow(self._data, origin='lower', cmap=cmap, norm=norm, aspect=aspect, interpolation=interpolation)
+        ny, nx = self._data.shape
+        self._ax1.set_xlim(-0.5, nx-0.5)
+        self._ax1.set_ylim(-0.5, ny-0.5)
+
+    def show_grayscale(self, **kwargs):
+        kwargs.setdefault('cmap', 'gray')
+        self.show_colorscale(**kwargs)
+
+    def recenter(self, x, y, radius=None, width=None, height=None):
+        xpix, ypix = self.world2pixel(x, y)
+        sx, sy = self._pixel_scales()
+        if radius is not None:
+            dx, dy = radius/sx, radius/sy
+        elif ( width is not None ) and ( height is not None ):
+            dx, dy = width/sx/2., height/sy/2.
+        else:
+            raise ValueError("Recenter: specify either radius or width and height.")
+        self._ax1.set_xlim(xpix-dx, xpix+dx)
+        self._ax1.set_ylim(ypix-dy, ypix+dy)
+
+    # contours
+    ##########
+
+    def show_contour(self, data=None, levels=5, colors=None, layer=None, slices=None, dimensions=[0,1], smooth=None, kernel='gauss', **kwargs):
+        from ._contours import _smooth
+        if ( data is None ):
+            image, header = self._data, self._header
+        else:
+            hdu = _get_hdu(data) if isinstance(data, str) else data
+            image, header = _image_plane(hdu.data, hdu.header, slices)
+        if smooth:
+            image = _smooth(image, smooth, kernel)
+        if colors is not None:
+            kwargs['colors'] = colors
+        transform = self._ax1.get_transform(WCS(header))
+        contour_set = self._ax1.contour(image, levels, transform=transform, **kwargs)
+        return self._add_layer(layer, 'contour_set', contour_set)
+
+    # layers
+    ########
+
+    def add_label(self, x, y, text, relative=False, layer=None, **kwargs):
+        if relative:
+            label = self._ax1.text(x, y, text, transform=self._ax1.transAxes, **kwargs)
+        else:
+            xp, yp = self.world2pixel(x, y)
+            label = self._ax1.text(xp, yp, text, **kwargs)
+        return self._add_layer(layer, 'label', label)
+
+    def remove_layer(self, layer, raise_exception=True):
+        if not ( layer in self._layers ):
+            if raise_exception:
+                raise Exception("Layer "+layer+" does not exist")
+            return
+        artist = self._layers.pop(layer)
+        try:
+            artist.remove()
+        except (AttributeError, NotImplementedError):                          # ContourSet before matplotlib 3.8
+            for collection in artist.collections:
+                collection.remove()
+
+    # shapes
+    ########
+
+    def _patches(self, patches, layer, kind, kwargs):
+        kwargs.setdefault('facecolor', 'none')
+        kwargs.setdefault('edgecolor', 'black')
+        collection = PatchCollection(patches, **kwargs)
+        self._ax1.add_collection(collection)
+        return self._add_layer(layer, kind, collection)
+
+    def show_circles(self, xw, yw, radius, layer=None, **kwargs):
+        xp, yp = self.world2pixel(np.atleast_1d(xw), np.atleast_1d(yw))
+        rp = np.broadcast_to(self._world2pixel_size(radius), xp.shape)
+        return self._patches([Circle((x,y), radius=r) for x,y,r in zip(xp,yp,rp)], layer, 'circle_set', kwargs)
+
+    def show_ellipses(self, xw, yw, width, height, angle=0, layer=None, **kwargs):
+        xp, yp = self.world2pixel(np.atleast_1d(xw), np.atleast_1d(yw))
+        wp = np.broadcast_to(self._world2pixel_size(width), xp.shape)
+        hp = np.broadcast_to(self._world2pixel_size(height), xp.shape)
+        an = np.broadcast_to(angle, xp.shape)
+        return self._patches([Ellipse((x,y), width=w, height=h, angle=a) for x,y,w,h,a in zip(xp,yp,wp,hp,an)], layer, 'ellipse_set', kwargs)
+
+    def show_polygons(self, polygon_list, layer=None, **kwargs):
+        patches = []
+        for polygon in polygon_list:
+            xp, yp = self.world2pixel(polygon[:,0], polygon[:,1])
+            patches.append(Polygon(np.column_stack([xp,yp]), closed=True))
+        return self._patches(patches, layer, 'polygon_set', kwargs)
+
+    def show_arrows(self, x, y, dx, dy, width='auto', head_width='auto', head_length='auto', length_includes_head=True, layer=None, **kwargs):
+        x, y, dx, dy = [np.atleast_1d(v).astype(float) for v in (x, y, dx, dy)]
+        x0, y0 = self.world2pixel(x, y)
+        x1, y1 = self.world2pixel(x+dx, y+dy)
+        if ( width == 'auto' ):
+            width = 0.01*min(self._data.shape)
+        if ( head_width == 'auto' ):
+            head_width = 3.*width
+        if ( head_length == 'auto' ):
+            head_length = 1.5*head_width
+        patches = [FancyArrow(a, b, c-a, d-b, width=width, head_width=head_width, head_length=head_length, length_includes_head=length_includes_head)
+                   for a,b,c,d in zip(x0,y0,x1,y1)]
+        kwargs.setdefault('facecolor', kwargs.get('color', 'black'))
+        return self._patches(patches, layer, 'arrow_set', kwargs)
+
+    def show_markers(self, xw, yw, layer=None, **kwargs):
+        xp, yp = self.world2pixel(np.atleast_1d(xw), np.atleast_1d(yw))
+        kwargs.setdefault('zorder', 3)
+        return self._add_layer(layer, 'marker_set', self._ax1.scatter(xp, yp, **kwargs))
+
+    def show_lines(self, line_list, layer=None, **kwargs):
+        segments = []
+        for line in line_list:
+            xp, yp = self.world2pixel(line[0,:], line[1,:])
+            segments.append(np.column_stack([xp,yp]))
+        collection = LineCollection(segments, **kwargs)
+        self._ax1.add_collection(collection)
+        return self._add_layer(layer, 'line_set', collection)
+
+    def show_regions(self, region_file, layer=None, **kwargs):
+        import pyregion
+        region = pyregion.open(region_file).as_imagecoord(self._header)
+        patches, texts = region.get_mpl_patches_texts(origin=0)
+        collection = PatchCollection(patches, match_original=True, **kwargs)
+        self._ax1.add_collection(collection)
+        for text in texts:
+            self._ax1.add_artist(text)
+        return self._add_layer(layer, 'region_set', collection)
+
+    # decorations
+    #############
+
+    def add_colorbar(self):
+        self.colorbar = _Colorbar(self)
+
+    def add_beam(self):
+        self.beam = _Beam(self)
+
+    def add_scalebar(self, length, label=None, corner='bottom right', frame=False):
+        self.scalebar = _Scalebar(self, length, label, corner, frame)
+
+    def set_axis_labels(self, xlabel=None, ylabel=None):
+        self.axis_labels.set_xtext(xlabel)
+        self.axis_labels.set_ytext(ylabel)
+
+    def savefig(self, filename, dpi=None, transparent=False, adjust_bbox=True, format=None, **kwargs):
+        self._figure.savefig(filename, dpi=dpi, transparent=transparent, bbox_inches='tight' if adjust_bbox else None, format=format)
+
+    def save(self, *args, **kwargs):
+        self.savefig(*args, **kwargs)
+
+    def close(self):
+        plt.close(self._figure)
+
+
+###################################################################################################
+
+# helper objects mimicking aplpy's ticks, tick_labels, axis_labels and frame
+############################################################################
+
+class _Ticks(object):
+    def __init__(self, parent):
+        self._coords = parent._ax1.coords
+
+    def show(self):
+        for coord in self._coords:
+            coord.set_ticks_visible(True)
+
+    def hide(self):
+        for coord in self._coords:
+            coord.set_ticks_visible(False)
+
+    def set_xspacing(self, spacing):
+        self._coords[0].set_ticks(spacing=spacing*u.degree)
+
+    def set_yspacing(self, spacing):
+        self._coords[1].set_ticks(spacing=spacing*u.degree)
+
+    def set_minor_frequency(self, frequency):
+        for coord in self._coords:
+            coord.display_minor_ticks(True)
+            coord.set_minor_frequency(frequency)
+
+    def set_length(self, length):
+        for coord in self._coords:
+            coord.set_ticks(size=length)
+
+    def set_color(self, color):
+        for coord in self._coords:
+            coord.set_ticks(color=color)
+
+
+class _TickLabels(object):
+    def __init__(self, parent):
+        self._coords = parent._ax1.coords
+
+    def show(self):
+        for coord in self._coords:
+            coord.set_ticklabel_visible(True)
+
+    def hide(self):
+        for coord in self._coords:
+            coord.set_ticklabel_visible(False)
+
+    def hide_x(self):
+        self._coords[0].set_ticklabel_visible(False)
+
+    def hide_y(self):
+        self._coords[1].set_ticklabel_visible(False)
+
+    def set_xformat(self, format):
+        self._coords[0].set_major_formatter(format)
+
+    def set_yformat(self, format):
+        self._coords[1].set_major_formatter(format)
+
+    def set_font(self, **kwargs):
+        for coord in self._coords:
+            coord.set_ticklabel(**kwargs)
+
+
+class _AxisLabels(object):
+    def __init__(self, parent):
+        self._coords  = parent._ax1.coords
+        self._visible = [True, True]
+        self._font    = {}
+        self._texts   = [self._default_text(parent._header, i) for i in range(2)]
+        self._update()
+
+    @staticmethod
+    def _default_text(header, i):
+        ctype = str(header.get('ctype'+str(i+1), ''))
+        equinox = 'J2000' if ( 'FK5' in str(header.get('radesys','FK5')) ) else str(header.get('radesys'))
+        if ctype.startswith('RA'):
+            return 'RA ('+equinox+')'
+        if ctype.startswith('DEC'):
+            return 'Dec ('+equinox+')'
+        if ctype.startswith('GLON'):
+            return 'Galactic Longitude'
+        if ctype.startswith('GLAT'):
+            return 'Galactic Latitude'
+        unit = header.get('cunit'+str(i+1))
+        return ctype.split('-')[0].capitalize()+(' ['+unit+']' if unit else '')
+
+    def _update(self):
+        for coord, text, visible in zip(self._coords, self._texts, self._visible):
+            coord.set_axislabel(text if visible else '', **self._font)
+
+    def show(self):
+        self._visible = [True, True]
+        self._update()
+
+    def hide(self):
+        self._visible = [False, False]
+        self._update()
+
+    def hide_x(self):
+        self._visible[0] = False
+        self._update()
+
+    def hide_y(self):
+        self._visible[1] = False
+        self._update()
+
+    def set_xtext(self, text):
+        self._texts[0] = text
+        self._update()
+
+    def set_ytext(self, text):
+        self._texts[1] = text
+        self._update()
+
+    def set_font(self, **kwargs):
+        self._font.update(kwargs)
+        self._update()
+
+
+class _Frame(object):
+    def __init__(self, parent):
+        self._frame = parent._ax1.coords.frame
+
+    def set_color(self, color):
+        self._frame.set_color(color)
+
+    def set_linewidth(self, linewidth):
+        self._frame.set_linewidth(linewidth)
+
+
+###################################################################################################
+
+# colorbar, beam and scalebar
+#############################
+
+class _Colorbar(object):
+    """
+    Colorbar in an axes next to the image axes. All setters redraw the colorbar so that they can be
+    called in any order, like in aplpy.
+    """
+
+    def __init__(self, parent):
+        self._parent     = parent
+        self._shown      = False
+        self._location   = 'right'
+        self._box        = None
+        self._size       = 0.2                                                 # inches, as aplpy
+        self._pad        = 0.05                                                # inches, as aplpy
+        self._text       = None
+        self._labelpad   = None
+        self._ticks      = None
+        self._font       = {}
+        self._label_font = {}
+        self._frame      = None
+        self._colorbar   = None
+
+    def _draw(self):
+        if not self._shown:
+            return
+        if self._colorbar is not None:
+            self._colorbar.ax.remove()
+        ax     = self._parent._ax1
+        figure = self._parent._figure
+        ax.apply_aspect()                                                      # position of the image after fixing the aspect ratio
+        pos    = ax.get_position()
+        fw, fh = figure.get_size_inches()
+        if self._box:
+            box = self._box
+        elif ( self._location == 'right' ):
+            box = [pos.x1+self._pad/fw, pos.y0, self._size/fw, pos.height]
+        elif ( self._location == 'left' ):
+            box = [pos.x0-(self._pad+self._size)/fw, pos.y0, self._size/fw, pos.height]
+        elif ( self._location == 'top' ):
+            box = [pos.x0, pos.y1+self._pad/fh, pos.width, self._size/fh]
+        elif ( self._location == 'bottom' ):
+            box = [pos.x0, pos.y0-(self._pad+self._size)/fh, pos.width, self._size/fh]
+        else:
+            raise ValueError("Colorbar: unknown location '"+str(self._location)+"'.")
+        orientation = 'vertical' if self._location in ['left','right'] else 'horizontal'
+
+        cax = figure.add_axes(box)
+        self._colorbar = figure.colorbar(self._parent.image, cax=cax, orientation=orientation, ticks=self._ticks)
+        if ( orientation == 'vertical' ):
+            cax.yaxis.set_ticks_position(self._location)
+            cax.yaxis.set_label_position(self._location)
+        else:
+            cax.xaxis.set_ticks_position(self._location)
+            cax.xaxis.set_label_position(self._location)
+        if self._text is not None:
+            self._colorbar.set_label(self._text, labelpad=self._labelpad, **self._label_font)
+        if self._font:
+            cax.tick_params(labelsize=self._font.get('size'))
+        if self._frame:
+            self._colorbar.outline.set_edgecolor(self._frame)
+
+    def show(self):
+        self._shown = True
+        self._draw()
+
+    def hide(self):
+        self._shown = False
+        if self._colorbar is not None:
+            self._colorbar.ax.remove()
+            self._colorbar = None
+
+    def set_location(self, location):
+        self._location = location
+        self._draw()
+
+    def set_box(self, box, box_orientation='vertical'):
+        self._box = box
+        self._location = 'right' if ( box_orientation == 'vertical' ) else 'top'
+        self._draw()
+
+    def set_axis_label_text(self, text):
+        self._text = text
+        self._draw()
+
+    def set_axis_label_pad(self, pad):
+        self._labelpad = pad
+        self._draw()
+
+    def set_axis_label_font(self, **kwargs):
+        self._label_font.update(kwargs)
+        self._draw()
+
+    def set_ticks(self, ticks):
+        self._ticks = ticks
+        self._draw()
+
+    def set_font(self, **kwargs):
+        self._font.update(kwargs)
+        self._draw()
+
+    def set_frame_color(self, color):
+        self._frame = color
+        self._draw()
+
+
+class _Beam(object):
+    """
+    Beam ellipse from the BMAJ, BMIN and BPA header keywords, anchored in a corner of the axes.
+    """
+
+    def __init__(self, parent):
+        self._parent = parent
+        header = parent._header
+        if not ( 'bmaj' in header and 'bmin' in header ):
+            raise KeyError("Header keywords BMAJ and BMIN are needed to show the beam.")
+        self._bmaj   = header['bmaj']
+        self._bmin   = header['bmin']
+        self._bpa    = header.get('bpa', 0.)
+        self._corner = 'bottom left'
+        self._frame  = False
+        self._color  = 'black'
+        self._shown  = False
+        self._artist = None
+
+    def _draw(self):
+        if not self._shown:
+            return
+        from mpl_toolkits.axes_grid1.anchored_artists import AnchoredAuxTransformBox
+        if self._artist is not None:
+            self._artist.remove()
+        scale = self._parent._pixel_scales()[0]*self._parent._units[0]       # degrees per pixel
+        box = AnchoredAuxTransformBox(self._parent._ax1.transData, loc=_location(self._corner), frameon=self._frame)
+        box.drawing_area.add_artist(Ellipse((0,0), width=self._bmin/scale, height=self._bmaj/scale, angle=self._bpa,
+                                            facecolor=self._color, edgecolor=self._color))
+        self._artist = self._parent._ax1.add_artist(box)
+
+    def show(self):
+        self._shown = True
+        self._draw()
+
+    def hide(self):
+        self._shown = False
+        if self._artist is not None:
+            self._artist.remove()
+            self._artist = None
+
+    def set_corner(self, corner):
+        self._corner = corner
+        self._draw()
+
+    def set_frame(self, frame):
+        self._frame = frame
+        self._draw()
+
+    def set_color(self, color):
+        self._color = color
+        self._draw()
+
+
+class _Scalebar(object):
+    """
+    Horizontal bar of a given length in degrees with a label below, anchored in a corner of the axes.
+    """
+
+    def __init__(self, parent, length, label, corner, frame):
+        self._parent    = parent
+        self._length    = length
+        self._label     = label
+        self._corner    = corner
+        self._frame     = frame
+        self._font      = {}
+        self._linestyle = 'solid'
+        self._linewidth = 2.
+        self._color     = 'black'
+        self._artist    = None
+        self._draw()
+
+    def _draw(self):
+        from matplotlib.lines import Line2D
+        from matplotlib.offsetbox import AnchoredOffsetbox, AuxTransformBox, TextArea, VPacker
+        if self._artist is not None:
+            self._artist.remove()
+        size = self._length/(self._parent._pixel_scales()[0]*self._parent._units[0])
+        bar = AuxTransformBox(self._parent._ax1.transData)
+        bar.add_artist(Line2D([0,size], [0,0], color=self._color, linestyle=self._linestyle, linewidth=self._linewidth))
+        children = [bar]
+        if self._label:
+            props = dict(self._font, color=self._color)
+            children.append(TextArea(self._label, textprops=props))
+        packed = VPacker(children=children, align='center', pad=0, sep=3)
+        box = AnchoredOffsetbox(loc=_location(self._corner), child=packed, frameon=self._frame, pad=0.5, borderpad=0.5)
+        self._artist = self._parent._ax1.add_artist(box)
+
+    def set_font(self, **kwargs):
+        self._font.update(kwargs)
+        self._draw()
+
+    def set_linestyle(self, linestyle):
+        self._linestyle = linestyle
+        self._draw()
+
+    def set_linewidth(self, linewidth):
+        self._linewidth = linewidth
+        self._draw()
+
+    def set_color(self, color):
+        self._color = color
+        self._draw()
+
+
+###################################################################################################
@@ -0,0 +1,129 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Compress and write rendered figures on a background thread, so    #
+# the next figure can be plotted while the previous is written.     #
+#####################################################################
+
+__all__ = ['flush','_write_output','_compress_png','_pillow_available']
+
+
+###################################################################################################
+
+# common imports
+################
+
+import io
+import os
+import atexit
+import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import easy_aplpy
+from ._incremental import _record_output
+from ..helpers._log import _info
+
+
+###################################################################################################
+
+# a single writer thread keeps the order of the outputs and of the manifest updates
+_executor = [None]
+_pending  = []
+_lock     = threading.Lock()
+
+# outputs held in memory before plotting waits for the writer
+_max_pending = 16
+
+
+def _get_executor():
+    if ( _executor[0] is None ):
+        _executor[0] = ThreadPoolExecutor(max_workers=1)
+    return _executor[0]
+
+
+def _pillow_available():
+    try:
+        import PIL
+        return True
+    except ImportError:
+        return False
+
+
+def _compress_png(data):
+    # compress a PNG that was saved without compression, keeping its resolution and text chunks
+    from PIL import Image, PngImagePlugin
+    image = Image.open(io.BytesIO(data))
+    info  = PngImagePlugin.PngInfo()
+    for key, value in image.text.items():
+        info.add_text(key, value)
+    buffer = io.BytesIO()
+    image.save(buffer, format='png', dpi=image.info.get('dpi'), pnginfo=info)
+    return buffer.getvalue()
+
+
+def _write(filename, encode, fitsfile, record):
+    data = encode()
+    tmp  = filename+'.part'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, filename)                                                  # never leave half written figures
+    _info("saved plot as "+filename)
+    _record_output(fitsfile, filename, record)
+
+
+def _write_output(filename, encode, fitsfile, kwargs):
+    """
+    Write the figure data returned by encode() to filename, on the writer thread if
+    settings.background_writes, otherwise before returning.
+    """
+    record = {key: kwargs[key] for key in ['incremental_hash','incremental_inputs'] if ( key in kwargs )}
+    if not ( easy_aplpy.settings.background_writes ):
+        _write(filename, encode, fitsfile, record)
+        return
+    with _lock:
+        # forget outputs written successfully, keep failed ones for flush
+        _pending[:] = [(name, future) for name, future in _pending if not future.done() or ( future.exception() is not None )]
+        _pending.append((filename, _get_executor().submit(_write, filename, encode, fitsfile, record)))
+        waiting = [future for name, future in _pending if not future.done()]
+    if ( len(waiting) > _max_pending ):
+        waiting[0].exception()                                                 # wait for the oldest, errors are reported by flush
+
+
+def flush(raise_errors=True):
+    """
+    easy_aplpy.plot.flush
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Wait until all figures are written to disk. With easy_aplpy.settings.background_writes = True
+    figures are compressed (PNG) and written on a background thread, so call this before using the
+    files in the same script. It is called automatically by easy_aplpy.plot.batch,
+    easy_aplpy.helpers.trim_whitespace and when python exits.
+
+    Returned objects:
+    dictionary      File name: traceback of all outputs that could not be written. Empty if all
+                    figures were written.
+
+    Optional arguments:
+        raise_errors    Raise the error of the first output that could not be written.
+                        Defaults to True.
+    """
+    with _lock:
+        pending = list(_pending)
+        del _pending[:]
+    errors = {}
+    first  = None
+    for filename, future in pending:
+        error = future.exception()
+        if error is not None:
+            errors[filename] = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            first = error if ( first is None ) else first
+    if raise_errors and ( first is not None ):
+        raise first
+    return errors
+
+
+atexit.register(flush, False)
+
+
+###################################################################################################
@@ -0,0 +1,118 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# These functions will produce plots of channel maps, moment maps,  #
+# pV diagrams, ... in a quality that (hopefully) allows publishing. #
+#####################################################################
+
+__all__ = ['batch']
+
+
+###################################################################################################
+
+# load helper functions
+#######################
+
+import time
+import traceback
+import matplotlib.pyplot as plt
+from .map import map
+from .grid import grid
+from ..helpers._log import _info
+from ._writer import flush
+from ._incremental import _output_paths
+
+
+###################################################################################################
+
+# plot many figures
+###################
+
+def batch(jobs, raise_errors=True):
+    """
+    easy_aplpy.plot.batch
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Plot many maps and grids in one go. Every job is a dictionary of the arguments to
+    easy_aplpy.plot.map or easy_aplpy.plot.grid plus the type of plot. All jobs share the same
+    state: FITS headers and data are parsed only once per file (see settings.fits_cache_size),
+    colormaps given by name are looked up only once and all jobs draw into a single recycled
+    matplotlib figure instead of creating (and leaking) a new figure per plot.
+
+    Returned objects:
+    list of dictionaries
+                    One dictionary per job with the keys 'type', 'fitsfile', 'out', 'time' (wall
+                    clock time in seconds) and 'error' (None or the traceback of a failed job).
+
+    Mandatory unnamed arguments:
+        jobs        List of job dictionaries. Each must contain 'type' ('map' or 'grid') and
+                    'fitsfile'. Grid jobs also need 'shape' and 'channels'. All other keys are
+                    passed on as keyword arguments. 'figure' must not be given.
+
+    Optional arguments:
+        raise_errors    Stop at the first failing job (True, default) or record the error in the
+                        returned list and continue with the next job (False).
+
+
+    examples:
+
+    easy_aplpy.plot.batch([{'type': 'map', 'fitsfile': 'map.fits', 'out': 'map.png'},
+                           {'type': 'map', 'fitsfile': 'cube.fits', 'channel': 250, 'out': 'chan250.png'},
+                           {'type': 'grid', 'fitsfile': 'cube.fits', 'shape': [2,3], 'channels': [150,200,250,300,350,400]}
+                          ])
+    """
+
+    figure  = plt.figure()
+    cmaps   = {}
+    results = []
+
+    try:
+        for idx,job in enumerate(jobs):
+            _info("batch job "+str(idx+1)+" of "+str(len(jobs)))
+            details = job if isinstance(job, dict) else {}
+            result  = {'type': details.get('type', 'map'), 'fitsfile': details.get('fitsfile'), 'out': details.get('out'), 'time': None, 'error': None}
+            start   = time.perf_counter()
+            try:
+                if not ( isinstance(job, dict) and ( 'fitsfile' in job ) ):
+                    raise TypeError("Batch: job "+str(idx+1)+" must be a dictionary with at least 'fitsfile'.")
+                kwargs   = dict(job)
+                plottype = kwargs.pop('type', 'map')
+                fitsfile = kwargs.pop('fitsfile')
+                kwargs['figure'] = figure
+
+                # look up named colormaps only once
+                cmap = kwargs.get('cmap', 'viridis')
+                if isinstance(cmap, str):
+                    if not ( cmap in cmaps ):
+                        cmaps[cmap] = plt.get_cmap(cmap)
+                    kwargs['cmap'] = cmaps[cmap]
+
+                if ( plottype == 'map' ):
+                    map(fitsfile, **kwargs)
+                elif ( plottype == 'grid' ):
+                    shape    = kwargs.pop('shape')
+                    channels = kwargs.pop('channels')
+                    grid(fitsfile, shape, channels, **kwargs)
+                else:
+                    raise TypeError("Batch: unknown job type '"+str(plottype)+"'. Must be 'map' or 'grid'.")
+            except Exception:
+                if raise_errors:
+                    raise
+                result['error'] = traceback.format_exc()
+            result['time'] = time.perf_counter()-start
+            results.append(result)
+    finally:
+        plt.close(figure)
+
+    # wait for the figures still being written and note failed writes with their job
+    errors = flush(raise_errors)
+    for job, result in zip(jobs, results):
+        if not isinstance(job, dict):
+            continue
+        failed = [errors[out] for out in _output_paths(job.get('fitsfile'), job) if ( out in errors )]
+        if failed and ( result['error'] is None ):
+            result['error'] = failed[0]
+    return results
+
+
+###################################################################################################
@@ -16,6 +16,9 @@ __all__ = ['grid']
 import numpy as np
 from astropy.io import fits
 from ._helpers import *
+from ._parallel import _plot_panels_parallel
+from ._incremental import _skip_unchanged
+from ..helpers._log import _timing_report
 
 
 ###################################################################################################
@@ -37,11 +40,14 @@ def grid(fitsfile, shape, channels, **kwargs):
     matplotlib.figure instance
                     The figure instance is returned for further manual customisation. The individual
                     panels can be accessed through fig.get_axes() which returns a list of axes
-                    isinstances of the panels.
+                    isinstances of the panels. (None, []) if the plot was skipped in incremental mode.
+    dict            Only with timing=True: the timing report, returned as third object.
 
     Mandatory unnamed arguments:
         fitsfile    Path and file name of the fits image to be plotted. Can be a 2D image (map),
-                    3D image (cube) or a 2D position velocity diagram.
+                    3D image (cube) or a 2D position velocity diagram. Can also be an in-memory
+                    astropy HDU, e.g. a moment map from easy_aplpy.compute.moments. Plots of
+                    in-memory images are only saved if 'out' is given.
         shape       The number of columns and rows as a list, e.g. [2,3]
         channels    A list specifying the channels of the input fits file that should be plotted.
 
@@ -50,14 +56,25 @@ def grid(fitsfile, shape, channels, **kwargs):
         out         Path and file name of the created plot. If not specified, the plot will be
                     saved as png where the input image is located.
                     OR dictionary specifying matplotlib.figure.save parameters.
+                    OR a list of file names/dictionaries to save several outputs (e.g. png, pdf and
+                    a low dpi thumbnail) from a single plot. Dictionaries take the arguments of
+                    aplpy.FITSFigure.savefig (filename, dpi, transparent, adjust_bbox, max_dpi,
+                    format). With easy_aplpy.settings.background_writes = True the files are
+                    written on a background thread, use easy_aplpy.plot.flush() to wait for them.
 
         figsize     Fiugre size as tupel in inches. Defaults to A4 size (8.267 * 11.692 inches)
 
+        figure      An existing matplotlib figure to draw into instead of creating a new one. The
+                    figure is cleared first. Useful to recycle a single figure for many plots.
+
         cmap        Colormap to plot the image. Defaults to viridis. Every named matplotlib
                     colormap can be used or any matplotlib colormap object.
 
         vmin        Minimum value for colormap normalization. Autoscales if not provided.
         vmax        Maximum value for colormap normalization. Autoscales if not provided.
+                    Autoscaled limits are percentiles (easy_aplpy.settings.autoscale_pmin/pmax)
+                    of pixels sampled from all shown channels and are shared by all panels and
+                    the colorbar.
 
         stretch     Colormap strech. APLpy provides 'linear', 'log', 'sqrt', 'arcsin', 'power'.
 
@@ -101,10 +118,53 @@ def grid(fitsfile, shape, channels, **kwargs):
                     what type of overlay needs which information. Positions and lengths need to be
                     given as SkyCoord and astropy.units. The last element needs to be a kwarg dict
                     which can also be empty if you do not want to provide e.g. linewidth or style.
+                    A single element can place many overlays by giving an array SkyCoord (and
+                    array or scalar sizes). Elements with identical kwargs are drawn together as one
+                    collection, so thousands of sources are fast to draw.
                     You can draw an arbitrary list of overlays in each panel. If no overlays should
                     be plotted in a particular panel just give an empty list. Structure:
                     [[[panel1/olay1],[panel1/olay2]], [[panel2/olay1],[panel2/olay2]], ... ]
                     Also see example below.
+        regions     List of lists (one per panel) of DS9 region files or pyregion ShapeLists to
+                    overlay. Each file is parsed once and kept in memory until it changes on disk,
+                    so all panels share it. All shapes of a file are drawn as a single collection.
+                    Requires pyregion.
+        catalogues  List of lists of source catalogues (one list per panel) to overlay as markers.
+                    Each catalogue element is
+                    ['catalogue.fits' or 'catalogue.csv', kwargs] or [file, options, kwargs] with
+                    show_markers kwargs. The positions are read once from a FITS table or a csv file
+                    with a header line and indexed, only the sources within the shown region (plus a
+                    margin) are drawn. Options (dict): 'columns' (default ['ra','dec']), 'unit'
+                    ('deg'), 'frame' ('icrs'), 'hdu' (1), 'delimiter' (','), 'margin' (0.1 of the
+                    view), 'mag' (column to scale the marker area with), 'mag_range' ([bright, faint],
+                    default 1st and 99th percentile) and 'sizes' (marker area of [bright, faint]
+                    sources in points^2, default [40,2]).
+
+        incremental Skip plotting if the output file exists and was produced from identical input
+                    files, arguments and easy_aplpy.settings. What produced each output is recorded
+                    in easy_aplpy.manifest.json next to the output. Arguments of types that cannot
+                    be compared (e.g. pyregion shapes) are always plotted. Defaults to
+                    easy_aplpy.settings.incremental (False).
+
+        engine      'aplpy' to draw with aplpy.FITSFigure or 'wcsaxes' to draw directly with
+                    matplotlib and astropy's WCSAxes, which is faster, uses less memory and works
+                    with current astropy/matplotlib versions without APLpy. Defaults to
+                    easy_aplpy.settings.engine ('aplpy').
+
+        timing      Also return a timing report, a dict with the total time ('seconds'), the time
+                    per stage ('stages') and the individual stage events ('events'), see
+                    easy_aplpy.helpers.add_stage_callback. Defaults to False.
+
+        downsample  Block average images that have more pixels than the output before plotting.
+                    True (default, easy_aplpy.settings.downsample) picks the factor from the axes
+                    size and the output dpi, an integer sets the factor, False plots all pixels.
+                    Keep this off if individual pixels must stay visible.
+
+        workers     Render the map panels in this many worker processes. Each panel is rasterised in
+                    a worker and placed in the main figure as an image, so the figure must be saved at the
+                    dpi given in 'out' (default 300; the highest one if 'out' is a list) and the
+                    returned list of panel figures is empty.
+                    All arguments must be picklable. Defaults to None, i.e. serial rendering.
 
     General style settings
         Settings that do not have to be changed for each plot but maybe once per script or once per
@@ -142,26 +202,25 @@ def grid(fitsfile, shape, channels, **kwargs):
         )
     """
 
+    if kwargs.get('timing'):
+        with _timing_report() as report:
+            main_fig,subfigs = grid(fitsfile, shape, channels, **dict(kwargs, timing=False))
+        return main_fig,subfigs,report
+    if _skip_unchanged('grid', fitsfile, [shape, channels], kwargs):
+        return None,[]
     kwargs   = _check_image_type(fitsfile, kwargs)
     main_fig = _set_up_grid(fitsfile, shape, kwargs)
     panels   = _grid_panels(fitsfile, shape, channels, kwargs)
+    _grid_limits(fitsfile, panels, kwargs)
     subfigs  = []
-
-    for panel in panels:
-        if ( panel['type'] == 'map' ):
-
-            fig = _set_up_panel_figure(main_fig, panel, kwargs)
-            _show_map(panel['file'], fig, kwargs)
-            if ( 'left' in panel['position'] and 'bottom' in panel['position'] ):
-                _show_beam(panel['file'], fig, kwargs)
-            _show_channel_label(panel, fig, kwargs)
-            _show_contours(panel['file'], fig, kwargs, panel)
-            _overplot_regions(panel['file'], fig, kwargs, panel)
-            _show_overlays(panel['file'], fig, kwargs, panel)
-            _show_scalebar(panel['file'], fig, kwargs, panel)
-            _format_grid_ticksNlabels(panel, fig, kwargs)
-            _recenter_plot(panel['file'], fig, kwargs)              # recenter needs to be last, otherwise label hiding does not work!
-            subfigs.append(fig)
+    workers  = kwargs.get('workers')
+
+    if workers and ( workers > 1 ):
+        subfigs = _plot_panels_parallel(main_fig, panels, kwargs, workers)
+    else:
+        for panel in panels:
+            if ( panel['type'] == 'map' ):
+                subfigs.append(_plot_panel(main_fig, panel, kwargs))
 
     _show_grid_colorbar(fitsfile, main_fig, panels, kwargs)
     #_show_grid_legend(panel['file'], fig, kwargs)
@@ -14,6 +14,8 @@ __all__ = ['map']
 #######################
 
 from ._helpers import *
+from ._incremental import _skip_unchanged
+from ..helpers._log import _timing_report
 
 
 ###################################################################################################
@@ -33,11 +35,15 @@ def map(fitsfile, **kwargs):
 
     Returned objects:
     matplotlib.figure instance
-                    The figure instance is returned for further manual customisation.
+                    The figure instance is returned for further manual customisation. None if the
+                    plot was skipped in incremental mode.
+    dict            Only with timing=True: the timing report, returned as second object.
 
     Mandatory unnamed arguments:
         fitsfile    Path and file name of the fits image to be plotted. Can be a 2D image (map),
-                    3D image (cube) or a 2D position velocity diagram.
+                    3D image (cube) or a 2D position velocity diagram. Can also be an in-memory
+                    astropy HDU, e.g. a moment map from easy_aplpy.compute.moments. Plots of
+                    in-memory images are only saved if 'out' is given.
 
 
     Optional arguments:
@@ -45,18 +51,30 @@ def map(fitsfile, **kwargs):
                     saved as png where the input image is located. Use None to not save the
                     figure. This can be useful for interactive plotting in jupyter notebooks.
                     OR dictionary specifying matplotlib.figure.save parameters.
+                    OR a list of file names/dictionaries to save several outputs (e.g. png, pdf and
+                    a low dpi thumbnail) from a single plot. Dictionaries take the arguments of
+                    aplpy.FITSFigure.savefig (filename, dpi, transparent, adjust_bbox, max_dpi,
+                    format). With easy_aplpy.settings.background_writes = True the files are
+                    written on a background thread, use easy_aplpy.plot.flush() to wait for them.
 
         channel     The channel to be plotted if fitsfile is a data cube instead of a 2D image.
                     Can be either the channel number (starting at 1) or the frequency/velocity
-                    when the axis is given as frequency or velocity.
+                    when the axis is given as frequency or velocity. Velocities and frequencies are
+                    converted into each other using the rest frequency in the header if necessary.
 
         figsize     Fiugre size as tupel in inches. Defaults to A4 size (8.267 * 11.692 inches)
 
+        figure      An existing matplotlib figure to draw into instead of creating a new one. The
+                    figure is cleared first. Useful to recycle a single figure for many plots.
+
         cmap        Colormap to plot the image. Defaults to viridis. Every named matplotlib
                     colormap can be used or any matplotlib colormap object.
 
         vmin        Minimum value for colormap normalization. Autoscales if not provided.
         vmax        Maximum value for colormap normalization. Autoscales if not provided.
+                    Autoscaled limits are percentiles (easy_aplpy.settings.autoscale_pmin/pmax)
+                    of a reproducible sample of at most easy_aplpy.settings.autoscale_samples
+                    pixels, so huge images are never read completely.
 
         stretch     Colormap strech. APLpy provides 'linear', 'log', 'sqrt', 'arcsin', 'power'.
 
@@ -100,11 +118,46 @@ def map(fitsfile, **kwargs):
                     what type of overlay needs which information. Positions and lengths need to be
                     given as SkyCoord and astropy.units. The last element needs to be a kwarg dict
                     which can also be empty if you do not want to provide e.g. linewidth or style.
+                    A single element can place many overlays by giving an array SkyCoord (and
+                    array or scalar sizes). Elements with identical kwargs are drawn together as one
+                    collection, so thousands of sources are fast to draw.
         texts       List of text overlay elements. Each text overlay elements should give position,
                     text (as a string) and a text formatting dictionary. The position can be a
                     SkyCoord object or a list of relative coordinates in the figure (e.g. [0.1,0.1]
                     for lower left corner). The dictionary with formatting information can be empty
                     to use the default font size, boldness, ..., else pyplot.text kwargs are accepted.
+        regions     List of DS9 region files (or pyregion ShapeLists) to overlay. Each file is parsed
+                    once and kept in memory until it changes on disk, all shapes of a file are drawn
+                    as a single collection. Requires pyregion.
+        catalogues  List of source catalogues to overlay as markers. Each element is
+                    ['catalogue.fits' or 'catalogue.csv', kwargs] or [file, options, kwargs] with
+                    show_markers kwargs. The positions are read once from a FITS table or a csv file
+                    with a header line and indexed, only the sources within the shown region (plus a
+                    margin) are drawn. Options (dict): 'columns' (default ['ra','dec']), 'unit'
+                    ('deg'), 'frame' ('icrs'), 'hdu' (1), 'delimiter' (','), 'margin' (0.1 of the
+                    view), 'mag' (column to scale the marker area with), 'mag_range' ([bright, faint],
+                    default 1st and 99th percentile) and 'sizes' (marker area of [bright, faint]
+                    sources in points^2, default [40,2]).
+
+        incremental Skip plotting if the output file exists and was produced from identical input
+                    files, arguments and easy_aplpy.settings. What produced each output is recorded
+                    in easy_aplpy.manifest.json next to the output. Arguments of types that cannot
+                    be compared (e.g. pyregion shapes) are always plotted. Defaults to
+                    easy_aplpy.settings.incremental (False).
+
+        engine      'aplpy' to draw with aplpy.FITSFigure or 'wcsaxes' to draw directly with
+                    matplotlib and astropy's WCSAxes, which is faster, uses less memory and works
+                    with current astropy/matplotlib versions without APLpy. Defaults to
+                    easy_aplpy.settings.engine ('aplpy').
+
+        timing      Also return a timing report, a dict with the total time ('seconds'), the time
+                    per stage ('stages') and the individual stage events ('events'), see
+                    easy_aplpy.helpers.add_stage_callback. Defaults to False.
+
+        downsample  Block average images that have more pixels than the output before plotting.
+                    True (default, easy_aplpy.settings.downsample) picks the factor from the axes
+                    size and the output dpi, an integer sets the factor, False plots all pixels.
+                    Keep this off if individual pixels must stay visible.
 
         execute_code    This option allows to pass arbitrary code that is executed just before
                         saving the figure and can be used to access aplpy functionality that is
@@ -164,6 +217,17 @@ def map(fitsfile, **kwargs):
         )
     """
 
+    if kwargs.get('timing'):
+        with _timing_report() as report:
+            fig = map(fitsfile, **dict(kwargs, timing=False))
+        return fig, report
+    if _skip_unchanged('map', fitsfile, [], kwargs):
+        return None
+    return _plot_map(fitsfile, kwargs)
+
+
+def _plot_map(fitsfile, kwargs):
+    # the map pipeline, working on the given kwargs dict so that callers see what the stages store in it
     kwargs = _check_image_type(fitsfile, kwargs)
     fig = _set_up_figure(fitsfile, kwargs)
     _show_map(fitsfile, fig, kwargs)
@@ -175,6 +239,7 @@ def map(fitsfile, **kwargs):
     _show_beam(fitsfile, fig, kwargs)
     _show_label(fitsfile, fig, kwargs)
     _show_overlays(fitsfile, fig, kwargs)
+    _show_catalogues(fitsfile, fig, kwargs)
     _show_ticksNlabels(fitsfile, fig, kwargs)
     _show_legend(fitsfile, fig, kwargs)
 #    _execute_code(panel['file'], fig, kwargs, panel)       # unsafe and should not be used
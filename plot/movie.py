@@ -0,0 +1,193 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# These functions will produce plots of channel maps, moment maps,  #
+# pV diagrams, ... in a quality that (hopefully) allows publishing. #
+#####################################################################
+
+__all__ = ['frames','movie']
+
+
+###################################################################################################
+
+# load helper functions
+#######################
+
+import os
+import shutil
+import subprocess
+import numpy as np
+from astropy import units as u
+from ._helpers import *
+from .map import _plot_map
+from ..helpers._fits import _get_header
+from ..helpers._spectral import _channels_physical
+from ..helpers._log import _info
+
+
+###################################################################################################
+
+# step through the channels of a cube
+#####################################
+
+def frames(fitsfile, channels=None, dpi=100, **kwargs):
+    """
+    easy_aplpy.plot.frames
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Generator that renders one channel of a cube after the other. The figure is set up only once
+    with easy_aplpy.plot.map for the first channel (including colorbar, ticks, beam, static contours
+    and overlays). For all following channels only the image data, the channel contours and the
+    channel label are replaced. The stretch (vmin, vmax) is therefore fixed for all frames. Give vmin
+    and vmax explicitly if the first channel is not representative.
+
+    Yielded objects:
+    (channel, numpy.ndarray)
+                    The channel number and the rendered frame as RGBA array of shape (height, width, 4).
+
+    Mandatory unnamed arguments:
+        fitsfile    Path and file name of the fits cube.
+
+    Optional arguments:
+        channels    List of channels to render, given as channel numbers or velocities/frequencies.
+                    Defaults to all channels of the cube.
+
+        dpi         Resolution of the frames. Defaults to 100.
+
+        channel_contours
+                    Contours of the currently shown channel, given as [levels, colors] or
+                    [levels, colors, kwargs]. These are redrawn for every frame while the contours
+                    given by 'contours' stay the same for all frames.
+
+        channel_label
+                    Label each frame with 'physical' (default), 'number', None or a list of strings.
+
+        All other arguments of easy_aplpy.plot.map except 'out' and 'channel' are supported.
+
+
+    examples:
+
+    for channel,frame in easy_aplpy.plot.frames('cube.fits', vmin=0, vmax=60):
+        ...
+    """
+
+    if ( channels is None ):
+        channels = np.arange(_get_header(fitsfile)['naxis3'])
+    channel_label = kwargs.get('channel_label','physical')
+    if ( channel_label == 'physical' ) or isinstance(channels, u.quantity.Quantity) or any(isinstance(c, u.quantity.Quantity) for c in channels):
+        channels,physicals = _channels_physical(fitsfile, channels)
+    else:
+        physicals = [None for channel in channels]
+
+    kwargs['out']     = None
+    kwargs['channel'] = channels[0]
+    fig    = _plot_map(fitsfile, kwargs)
+    canvas = fig._figure.canvas
+    fig._figure.set_dpi(dpi)
+
+    try:
+        for idx, (channel,physical) in enumerate(zip(channels,physicals)):
+            if ( idx > 0 ):
+                _swap_image(fig, _display_hdu(fitsfile, channel, kwargs))     # same binning as the first frame
+            _show_channel_contours(fitsfile, fig, kwargs, channel)
+            _show_channel_label({'num': idx, 'channel': channel, 'physical': physical}, fig, kwargs, layer='channel_label')
+            canvas.draw()
+            yield channel, np.array(canvas.buffer_rgba())
+    finally:
+        fig.close()
+
+
+###################################################################################################
+
+# write a channel movie
+#######################
+
+def movie(fitsfile, out, channels=None, fps=10, dpi=100, **kwargs):
+    """
+    easy_aplpy.plot.movie
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Write a channel movie of a cube. The frames are produced by easy_aplpy.plot.frames and streamed
+    to the output file one by one, so they are never all held in memory. If ffmpeg is available, the
+    frames are piped to ffmpeg which supports e.g. mp4, gif and apng (.png/.apng) output. Otherwise
+    gif and apng files are written with Pillow, which does keep the frames in memory.
+
+    Mandatory unnamed arguments:
+        fitsfile    Path and file name of the fits cube.
+        out         Path and file name of the movie. The format is determined by the extension.
+
+    Optional arguments:
+        channels    List of channels to render. Defaults to all channels of the cube.
+        fps         Frames per second. Defaults to 10.
+        dpi         Resolution of the frames. Defaults to 100.
+
+        All other arguments of easy_aplpy.plot.frames and easy_aplpy.plot.map are supported.
+
+
+    examples:
+
+    easy_aplpy.plot.movie('cube.fits', 'cube.mp4',
+        vmin = 0,
+        vmax = 60,
+        channel_contours = [[5,10,20,40], 'white']
+        )
+    """
+
+    _info("writing channel movie "+out)
+    if os.path.dirname(out) != '':
+        if not os.path.exists(os.path.dirname(out)):
+            os.makedirs(os.path.dirname(out))
+    fext = os.path.splitext(out)[1].lower()
+    frame_iter = frames(fitsfile, channels, dpi=dpi, **kwargs)
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        _write_ffmpeg(ffmpeg, frame_iter, out, fext, fps)
+    elif fext in ['.gif','.png','.apng']:
+        _write_pillow(frame_iter, out, fext, fps)
+    else:
+        raise Exception("Writing "+fext+" movies requires ffmpeg. Install ffmpeg or write a .gif or .png (apng) movie.")
+    _info("saved movie as "+out)
+
+
+def _write_ffmpeg(ffmpeg, frame_iter, out, fext, fps):
+    channel,frame = next(frame_iter)
+    height,width  = frame.shape[:2]
+    cmd = [ffmpeg, '-y', '-loglevel', 'error',
+           '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', str(width)+'x'+str(height), '-r', str(fps), '-i', '-']
+    if fext in ['.png','.apng']:
+        cmd += ['-f', 'apng', '-plays', '0']
+    elif not ( fext == '.gif' ):
+        cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p']     # most players need even sizes and yuv420p
+    cmd += [out]
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        proc.stdin.write(frame.tobytes())
+        for channel,frame in frame_iter:
+            proc.stdin.write(frame.tobytes())
+    finally:
+        frame_iter.close()
+        proc.stdin.close()
+        proc.wait()
+    if not ( proc.returncode == 0 ):
+        raise Exception("ffmpeg failed to write "+out+".")
+
+
+def _write_pillow(frame_iter, out, fext, fps):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Writing movies without ffmpeg requires Pillow.")
+    channel,frame = next(frame_iter)
+    first = Image.fromarray(frame)
+    first.save(out,
+               format        = 'GIF' if ( fext == '.gif' ) else 'PNG',
+               save_all      = True,
+               append_images = (Image.fromarray(frame) for channel,frame in frame_iter),
+               duration      = int(1000./fps),
+               loop          = 0
+              )
+
+
+###################################################################################################
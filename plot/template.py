@@ -0,0 +1,224 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Grid templates: set up the panels, axes, ticks and colorbar of a  #
+# channel map grid once and fill them with many cubes.              #
+#####################################################################
+
+__all__ = ['GridTemplate']
+
+
+###################################################################################################
+
+# load helper functions
+#######################
+
+from ._helpers import *
+from ._incremental import _skip_unchanged
+from ..helpers._fits import _file_name, _get_header, _plane_header
+from ..helpers._log import _info, _stage, _timing_report
+
+
+###################################################################################################
+
+# header keywords that fix the axes, ticks and beam of a filled template
+_template_keys = ['naxis1','naxis2','ctype1','ctype2','cunit1','cunit2','crval1','crval2','crpix1','crpix2',
+                  'cdelt1','cdelt2','crota2','cd1_1','cd1_2','cd2_1','cd2_2','pc1_1','pc1_2','pc2_1','pc2_2',
+                  'radesys','equinox','bmaj','bmin','bpa']
+
+# arguments that may change from one cube to the next, all others define the template
+_fill_kwargs = ['out','vmin','vmax','contours','clabel','regions','circles','markers','polygons','arrows',
+                'ellipses','lines','rectangles','texts','channel_label','incremental','timing']
+
+
+def _template_key(fitsfile, channels, kwargs):
+    # cubes with the same key can be shown in the same axes
+    header = _plane_header(_get_header(fitsfile))
+    return (kwargs.get('imtype'), len(channels))+tuple(str(header.get(key)) for key in _template_keys)
+
+
+def _axes_artists(fig):
+    ax = fig._ax1
+    return set(ax.collections) | set(ax.patches) | set(ax.lines) | set(ax.texts) | set(ax.artists)
+
+
+###################################################################################################
+
+@_stage
+def _show_panel_data(panel, fig, kwargs):
+    """
+    Draw everything of a panel that depends on the cube: channel label, contours, regions and
+    overlays. Return the layers and artists that were added, so that they can be removed again.
+    """
+    layers  = set(fig._layers)
+    artists = _axes_artists(fig)
+    _show_channel_label(panel, fig, kwargs)
+    _show_contours(panel['file'], fig, kwargs, panel)
+    _overplot_regions(panel['file'], fig, kwargs, panel)
+    _show_overlays(panel['file'], fig, kwargs, panel)
+    return {'layers': set(fig._layers)-layers, 'artists': _axes_artists(fig)-artists}
+
+
+def _clear_panel_data(fig, added):
+    for layer in added['layers']:
+        fig.remove_layer(layer, raise_exception=False)
+    for artist in added['artists'] & _axes_artists(fig):                       # e.g. region texts are not registered as layers
+        artist.remove()
+    # number the contour layers from 1 again, clabel looks them up by name
+    if hasattr(fig, '_contour_counter'):
+        fig._contour_counter = 0
+    getattr(fig, '_counter', {}).pop('contour_set', None)
+
+
+@_stage
+def _refill_panel(panel, state, kwargs, rescale):
+    fig = state['fig']
+    figsize = kwargs.get('figsize', (8.267,11.692))     # A4 in inches
+    _clear_panel_data(fig, state['added'])
+    _swap_image(fig, _display_hdu(panel['file'], panel['channel'], kwargs, panel['width']*figsize[0], panel['height']*figsize[1]))
+    if rescale:
+        _show_map(panel['file'], fig, kwargs)
+        _recenter_plot(panel['file'], fig, kwargs)                             # the wcsaxes engine resets the limits
+    state['added'] = _show_panel_data(panel, fig, kwargs)
+
+
+###################################################################################################
+
+# reusable grid layout
+######################
+
+class GridTemplate(object):
+    """
+    easy_aplpy.plot.GridTemplate
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A channel map grid that is set up once and then filled with many cubes, e.g. the same channels
+    of dozens of spectral lines. The first fill draws the grid like easy_aplpy.plot.grid. Following
+    fills only replace the image data, the colour scale, contours, overlays and channel labels; the
+    figure, panel axes, ticks, tick labels, beam and scalebar are reused and the colorbar is only
+    redrawn if the colour scale changed. A cube whose image axes or beam differ from the cube shown
+    before (different shape, pixel grid, coordinates or beam) is drawn from scratch into the same
+    figure.
+
+    Mandatory unnamed arguments:
+        shape       The number of columns and rows as a list, e.g. [4,5]
+
+    Optional arguments:
+        All arguments of easy_aplpy.plot.grid except 'workers'. They define the template and are
+        used for every fill.
+
+
+    GridTemplate.fill(fitsfile, channels, **kwargs)
+
+    Plot channels of fitsfile into the template and save the figure. Returns the same objects as
+    easy_aplpy.plot.grid. The figure is reused for the next fill, so copy or save it before.
+
+    Mandatory unnamed arguments:
+        fitsfile    Path and file name of the fits cube (or an in-memory HDU) to be plotted.
+        channels    A list specifying the channels of the cube that should be plotted.
+
+    Optional arguments:
+        Only arguments that can change from cube to cube: out, vmin, vmax, contours, clabel,
+        regions, circles, markers, polygons, arrows, ellipses, lines, rectangles, texts,
+        channel_label, incremental and timing. Values given here replace those of the template.
+        If vmin/vmax are not given, the colour scale is autoscaled for each cube.
+
+
+    examples:
+
+    template = easy_aplpy.plot.GridTemplate([4,5], recenter=[SkyCoord('00h47m33.07s -25d17m20.0s'), 1*u.arcmin], colorbar=['right','Jy/beam'])
+    for line in ['co_1-0','co_2-1','hcn_1-0']:
+        template.fill(line+'.fits', np.arange(100,120),
+                      contours = [[[line+'.fits', c, [5,10,20,40], 'black']] for c in np.arange(100,120)]
+                     )
+    """
+
+    def __init__(self, shape, **kwargs):
+        if kwargs.get('workers'):
+            raise TypeError("Grid templates are rendered serially, 'workers' is not supported.")
+        self.shape    = shape
+        self.kwargs   = kwargs
+        self.figure   = None
+        self._key     = None
+        self._layout  = []                                                     # panels of the first fill
+        self._panels  = []                                                     # figure and added artists of each map panel
+        self._limits  = None
+        self._colorbar = None
+        self._binning = {}                                                     # block averaging factor of each file
+
+    def fill(self, fitsfile, channels, **kwargs):
+        layout = [key for key in kwargs if not ( key in _fill_kwargs )]
+        if layout:
+            raise TypeError("GridTemplate.fill: "+', '.join(layout)+" define the template. Give them when creating the template.")
+        if kwargs.get('timing'):
+            with _timing_report() as report:
+                main_fig,subfigs = self.fill(fitsfile, channels, **dict(kwargs, timing=False))
+            return main_fig,subfigs,report
+
+        kwargs = dict(self.kwargs, binning=self._binning, **kwargs)
+        if _skip_unchanged('grid', fitsfile, [self.shape, channels], kwargs):
+            return None,[]
+        kwargs = _check_image_type(fitsfile, kwargs)
+        key    = _template_key(fitsfile, channels, kwargs)
+        if ( key == self._key ):
+            self._refill(fitsfile, channels, kwargs)
+        else:
+            self._build(fitsfile, channels, kwargs)
+            self._key = key
+        _save_figure(fitsfile, self.figure, kwargs)
+        return self.figure,[state['fig'] for state in self._panels]
+
+    def _build(self, fitsfile, channels, kwargs):
+        if not ( self.figure is None ):
+            kwargs['figure'] = self.figure                                     # cleared and reused
+        self.figure  = _set_up_grid(fitsfile, self.shape, kwargs)
+        self._layout = _grid_panels(fitsfile, self.shape, channels, kwargs)
+        self._panels = []
+        self._colorbar = None
+        self._binning.clear()                                                  # the axes size may have changed
+        _grid_limits(fitsfile, self._layout, kwargs)
+        for panel in self._layout:
+            if ( panel['type'] == 'map' ):
+                fig = _set_up_panel_figure(self.figure, panel, kwargs)
+                _show_map(panel['file'], fig, kwargs)
+                if ( 'left' in panel['position'] and 'bottom' in panel['position'] ):
+                    _show_beam(panel['file'], fig, kwargs)
+                added = _show_panel_data(panel, fig, kwargs)
+                _show_scalebar(panel['file'], fig, kwargs, panel)
+                _format_grid_ticksNlabels(panel, fig, kwargs)
+                _recenter_plot(panel['file'], fig, kwargs)              # recenter needs to be last, otherwise label hiding does not work!
+                _show_catalogues(panel['file'], fig, kwargs, panel)
+                self._panels.append({'fig': fig, 'added': added})
+        self._show_colorbar(fitsfile, kwargs)
+
+    def _refill(self, fitsfile, channels, kwargs):
+        _info("filling the grid template with "+_file_name(fitsfile))
+        channels,physicals = _panel_channels(fitsfile, channels, kwargs)
+        panels = [dict(panel, file=fitsfile) for panel in self._layout]
+        maps   = [panel for panel in panels if ( panel['type'] == 'map' )]
+        for panel,channel,physical in zip(maps, channels, physicals):
+            panel['channel']  = channel
+            panel['physical'] = physical
+        _grid_limits(fitsfile, panels, kwargs)
+        rescale = not ( self._limits == (kwargs['vmin'],kwargs['vmax']) )
+        for panel,state in zip(maps, self._panels):
+            _refill_panel(panel, state, kwargs, rescale)
+        self._show_colorbar(fitsfile, kwargs)
+
+    def _show_colorbar(self, fitsfile, kwargs):
+        # the colorbar only changes with the colour scale or the unit
+        self._limits = (kwargs['vmin'],kwargs['vmax'])
+        signature = (self._limits, _get_header(fitsfile).get('bunit'))
+        if self._colorbar and ( self._colorbar['signature'] == signature ):
+            return
+        if self._colorbar:
+            for ax in self._colorbar['axes']:
+                self.figure.delaxes(ax)
+        axes = list(self.figure.axes)
+        _show_grid_colorbar(fitsfile, self.figure, self._layout, kwargs)
+        self._colorbar = {'signature': signature,
+                          'axes':      [ax for ax in self.figure.axes if not ( ax in axes )]
+                         }
+
+
+###################################################################################################
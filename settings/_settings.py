@@ -37,7 +37,25 @@ __all__ = ['tick_label_xformat',
            'grid_label_all',
            'grid_label_bbox',
            'margins',
-           'props'
+           'props',
+           'engine',
+           'fits_cache_size',
+           'contour_cache',
+           'contour_cache_size',
+           'contour_cache_dir',
+           'catalogue_cache_size',
+           'region_cache_size',
+           'incremental',
+           'text_engine',
+           'tex_cache_dir',
+           'autoscale_pmin',
+           'autoscale_pmax',
+           'autoscale_samples',
+           'autoscale_seed',
+           'background_writes',
+           'downsample',
+           'downsample_oversampling',
+           'compute_block_size'
           ]
 
 
@@ -76,3 +94,23 @@ grid_label_all        = False           # label all panels or just the bottom le
 grid_label_bbox       = False           # show a box (see props below) around the labels in grid
 margins               = [0.10,0.10,0.05,0.10]    # margins around figure (left, right, top, bottom)
 props                 = {'boxstyle': "round", 'facecolor': "white", 'edgecolor': "black", 'linewidth': 0.5, 'alpha': 0.8}
+engine                = 'aplpy'         # 'aplpy' or 'wcsaxes' (matplotlib + astropy only, no APLpy needed)
+
+# performance settings
+fits_cache_size       = 16              # number of FITS files kept open and parsed in memory
+contour_cache         = True            # reuse computed contour lines (not used for labelled contours)
+contour_cache_size    = 64              # number of contour sets kept in memory
+contour_cache_dir     = None            # directory to also store contour lines on disk, e.g. across runs
+catalogue_cache_size  = 4               # number of indexed source catalogues kept in memory
+region_cache_size     = 16              # number of parsed DS9 region files kept in memory
+incremental           = False           # skip plots whose inputs, arguments and settings did not change
+text_engine           = 'tex'           # 'tex' (LaTeX, slow) or 'mathtext' (matplotlib internal, no external processes)
+tex_cache_dir         = None            # persistent directory for typeset TeX strings, default: matplotlib's cache
+autoscale_pmin        = 0.25            # percentile used as vmin if not given, e.g. 0.5 (grid: of all shown channels)
+autoscale_pmax        = 99.75           # percentile used as vmax if not given, e.g. 99.5
+autoscale_samples     = 1000000         # number of pixels sampled to determine the limits
+autoscale_seed        = 0               # seed of the sampling offsets, None for a different sample every time
+background_writes     = False           # compress and write figures on a background thread, see easy_aplpy.plot.flush
+downsample            = True            # block average images with more pixels than the output before plotting
+downsample_oversampling = 1.0           # image pixels to keep per output pixel when downsampling
+compute_block_size    = 67108864        # bytes of a cube processed at once by easy_aplpy.compute (64 MB)
@@ -0,0 +1,76 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Test setup: import the checkout as easy_aplpy and provide the     #
+# synthetic FITS files of the benchmarks.                           #
+#####################################################################
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+import pytest
+
+
+###################################################################################################
+
+# the repository root is the easy_aplpy package itself
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(package_dir, 'benchmarks'))
+
+# make the package importable as easy_aplpy independent of the name of the checkout, this is needed
+# before any fixture runs because pytest imports the package __init__ of the checkout itself
+_import_dir = tempfile.mkdtemp(prefix='easy_aplpy_tests_')
+os.symlink(package_dir, os.path.join(_import_dir, 'easy_aplpy'))
+sys.path.insert(0, _import_dir)
+atexit.register(shutil.rmtree, _import_dir, True)                              # removes the link, not the package
+
+
+###################################################################################################
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('data'))
+
+
+@pytest.fixture(scope='session')
+def image(data_dir):
+    pytest.importorskip('astropy')
+    from fixtures import make_fixture
+    return make_fixture('map_512', data_dir)
+
+
+@pytest.fixture(scope='session')
+def cube(data_dir):
+    pytest.importorskip('astropy')
+    from fixtures import make_fixture
+    return make_fixture('cube_128x128x32', data_dir)
+
+
+def _easy_aplpy(required):
+    # easy_aplpy with the Agg backend and mathtext (no LaTeX installation needed), settings restored afterwards
+    for module in required:
+        pytest.importorskip(module)
+    import matplotlib
+    matplotlib.use('Agg')
+    import easy_aplpy
+    text_engine = easy_aplpy.settings.text_engine
+    easy_aplpy.settings.text_engine = 'mathtext'
+    yield easy_aplpy
+    easy_aplpy.settings.text_engine = text_engine
+
+
+@pytest.fixture
+def easy_aplpy():
+    yield from _easy_aplpy(['matplotlib','astropy','aplpy'])
+
+
+###
+
+
+@pytest.fixture
+def easy_aplpy_wcsaxes():
+    # the wcsaxes engine only needs matplotlib and astropy
+    yield from _easy_aplpy(['matplotlib','astropy'])
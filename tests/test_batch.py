@@ -0,0 +1,23 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of easy_aplpy.plot.batch.                                   #
+#####################################################################
+
+import os
+
+
+###################################################################################################
+
+def test_invalid_job_is_recorded(easy_aplpy, image, tmp_path):
+    out = str(tmp_path/'map.png')
+    results = easy_aplpy.plot.batch([{'type': 'map', 'out': str(tmp_path/'missing.png')},
+                                     {'type': 'map', 'fitsfile': image, 'out': out}
+                                    ], raise_errors=False)
+    assert ( len(results) == 2 )
+    assert ( 'fitsfile' in results[0]['error'] )
+    assert ( results[1]['error'] is None )
+    assert os.path.getsize(out) > 0
+
+
+###################################################################################################
@@ -0,0 +1,119 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of easy_aplpy.compute against whole-array NumPy results.    #
+#####################################################################
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('astropy')
+
+
+###################################################################################################
+
+@pytest.fixture
+def compute():
+    # several small blocks per cube instead of a single one, settings restored afterwards
+    import easy_aplpy
+    block_size = easy_aplpy.settings.compute_block_size
+    easy_aplpy.settings.compute_block_size = 3*128*128*8
+    yield easy_aplpy.compute
+    easy_aplpy.settings.compute_block_size = block_size
+
+
+def _cube(cube):
+    from astropy.io import fits
+    with fits.open(cube) as hdul:
+        return np.array(hdul[0].data, dtype=np.float64), hdul[0].header.copy()
+
+
+def _reference(data, header, first, last, valid):
+    # moments computed directly on the whole array, velocities in km/s
+    velocity = ((np.arange(first, last+1)+1.-header['crpix3'])*header['cdelt3']+header['crval3'])[:,None,None]
+    data     = np.where(valid, data, 0.)[first:last+1]
+    valid    = valid[first:last+1]
+    weights  = data.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mom1 = (data*velocity).sum(axis=0)/weights
+        mom2 = np.sqrt(np.maximum((data*(velocity-mom1)**2).sum(axis=0)/weights, 0.))
+    empty = ~valid.any(axis=0)
+    mom0  = np.where(empty, np.nan, weights*abs(header['cdelt3']))
+    peak  = np.where(empty, np.nan, np.where(valid, data, -np.inf).max(axis=0))
+    mom1  = np.where(empty | ( weights <= 0 ), np.nan, mom1)
+    mom2  = np.where(empty | ( weights <= 0 ), np.nan, mom2)
+    return {0: mom0, 1: mom1, 2: mom2, 'peak': peak}
+
+
+def _compare(result, expected):
+    np.testing.assert_allclose(result.data, expected, rtol=1e-4, atol=1e-3, equal_nan=True)
+
+
+###################################################################################################
+
+def test_moments_match_numpy(compute, cube):
+    data, header = _cube(cube)
+    mom0, peak = compute.moments(cube, [0,'peak'])
+    expected = _reference(data, header, 0, data.shape[0]-1, np.isfinite(data))
+    _compare(mom0, expected[0])
+    _compare(peak, expected['peak'])
+
+
+def test_clipped_moments_match_numpy(compute, cube):
+    data, header = _cube(cube)
+    result   = compute.moments(cube, [0,1,2,'peak'], channels=[4,27], clip=3.)
+    expected = _reference(data, header, 4, 27, data >= 3.)
+    for moment, hdu in zip([0,1,2,'peak'], result):
+        _compare(hdu, expected[moment])
+
+
+def test_masked_moments_match_numpy(compute, cube):
+    data, header = _cube(cube)
+    mask = np.zeros(data.shape[1:], dtype=bool)
+    mask[20:90,30:100] = True
+    mom0 = compute.moments(cube, 0, mask=mask)
+    expected = _reference(data, header, 0, data.shape[0]-1, np.isfinite(data) & mask[None])
+    _compare(mom0, expected[0])
+    assert np.all(np.isnan(mom0.data[~mask]))
+
+
+def test_moment_headers(compute, cube):
+    data, header = _cube(cube)
+    mom0, mom1, peak = compute.moments(cube, [0,1,'peak'])
+    assert ( mom0.header['bunit'] == 'K.km/s' )
+    assert ( mom1.header['bunit'] == 'km/s' )
+    assert ( peak.header['bunit'] == 'K' )
+    for hdu in [mom0, mom1, peak]:
+        assert ( hdu.header['naxis'] == 2 )
+        for key in ['bmaj','bmin','bpa']:
+            assert ( hdu.header[key] == header[key] )
+
+
+def test_pv_along_row(compute, cube):
+    data, header = _cube(cube)
+    pv = compute.pv_slice(cube, [[20,50],[90,50]], width=1, channels=[4,27])
+    np.testing.assert_allclose(pv.data, data[4:28,50,20:91], rtol=1e-6)
+    assert ( pv.header['ctype1'] == 'OFFSET' )
+    assert ( pv.header['cdelt1'] == pytest.approx(2.) )                        # 2 arcsec pixels
+    assert ( pv.header['crpix2'] == header['crpix3']-4 )                       # row 0 is channel 4
+    assert ( pv.header['bunit'] == 'K' )
+
+
+def test_pv_width_averages_rows(compute, cube):
+    data, header = _cube(cube)
+    pv = compute.pv_slice(cube, [[20,50.5],[90,50.5]], width=2)                # the slit covers rows 50 and 51
+    np.testing.assert_allclose(pv.data, data[:,50:52,20:91].mean(axis=1), rtol=1e-5, atol=1e-5)
+
+
+def test_pv_is_plotted_as_pv(easy_aplpy, cube, tmp_path):
+    import matplotlib.pyplot as plt
+    from easy_aplpy.plot._helpers import _check_image_type
+    pv  = easy_aplpy.compute.pv_slice(cube, [[20,50],[90,70]])
+    png = str(tmp_path/'pv.png')
+    assert ( _check_image_type(pv, {})['imtype'] == 'pv' )
+    easy_aplpy.plot.map(pv, out=png)
+    plt.close('all')
+    assert ( plt.imread(png).ndim == 3 )
+
+
+###################################################################################################
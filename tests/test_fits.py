@@ -0,0 +1,24 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of the FITS helpers.                                        #
+#####################################################################
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+###################################################################################################
+
+@pytest.mark.parametrize('dtype', ['>f8','<f8','>f4'])
+def test_block_average_keeps_precision(dtype):
+    from easy_aplpy.helpers._fits import _block_average
+    data = (1.+np.arange(64.).reshape(8,8)*1e-9).astype(dtype)
+    averaged = _block_average(data, 2, chunk_rows=3)
+    expected = np.asarray(data, dtype=np.float64).reshape(4,2,4,2).mean(axis=(1,3))
+    assert ( averaged.dtype == (np.float64 if dtype.endswith('8') else np.float32) )
+    assert np.allclose(averaged, expected, rtol=0, atol=1e-12 if dtype.endswith('8') else 1e-6)
+
+
+###################################################################################################
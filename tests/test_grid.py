@@ -0,0 +1,41 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of easy_aplpy.plot.grid.                                    #
+#####################################################################
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+###################################################################################################
+
+def test_parallel_matches_serial(easy_aplpy, cube, tmp_path):
+    import matplotlib.pyplot as plt
+    serial   = str(tmp_path/'serial.png')
+    parallel = str(tmp_path/'parallel.png')
+    easy_aplpy.plot.grid(cube, [2,2], [10,14,18,22], out=serial, vmin=0, vmax=40)
+    easy_aplpy.plot.grid(cube, [2,2], [10,14,18,22], out=parallel, vmin=0, vmax=40, workers=2)
+    easy_aplpy.plot.flush()
+    plt.close('all')
+
+    serial_image   = plt.imread(serial)
+    parallel_image = plt.imread(parallel)
+    assert ( serial_image.shape == parallel_image.shape )
+    # antialiased edges may differ by rounding, everything else must be identical
+    different = np.any(np.abs(serial_image-parallel_image) > 2./255., axis=-1)
+    assert ( different.mean() < 0.001 )
+
+
+def test_wcsaxes_contours(easy_aplpy_wcsaxes, cube, tmp_path):
+    import matplotlib.pyplot as plt
+    png = str(tmp_path/'grid.png')
+    contours = [[[cube, chan, [10,20], 'black']] for chan in [10,14,18,22]]
+    easy_aplpy_wcsaxes.plot.grid(cube, [2,2], [10,14,18,22], out=png, engine='wcsaxes', vmin=0, vmax=40, contours=contours)
+    easy_aplpy_wcsaxes.plot.flush()
+    plt.close('all')
+    assert ( plt.imread(png).ndim == 3 )
+
+
+###################################################################################################
@@ -0,0 +1,32 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of the argument fingerprints of the incremental mode.       #
+#####################################################################
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+###################################################################################################
+
+def test_fingerprint_large_skycoord(easy_aplpy):
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord
+    from easy_aplpy.plot._incremental import _fingerprint
+    ra  = np.linspace(11.8, 12.0, 5000)
+    dec = np.full(5000, -25.3)
+    changed = ra.copy()
+    changed[2500] += 1e-4
+    assert not ( _fingerprint(SkyCoord(ra*u.deg, dec*u.deg), []) == _fingerprint(SkyCoord(changed*u.deg, dec*u.deg), []) )
+    assert ( _fingerprint(SkyCoord(ra*u.deg, dec*u.deg), []) == _fingerprint(SkyCoord(ra*u.deg, dec*u.deg), []) )
+
+
+def test_fingerprint_unknown_type(easy_aplpy):
+    from easy_aplpy.plot._incremental import _fingerprint, _NoFingerprint
+    with pytest.raises(_NoFingerprint):
+        _fingerprint(object(), [])
+
+
+###################################################################################################
@@ -0,0 +1,33 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of the easy_aplpy logger.                                   #
+#####################################################################
+
+import io
+import logging
+
+
+###################################################################################################
+
+def test_messages_propagate(caplog):
+    from easy_aplpy.helpers import _log
+    with caplog.at_level(logging.INFO, logger='easy_aplpy'):
+        _log._info('progress')
+        _log._warn('problem')
+    assert ( [record.getMessage() for record in caplog.records] == ['progress','problem'] )
+    assert _log.logger.propagate
+
+
+def test_console_handler_plain_text():
+    from easy_aplpy.helpers import _log
+    stream  = io.StringIO()
+    handler = _log.add_console_handler(stream)
+    try:
+        _log._info('progress')
+    finally:
+        _log.logger.removeHandler(handler)
+    assert ( stream.getvalue() == '[easy_aplpy] progress\n' )                  # no colour codes when not on a terminal
+
+
+###################################################################################################
@@ -0,0 +1,45 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of easy_aplpy.plot.map.                                     #
+#####################################################################
+
+import os
+
+
+###################################################################################################
+
+def test_outputs_exist_on_return(easy_aplpy, image, tmp_path):
+    import matplotlib.pyplot as plt
+    png = str(tmp_path/'map.png')
+    pdf = str(tmp_path/'map.pdf')
+    easy_aplpy.plot.map(image, out=[png, {'filename': pdf, 'max_dpi': 100}])
+    plt.close('all')
+    assert os.path.getsize(png) > 0
+    assert os.path.getsize(pdf) > 0
+
+
+def test_background_writes(easy_aplpy, image, tmp_path):
+    import matplotlib.pyplot as plt
+    png = str(tmp_path/'map.png')
+    easy_aplpy.settings.background_writes = True
+    try:
+        easy_aplpy.plot.map(image, out=png)
+        assert ( easy_aplpy.plot.flush() == {} )
+    finally:
+        easy_aplpy.settings.background_writes = False
+    plt.close('all')
+    assert ( plt.imread(png).ndim == 3 )
+
+
+def test_wcsaxes_contours_legend(easy_aplpy_wcsaxes, image, tmp_path):
+    import matplotlib.pyplot as plt
+    png = str(tmp_path/'map.png')
+    easy_aplpy_wcsaxes.plot.map(image, out=png, engine='wcsaxes',
+                                contours=[[image, [5,10,20], 'black'], [image, [30,40], 'white']],
+                                legend=['low','high'])
+    plt.close('all')
+    assert ( plt.imread(png).ndim == 3 )
+
+
+###################################################################################################
@@ -0,0 +1,44 @@
+#####################################################################
+#                            EASY APLPY                             #
+#####################################################################
+# Tests of easy_aplpy.plot.GridTemplate.                            #
+#####################################################################
+
+import os
+import pytest
+
+
+###################################################################################################
+
+def test_fill_twice(easy_aplpy, cube, tmp_path):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    first  = str(tmp_path/'first.png')
+    second = str(tmp_path/'second.png')
+    fresh  = str(tmp_path/'fresh.png')
+    template = easy_aplpy.plot.GridTemplate([2,2])
+    main_fig, subfigs = template.fill(cube, [1,2,3,4], out=first)
+    refilled, refilled_subfigs = template.fill(cube, [5,6,7,8], out=second)
+    plt.close('all')
+    easy_aplpy.plot.grid(cube, [2,2], [5,6,7,8], out=fresh)
+    easy_aplpy.plot.flush()
+    plt.close('all')
+    assert ( refilled is main_fig )                                            # the figure is reused
+    assert ( len(refilled_subfigs) == len(subfigs) == 4 )
+    assert os.path.getsize(first) > 0
+
+    # nothing of the first fill may remain: the refilled figure looks like a fresh grid
+    refilled_image = plt.imread(second)
+    fresh_image    = plt.imread(fresh)
+    assert ( refilled_image.shape == fresh_image.shape )
+    # antialiased edges may differ by rounding, everything else must be identical
+    different = np.any(np.abs(refilled_image-fresh_image) > 2./255., axis=-1)
+    assert ( different.mean() < 0.001 )
+
+
+def test_workers_not_supported(easy_aplpy):
+    with pytest.raises(TypeError):
+        easy_aplpy.plot.GridTemplate([2,2], workers=2)
+
+
+###################################################################################################